@@ -1,8 +1,10 @@
 # api/urls.py
 from django.urls import path
-from .views import menu_recommend_post, menu_recommend_get
+from .views import menu_recommend_post, menu_recommend_get, menu_artifacts_status, menu_reco_traces
 
 urlpatterns = [
     path("menu/recommend", menu_recommend_post, name="menu_recommend_post"),  # POST
     path("menu/recommend/", menu_recommend_get, name="menu_recommend_get"),  # GET (끝 슬래시 허용)
+    path("menu/artifacts", menu_artifacts_status, name="menu_artifacts_status"),  # GET (active 버전)
+    path("menu/traces", menu_reco_traces, name="menu_reco_traces"),  # GET (stage별 소요시간)
 ]
\ No newline at end of file
@@ -9,7 +9,8 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.db import connection, transaction
 
-from ml.menu_reco.service import recommend_and_commit
+from ml.menu_reco.service import ARTIFACTS, RESULT_CACHE, recommend_and_commit
+from ml.menu_reco.trace import RECO_TRACES, summarize
 
 
 # -----------------------
@@ -196,4 +197,26 @@ def menu_recommend_get(request: HttpRequest) -> JsonResponse:
             status=200,
         )
     except Exception as e:
-        return _server_error(f"{type(e).__name__}: {e}")
\ No newline at end of file
+        return _server_error(f"{type(e).__name__}: {e}")
+
+# -----------------------
+# GET /api/menu/artifacts  (이 worker의 active artifacts 버전 + 결과 캐시 상태)
+# -----------------------
+@require_http_methods(["GET"])
+def menu_artifacts_status(request: HttpRequest) -> JsonResponse:
+    return JsonResponse(
+        {"ok": True, "artifacts": ARTIFACTS.status(), "result_cache": RESULT_CACHE.status()},
+        status=200,
+    )
+
+
+# -----------------------
+# GET /api/menu/traces  (이 worker의 recommend_and_commit stage별 소요시간 histogram)
+# -----------------------
+@require_http_methods(["GET"])
+def menu_reco_traces(request: HttpRequest) -> JsonResponse:
+    snap = RECO_TRACES.snapshot()
+    return JsonResponse(
+        {"ok": True, "pid": snap["pid"], "calls": snap["calls"], "status": snap["status"], "stages": summarize(snap)},
+        status=200,
+    )
@@ -0,0 +1,58 @@
+# conf/db_batch.py
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+
+# MySQL max_allowed_packet(기본 64MB) 대비 여유 있게. 한 행에 컬럼 10개 안팎이면 수백 KB 수준
+DEFAULT_CHUNK_ROWS = 500
+
+
+def bulk_insert(
+    cursor,
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    *,
+    const_exprs: Optional[Dict[str, str]] = None,
+    placeholders: Optional[Dict[str, str]] = None,
+    update_columns: Optional[Sequence[str]] = None,
+    ignore: bool = False,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> int:
+    """
+    여러 행을 multi-row VALUES INSERT 1문장으로 (chunk_rows행씩) -> 논리적 쓰기 1번 = round trip 1번.
+      - columns: rows 각 값에 대응하는 컬럼(바인딩 %s)
+      - const_exprs: 모든 행에 같은 SQL 식을 넣을 컬럼 {컬럼: 식} (예: DATE_FORMAT(NOW(),'%%Y%%m%%d%%H%%i%%s'))
+        -> 앞쪽 컬럼으로 들어감, 식 안의 %는 %%로
+      - placeholders: 값을 SQL 식으로 감쌀 컬럼 {컬럼: "%s 1개를 포함한 식"}
+        (예: {"feel_id": "(SELECT feel_id FROM COM_FEEL_TM WHERE word = %s)"} -> 행별 조회도 같은 문장 안에서)
+      - update_columns: ON DUPLICATE KEY UPDATE col = VALUES(col)
+      - ignore: INSERT IGNORE
+    transaction은 호출 측에서 (여러 chunk를 한 번에 반영하려면 transaction.atomic 안에서 호출).
+    반환: MySQL affected rows 합 (ON DUPLICATE KEY UPDATE로 바뀐 행은 2로 셈)
+    """
+    if not rows:
+        return 0
+    const_exprs = dict(const_exprs or {})
+    cols = list(const_exprs) + list(columns)
+    placeholders = placeholders or {}
+    row_sql = "(" + ", ".join(list(const_exprs.values()) + [placeholders.get(c, "%s") for c in columns]) + ")"
+
+    head = f"INSERT {'IGNORE ' if ignore else ''}INTO {table} ({', '.join(cols)}) VALUES "
+    tail = ""
+    if update_columns:
+        tail = " ON DUPLICATE KEY UPDATE " + ", ".join(f"{c} = VALUES({c})" for c in update_columns)
+
+    n_cols = len(columns)
+    affected = 0
+    step = max(1, int(chunk_rows))
+    for i in range(0, len(rows), step):
+        chunk = rows[i:i + step]
+        params: List[Any] = []
+        for r in chunk:
+            if len(r) != n_cols:
+                raise ValueError(f"bulk_insert {table}: expected {n_cols} values per row, got {len(r)}")
+            params.extend(r)
+        cursor.execute(head + ", ".join([row_sql] * len(chunk)) + tail, params)
+        affected += max(0, int(cursor.rowcount or 0))
+    return affected
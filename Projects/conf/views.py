@@ -10,6 +10,7 @@ from django.db.models import Count
 
 from record.models import CusFeelTh
 from record.models import ReportTh
+from ml.menu_reco.food_dict import FOOD_NAMES
 from django.urls import reverse
 from django.http import HttpResponse, HttpResponseForbidden
 
@@ -176,25 +177,6 @@ def _next_slot_by_food_and_feel(cust_id: str, ymd: str):
     return ("M", {"M": done_m, "L": done_l, "D": done_d})
 
 
-def _get_food_name_column() -> str:
-    candidates = ["name", "food_nm", "food_name", "food_nm_kr", "title", "food_title"]
-
-    sql = """
-        SELECT COLUMN_NAME
-        FROM information_schema.COLUMNS
-        WHERE TABLE_SCHEMA = DATABASE()
-          AND TABLE_NAME = 'FOOD_TB';
-    """
-    with connection.cursor() as cursor:
-        cursor.execute(sql)
-        cols = {str(r[0]) for r in cursor.fetchall()}
-
-    for c in candidates:
-        if c in cols:
-            return c
-    return ""
-
-
 # 완료 슬롯 찾아서 slot 사용하기
 def _last_done_slot_by_food_and_feel(cust_id: str, ymd: str) -> str | None:
     slots = ["M", "L", "D"]
@@ -336,20 +318,13 @@ def _build_menu_reco_context(cust_id: str) -> dict:
         base["status_text"] = "추천 준비 중"
         return base
 
-    # 6) 추천 로딩
-    name_col = _get_food_name_column()
-    if not name_col:
-        base["status_text"] = "추천 준비 중"
-        return base
-
-    sql_reco = f"""
+    # 6) 추천 로딩 (food_name 없는 행은 FOOD_TB 조인 대신 프로세스 로컬 사전으로 채움)
+    sql_reco = """
         SELECT
             r.rec_type,
             r.food_id,
-            COALESCE(r.food_name, f.`{name_col}`) AS food_name
+            r.food_name
         FROM MENU_RECOM_TH r
-        LEFT JOIN FOOD_TB f
-        ON f.food_id = r.food_id
         WHERE r.cust_id = %s
         AND r.rgs_dt = %s
         AND r.rec_time_slot = %s
@@ -365,6 +340,9 @@ def _build_menu_reco_context(cust_id: str) -> dict:
         base["status_text"] = "추천 준비 중"
         return base
 
+    ids = [food_id for _, food_id, food_name in rows if not food_name]
+    names = {str(k): v for k, v in FOOD_NAMES.names_for_ids(ids).items()}
+
     type_label = {
         "P": "취향 기반",
         "H": "건강 기반",
@@ -379,7 +357,7 @@ def _build_menu_reco_context(cust_id: str) -> dict:
         t = str(rec_type).strip().upper()
         label = type_label.get(t, t)
 
-        nm = str(food_name).strip() if food_name else ""
+        nm = str(food_name).strip() if food_name else names.get(str(food_id), "")
 
         if nm:
             items.append({"key": t, "label": label, "name": nm})
@@ -1,15 +1,48 @@
 # ml/lstm/batch.py
 from __future__ import annotations
 
+import json
+import time as _time
 import traceback
-from datetime import datetime, time, date
-from typing import Any, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, time, date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
 
-from django.db import connection
+from django.db import DatabaseError, connection
 from django.utils import timezone
 
-from ml.lstm.prediction_service import run_prediction_for_date
-from ml.lstm.predictor import _pick_source_slot_DLM
+from conf.db_batch import bulk_insert
+from ml.lstm.prediction_service import risk_scores_from_probs, upsert_risk_rows_bulk
+from ml.lstm.predictor import (
+    _BUNDLE,
+    _model_window,
+    _slot_rank,
+    _target_from_source,
+    build_window_tensor,
+    predict_negative_risk_batch,
+)
+
+# 청크당 SQL 5번(source/gate/기존 예측/7일 window/upsert) + forward 1번
+DEFAULT_CHUNK_USERS = 1000
+
+# 청크 완료 기록(재시작 시 끝난 사용자 건너뜀). 배치 시작 때 없으면 생성
+CHECKPOINT_TABLE = "CUS_FEEL_RISK_BATCH_CK"
+CHECKPOINT_DDL = f"""
+CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+    created_time VARCHAR(14),
+    updated_time VARCHAR(14),
+    batch_dt     VARCHAR(8)  NOT NULL,
+    chunk_no     INT NOT NULL,
+    status       VARCHAR(10) NOT NULL,
+    n_users      INT NOT NULL DEFAULT 0,
+    ok_cnt       INT NOT NULL DEFAULT 0,
+    skip_cnt     INT NOT NULL DEFAULT 0,
+    fail_cnt     INT NOT NULL DEFAULT 0,
+    sec          DOUBLE NOT NULL DEFAULT 0,
+    cust_ids     MEDIUMTEXT NOT NULL,
+    PRIMARY KEY (batch_dt, chunk_no)
+)
+"""
 
 
 def _today_yyyymmdd() -> str:
@@ -37,66 +70,327 @@ def _get_cust_ids_with_any_ts_on_date(rgs_dt: str) -> List[str]:
         return [str(r[0]) for r in cursor.fetchall() if r and r[0]]
 
 
-def run_8pm_batch_prediction(force: bool = False) -> Dict[str, Any]:
+# =========================
+# bulk 조회 (청크 단위, 사용자 수와 무관하게 round trip 고정)
+# =========================
+
+def _in_ph(values: Sequence[Any]) -> str:
+    return ",".join(["%s"] * len(values))
+
+
+def _ymd_shift(yyyymmdd: str, days: int) -> str:
+    d = datetime.strptime(yyyymmdd, "%Y%m%d").date()
+    return (d + timedelta(days=days)).strftime("%Y%m%d")
+
+
+def _pick_sources_DLM_bulk(cust_ids: Sequence[str], rgs_dt: str) -> Dict[str, Tuple[str, int]]:
+    """predictor._pick_source_slot_DLM 다건: cust_id -> (D>L>M slot, 그 slot의 MAX(seq))"""
+    if not cust_ids:
+        return {}
+    sql = f"""
+        SELECT cust_id, time_slot, MAX(seq) AS max_seq
+        FROM CUS_FEEL_TH
+        WHERE rgs_dt = %s AND cust_id IN ({_in_ph(cust_ids)})
+        GROUP BY cust_id, time_slot
+    """
+    best: Dict[str, Tuple[int, str, int]] = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [rgs_dt] + list(cust_ids))
+        for cust_id, time_slot, max_seq in cursor.fetchall():
+            if not time_slot:
+                continue
+            rank = _slot_rank(str(time_slot))
+            cur = best.get(str(cust_id))
+            if cur is None or rank > cur[0]:
+                best[str(cust_id)] = (rank, str(time_slot).upper(), int(max_seq or 0))
+    return {c: (slot, seq) for c, (_, slot, seq) in best.items() if seq > 0}
+
+
+def _gate_ok_bulk(cust_ids: Sequence[str], asof_yyyymmdd: str) -> Set[str]:
+    """predictor.gate_has_keywords_3days 다건: D-2, D-1, D 모두 TS가 있는 사용자"""
+    if not cust_ids:
+        return set()
+    days = [_ymd_shift(asof_yyyymmdd, -2), _ymd_shift(asof_yyyymmdd, -1), asof_yyyymmdd]
+    sql = f"""
+        SELECT cust_id
+        FROM CUS_FEEL_TS
+        WHERE rgs_dt IN (%s, %s, %s) AND cust_id IN ({_in_ph(cust_ids)})
+        GROUP BY cust_id
+        HAVING COUNT(DISTINCT rgs_dt) = 3
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, days + list(cust_ids))
+        return {str(r[0]) for r in cursor.fetchall()}
+
+
+def _existing_risk_targets(cust_ids: Sequence[str], target_dates: Sequence[str]) -> Set[Tuple[str, str, str]]:
+    if not cust_ids or not target_dates:
+        return set()
+    sql = f"""
+        SELECT cust_id, target_date, target_slot
+        FROM CUS_FEEL_RISK_TH
+        WHERE target_date IN ({_in_ph(target_dates)}) AND cust_id IN ({_in_ph(cust_ids)})
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(target_dates) + list(cust_ids))
+        return {(str(c), str(d), str(s).upper()) for c, d, s in cursor.fetchall()}
+
+
+def _fetch_window_best_feels(cust_ids: Sequence[str], asof_yyyymmdd: str, window: int) -> List[Tuple]:
+    """
+    predictor._fetch_last_n_feels + 일별 대표(D>L>M) 선택을 SQL 1번으로:
+    (cust_id, rgs_dt, time_slot, mood, energy), (cust_id, rgs_dt)당 1행
+    """
+    if not cust_ids:
+        return []
+    sql = f"""
+        SELECT cust_id, rgs_dt, time_slot, mood, energy
+        FROM (
+            SELECT
+                cust_id, rgs_dt, time_slot, mood, energy,
+                ROW_NUMBER() OVER (
+                    PARTITION BY cust_id, rgs_dt
+                    ORDER BY CASE UPPER(time_slot) WHEN 'D' THEN 3 WHEN 'L' THEN 2 WHEN 'M' THEN 1 ELSE 0 END DESC,
+                             seq ASC
+                ) AS rn
+            FROM CUS_FEEL_TH
+            WHERE rgs_dt BETWEEN %s AND %s AND cust_id IN ({_in_ph(cust_ids)})
+        ) x
+        WHERE x.rn = 1
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_ymd_shift(asof_yyyymmdd, -(window - 1)), asof_yyyymmdd] + list(cust_ids))
+        return list(cursor.fetchall())
+
+
+def predict_chunk(
+    cust_ids: Sequence[str],
+    source_date: str,
+    skip_if_exists: bool = True,
+    infer_batch: int = 4096,
+) -> List[Dict[str, Any]]:
+    """
+    cust_ids 청크를 run_prediction_for_date(skip_if_exists) 반복과 같은 결과로 (source=source_date의 D>L>M).
+    return: 사용자별 {"cust_id", "ok", "skipped"?, "reason"?, "target_date", "target_slot", "risk_score"?}
+    """
+    results: List[Dict[str, Any]] = []
+    sources = _pick_sources_DLM_bulk(cust_ids, source_date)
+
+    todo: List[Tuple[str, str, str]] = []
+    for cust_id in cust_ids:
+        picked = sources.get(cust_id)
+        if not picked:
+            results.append({"cust_id": cust_id, "ok": False, "reason": "no_source_today"})
+            continue
+        target_date, target_slot = _target_from_source(source_date, picked[0])
+        todo.append((cust_id, target_date, target_slot))
+
+    if skip_if_exists and todo:
+        existing = _existing_risk_targets([t[0] for t in todo], sorted({t[1] for t in todo}))
+        keep = []
+        for t in todo:
+            if t in existing:
+                results.append({"cust_id": t[0], "ok": True, "skipped": True, "target_date": t[1], "target_slot": t[2]})
+            else:
+                keep.append(t)
+        todo = keep
+    if not todo:
+        return results
+
+    ids = [t[0] for t in todo]
+    gate_ok = _gate_ok_bulk(ids, source_date)
+    window = _model_window()
+    x = build_window_tensor(ids, _fetch_window_best_feels(ids, source_date, window), source_date, window=window)
+
+    out = predict_negative_risk_batch(x, infer_batch=infer_batch)
+    scores = risk_scores_from_probs(out["p0"], out["p2"])
+
+    rows = []
+    for i, (cust_id, target_date, target_slot) in enumerate(todo):
+        # gate 실패도 단건과 같이 0점으로 저장
+        ok = cust_id in gate_ok
+        score = scores[i] if ok else 0
+        rows.append((cust_id, target_date, target_slot, score))
+        results.append({
+            "cust_id": cust_id, "ok": True, "target_date": target_date, "target_slot": target_slot,
+            "risk_score": score, "reason": out["reason"] if ok else "gate_failed_no_keywords_3days",
+        })
+    upsert_risk_rows_bulk(rows)
+    return results
+
+
+# =========================
+# checkpoint
+# =========================
+
+def ensure_checkpoint_table() -> bool:
+    """CHECKPOINT_TABLE이 없으면 생성(IF NOT EXISTS라 매번 불러도 됨). 권한 등으로 실패하면 False"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(CHECKPOINT_DDL)
+        return True
+    except DatabaseError as e:
+        print("[BATCHDBG][CK_TABLE_ERR]", repr(e), flush=True)
+        return False
+
+
+def load_checkpoints(batch_dt: str) -> Tuple[Set[str], int]:
+    """batch_dt에서 status='done'인 청크의 사용자 전체, 지금까지 쓴 최대 chunk_no(-1: 없음)"""
+    sql = f"SELECT chunk_no, status, cust_ids FROM {CHECKPOINT_TABLE} WHERE batch_dt = %s"
+    done: Set[str] = set()
+    max_no = -1
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [batch_dt])
+        for chunk_no, status, cust_ids in cursor.fetchall():
+            max_no = max(max_no, int(chunk_no))
+            if status == "done":
+                done.update(json.loads(cust_ids or "[]"))
+    return done, max_no
+
+
+def save_checkpoint(batch_dt: str, chunk_no: int, cust_ids: Sequence[str], status: str, stats: Dict[str, Any]) -> None:
+    now = timezone.localtime().strftime("%Y%m%d%H%M%S")
+    row = (
+        now, now, batch_dt, int(chunk_no), status, len(cust_ids),
+        int(stats.get("ok_cnt", 0)), int(stats.get("skip_cnt", 0)), int(stats.get("fail_cnt", 0)),
+        float(stats.get("sec", 0.0)), json.dumps(list(cust_ids)),
+    )
+    cols = ("created_time", "updated_time", "batch_dt", "chunk_no", "status", "n_users",
+            "ok_cnt", "skip_cnt", "fail_cnt", "sec", "cust_ids")
+    with connection.cursor() as cursor:
+        bulk_insert(
+            cursor, CHECKPOINT_TABLE, cols, [row],
+            update_columns=("updated_time", "status", "n_users", "ok_cnt", "skip_cnt", "fail_cnt", "sec", "cust_ids"),
+        )
+
+
+def clear_checkpoints(batch_dt: str) -> int:
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {CHECKPOINT_TABLE} WHERE batch_dt = %s", [batch_dt])
+        return int(cursor.rowcount or 0)
+
+
+def _count(results: List[Dict[str, Any]]) -> Dict[str, int]:
+    skip = sum(1 for r in results if r.get("ok") and r.get("skipped"))
+    ok = sum(1 for r in results if r.get("ok") and not r.get("skipped"))
+    return {"ok_cnt": ok, "skip_cnt": skip, "fail_cnt": len(results) - ok - skip}
+
+
+def _run_chunk(
+    batch_dt: str, chunk_no: int, cust_ids: List[str], infer_batch: int, checkpoint: bool, in_thread: bool,
+) -> Dict[str, Any]:
+    """청크 1개: 예측 + checkpoint 기록. 예외는 청크 실패로 돌려준다(다음 실행에서 재시도)"""
+    t0 = _time.perf_counter()
+    try:
+        try:
+            results = predict_chunk(cust_ids, batch_dt, skip_if_exists=True, infer_batch=infer_batch)
+            status = "done"
+        except Exception as e:
+            tb = traceback.format_exc()
+            results = [{"cust_id": c, "ok": False, "reason": f"batch_exception: {e}", "trace": tb} for c in cust_ids]
+            status = "failed"
+        stats = {**_count(results), "sec": round(_time.perf_counter() - t0, 3)}
+        if checkpoint:
+            try:
+                save_checkpoint(batch_dt, chunk_no, cust_ids, status, stats)
+            except Exception as e:
+                print("[BATCHDBG][CK_ERR]", chunk_no, repr(e), flush=True)
+        return {"chunk_no": chunk_no, "status": status, "n": len(cust_ids), "results": results, **stats}
+    finally:
+        if in_thread:
+            # worker thread의 DB 연결은 thread마다 따로 -> 청크 끝나면 닫는다
+            connection.close()
+
+
+def run_8pm_batch_prediction(
+    force: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_USERS,
+    infer_batch: int = 4096,
+    workers: int = 1,
+    checkpoint: bool = False,
+    restart: bool = False,
+    batch_dt: Optional[str] = None,
+) -> Dict[str, Any]:
     """
     20:00 배치(백업):
     - 원칙: 기록 저장 이벤트 훅이 이미 예측을 생성한다.
     - 그래도 혹시 누락되었거나, 특정 사용자에 대해 예측이 비어있을 수 있으니 20:00에 한번 더 보장.
     - 정책: '오늘 rgs_dt'에서 source는 D>L>M, 그걸로 target 생성.
-    - 배치는 보통 skip_if_exists=True(이미 있으면 건너뜀) 권장.
+    - 배치는 skip_if_exists=True(이미 있으면 건너뜀).
+    - 사용자 chunk_size명씩 bulk 조회 + (users, 7, 7) 한 번에 추론 + bulk upsert, 청크는 workers개 thread로 병렬
+    - checkpoint=True: 청크 완료를 CHECKPOINT_TABLE에 기록, 다시 돌리면 끝난 사용자는 건너뜀(restart면 기록 지우고 처음부터)
+    - batch_dt: 자정 넘어 재시작할 때 원래 날짜로 (기본 오늘)
     """
-    if not force and not _is_after_8pm():
+    if not force and not batch_dt and not _is_after_8pm():
         return {"ok": False, "reason": "before_20:00", "now": timezone.localtime().strftime("%Y-%m-%d %H:%M:%S")}
 
-    today = _today_yyyymmdd()
-    cust_ids = _get_cust_ids_with_any_ts_on_date(today)
+    today = batch_dt or _today_yyyymmdd()
+    cust_ids = sorted(_get_cust_ids_with_any_ts_on_date(today))
 
-    print("[BATCHDBG][ENTER]", "today=", today, "cust_cnt=", len(cust_ids), "force=", force, flush=True)
+    resumed, next_no = 0, 0
+    if checkpoint and not ensure_checkpoint_table():
+        # 체크포인트 없이도 배치 자체는 돈다(재시작 시 처음부터, 이미 있는 예측은 skip_if_exists로 건너뜀)
+        print("[BATCHDBG][WARN] checkpoint table unavailable, running without checkpoints", flush=True)
+        checkpoint = False
+    if checkpoint:
+        if restart:
+            clear_checkpoints(today)
+        done, max_no = load_checkpoints(today)
+        todo = [c for c in cust_ids if c not in done]
+        resumed, next_no = len(cust_ids) - len(todo), max_no + 1
+        cust_ids = todo
 
-    results = []
-    ok_cnt = 0
-    skip_cnt = 0
-    fail_cnt = 0
+    print(
+        "[BATCHDBG][ENTER]", "today=", today, "cust_cnt=", len(cust_ids), "resumed_skip=", resumed,
+        "workers=", workers, "force=", force, flush=True,
+    )
 
-    for cust_id in cust_ids:
-        try:
-            picked = _pick_source_slot_DLM(cust_id, today)
-            if not picked:
-                results.append({"cust_id": cust_id, "ok": False, "reason": "no_source_today"})
-                fail_cnt += 1
-                continue
+    # 모델/scaler는 thread 시작 전에 한 번만 로드
+    _BUNDLE.load()
 
-            source_slot, source_seq = picked
+    step = max(1, int(chunk_size))
+    chunks = [(next_no + k, cust_ids[i:i + step]) for k, i in enumerate(range(0, len(cust_ids), step))]
+    workers = max(1, min(int(workers), len(chunks) or 1))
 
-            r = run_prediction_for_date(
-                cust_id=cust_id,
-                source_date=today,
-                source_slot=source_slot,
-                source_seq=int(source_seq),
-                skip_if_exists=True,  # 배치는 보통 스킵
-            )
+    t0 = _time.perf_counter()
+    results: List[Dict[str, Any]] = []
+    chunk_stats: List[Dict[str, Any]] = []
+    finished = 0
 
-            results.append({"cust_id": cust_id, **r})
+    def _collect(out: Dict[str, Any]) -> None:
+        nonlocal finished
+        finished += out["n"]
+        results.extend(out.pop("results"))
+        chunk_stats.append(out)
+        print(
+            "[BATCHDBG][CHUNK]", f"#{out['chunk_no']}", out["status"], f"n={out['n']}", f"sec={out['sec']}",
+            f"{finished}/{len(cust_ids)}", flush=True,
+        )
 
-            if r.get("ok") and r.get("skipped"):
-                skip_cnt += 1
-            elif r.get("ok"):
-                ok_cnt += 1
-            else:
-                fail_cnt += 1
-
-        except Exception as e:
-            fail_cnt += 1
-            results.append({"cust_id": cust_id, "ok": False, "reason": f"batch_exception: {e}", "trace": traceback.format_exc()})
+    if workers == 1:
+        for no, chunk in chunks:
+            _collect(_run_chunk(today, no, chunk, infer_batch, checkpoint, in_thread=False))
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futs = [ex.submit(_run_chunk, today, no, chunk, infer_batch, checkpoint, True) for no, chunk in chunks]
+            for fut in as_completed(futs):
+                _collect(fut.result())
 
+    sec = _time.perf_counter() - t0
+    chunk_secs = sorted(c["sec"] for c in chunk_stats)
     summary = {
         "ok": True,
         "today": today,
-        "total": len(cust_ids),
-        "ok_cnt": ok_cnt,
-        "skip_cnt": skip_cnt,
-        "fail_cnt": fail_cnt,
+        "total": len(cust_ids) + resumed,
+        "resumed_skip": resumed,
+        **_count(results),
+        "chunks": len(chunk_stats),
+        "failed_chunks": sorted(c["chunk_no"] for c in chunk_stats if c["status"] != "done"),
+        "chunk_sec_p50": chunk_secs[len(chunk_secs) // 2] if chunk_secs else 0.0,
+        "chunk_sec_max": chunk_secs[-1] if chunk_secs else 0.0,
+        "sec": round(sec, 3),
+        "users_per_sec": round(len(cust_ids) / sec, 1) if sec > 0 else 0.0,
         "results": results,
     }
-    print("[BATCHDBG][EXIT]", summary, flush=True)
+    print("[BATCHDBG][EXIT]", {k: v for k, v in summary.items() if k != "results"}, flush=True)
     return summary
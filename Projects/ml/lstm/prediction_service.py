@@ -4,10 +4,13 @@ from __future__ import annotations
 
 import json
 from dataclasses import dataclass
+from typing import List, Sequence, Tuple
 
-from django.db import connection
+import numpy as np
+from django.db import connection, transaction
 from django.utils import timezone
 
+from conf.db_batch import bulk_insert
 from ml.lstm.predictor import predict_negative_risk
 
 
@@ -57,34 +60,38 @@ def upsert_risk_row(
     - risk_level: VARCHAR(1) => 'y'/'n' ONLY
     - risk_score: 점수(0~100)
     """
-    now = _now_yyyymmdd_hhmmss()
-    level_flag = to_risk_flag(risk_score)
-
-    # ⚠️ 아래 SQL은 네 테이블 컬럼명에 맞춰야 함.
-    # created_time/updated_time 컬럼이 실제로 없으면 제거해야 함.
-    sql = """
-            INSERT INTO CUS_FEEL_RISK_TH (
-                created_time, updated_time,
-                cust_id, target_date, target_slot,
-                risk_score, risk_level
-            ) VALUES (
-                %s, %s,
-                %s, %s, %s,
-                %s, %s
-            )
-            ON DUPLICATE KEY UPDATE
-                updated_time = VALUES(updated_time),
-                risk_score  = VALUES(risk_score),
-                risk_level  = VALUES(risk_level)
-        """
+    upsert_risk_rows_bulk([(cust_id, target_date, target_slot, int(risk_score))])
+
+
+RISK_COLS = ("created_time", "updated_time", "cust_id", "target_date", "target_slot", "risk_score", "risk_level")
+
 
+@transaction.atomic
+def upsert_risk_rows_bulk(rows: Sequence[Tuple[str, str, str, int]], chunk_rows: int = 500) -> int:
+    """
+    rows: (cust_id, target_date, target_slot, risk_score) -> multi-row upsert (chunk_rows행당 1문장)
+    """
+    if not rows:
+        return 0
+    now = _now_yyyymmdd_hhmmss()
+    vals = [
+        (now, now, str(c), str(td), str(ts), int(score), to_risk_flag(score))
+        for c, td, ts, score in rows
+    ]
     with connection.cursor() as cursor:
-        cursor.execute(
-            sql,
-            [now, now, cust_id, target_date, target_slot, int(risk_score), level_flag],
+        return bulk_insert(
+            cursor, "CUS_FEEL_RISK_TH", RISK_COLS, vals,
+            update_columns=("updated_time", "risk_score", "risk_level"),
+            chunk_rows=chunk_rows,
         )
 
 
+def risk_scores_from_probs(p0: np.ndarray, p2: np.ndarray) -> List[int]:
+    """run_prediction_for_date와 같은 점수화: clamp(p0+p2, 0, 1) * 100 반올림"""
+    p_high = np.clip(np.asarray(p0, dtype=float) + np.asarray(p2, dtype=float), 0.0, 1.0)
+    return [int(round(float(v) * 100)) for v in p_high]
+
+
 # =========================
 # prediction runner
 # =========================
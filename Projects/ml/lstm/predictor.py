@@ -7,7 +7,9 @@ import math
 import traceback
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
 
 from django.db import connection
 from django.utils import timezone
@@ -308,6 +310,17 @@ class _ModelBundle:
         if torch is not None and os.path.exists(MODEL_PATH):
             # 프로젝트에 따라 torch.load 방식이 다를 수 있음
             self.model = torch.load(MODEL_PATH, map_location="cpu")
+            # state_dict로 저장된 경우(lstm_final.pt) -> LSTMClassifier에 올린다
+            if isinstance(self.model, dict):
+                from ml.lstm.model import LSTMClassifier
+
+                net = LSTMClassifier(
+                    input_dim=int(cfg.get("input_dim", 7)),
+                    hidden_dim=int(cfg.get("hidden_dim", 64)),
+                    num_classes=int(cfg.get("num_classes", 6)),
+                )
+                net.load_state_dict(self.model)
+                self.model = net
             try:
                 self.model.eval()
             except Exception:
@@ -321,6 +334,15 @@ class _ModelBundle:
 _BUNDLE = _ModelBundle()
 
 
+def _model_window() -> int:
+    try:
+        if _BUNDLE.cfg and "window" in _BUNDLE.cfg:
+            return int(_BUNDLE.cfg.get("window") or 7)
+    except Exception:
+        pass
+    return 7
+
+
 def predict_negative_risk(
     cust_id: str,
     source_date: str,
@@ -343,12 +365,7 @@ def predict_negative_risk(
             detail={"trace": traceback.format_exc()},
         )
 
-    window = 7
-    try:
-        if _BUNDLE.cfg and "window" in _BUNDLE.cfg:
-            window = int(_BUNDLE.cfg.get("window") or 7)
-    except Exception:
-        window = 7
+    window = _model_window()
 
     # Gate: source_date 기준 최근 3일 keyword 존재
     gate_ok, gate_detail = gate_has_keywords_3days(cust_id, asof_yyyymmdd=source_date)
@@ -442,3 +459,82 @@ def predict_negative_risk(
             p_highrisk=0.0,
             detail={"trace": traceback.format_exc(), "gate": gate_detail, "feat": feat_detail},
         )
+
+
+# =========================
+# Batch (20:00 배치용): 사용자 여러 명을 한 번에
+# =========================
+
+_VAL = {"pos": 1.0, "neg": -1.0}
+_ARO = {"hig": 1.0, "low": -1.0}
+_SLOT_COL = {"M": 4, "L": 5, "D": 6}
+
+
+def build_window_tensor(
+    cust_ids: Sequence[str],
+    day_rows: Iterable[Tuple[Any, Any, Any, Any, Any]],
+    asof_yyyymmdd: str,
+    window: int = 7,
+) -> np.ndarray:
+    """
+    build_window_features의 다건 버전 -> (users, window, 7)
+    day_rows: (cust_id, rgs_dt, time_slot, mood, energy), (cust_id, rgs_dt)당 대표 1행(D>L>M)
+    결측일은 valence/arousal 0 + slot M (단건과 동일)
+    """
+    asof_d = _parse_ymd(asof_yyyymmdd)
+    day_idx = {_ymd(asof_d - timedelta(days=(window - 1 - i))): i for i in range(window)}
+    user_idx = {str(c): i for i, c in enumerate(cust_ids)}
+
+    n = len(user_idx)
+    va = np.zeros((n, window, 2), dtype=float)
+    slot_col = np.full((n, window), _SLOT_COL["M"], dtype=np.int64)
+    for cust_id, rgs_dt, time_slot, mood, energy in day_rows:
+        u = user_idx.get(str(cust_id))
+        d = day_idx.get(str(rgs_dt))
+        if u is None or d is None:
+            continue
+        va[u, d, 0] = _VAL.get((mood or "").lower(), 0.0)
+        va[u, d, 1] = _ARO.get((energy or "").lower(), 0.0)
+        # M/L/D 외 slot은 one-hot 전부 0
+        slot_col[u, d] = _SLOT_COL.get(str(time_slot).upper() if time_slot else "M", -1)
+
+    x = np.zeros((n, window, 7), dtype=float)
+    x[:, :, 0:2] = va
+    x[:, :, 2:4] = np.diff(va, axis=1, prepend=0.0)
+    uu, dd = np.nonzero(slot_col >= 0)
+    x[uu, dd, slot_col[uu, dd]] = 1.0
+    return x
+
+
+def predict_negative_risk_batch(x: np.ndarray, infer_batch: int = 4096) -> Dict[str, Any]:
+    """
+    predict_negative_risk의 추론 부분만 다건으로: x (users, window, 7) -> p0/p2 (users,)
+    gate/feature는 호출 측에서. 모델이 없으면 단건과 같은 fallback 휴리스틱.
+    """
+    _BUNDLE.load()
+    n = int(x.shape[0])
+    if n == 0:
+        return {"reason": "empty", "p0": np.zeros(0), "p2": np.zeros(0)}
+
+    if _BUNDLE.model is None or torch is None:
+        neg_cnt = (x[:, :, 0] < 0).sum(axis=1)
+        p = np.clip(neg_cnt / float(x.shape[1] or 1), 0.01, 0.99)
+        return {"reason": "fallback_no_model", "p0": p * 0.5, "p2": p * 0.5}
+
+    arr = x
+    if _BUNDLE.scaler is not None:
+        # scaler는 (N,7) 기준 -> 펼쳐서 한 번에
+        arr = _BUNDLE.scaler.transform(x.reshape(-1, x.shape[2])).reshape(x.shape)
+
+    p0 = np.zeros(n, dtype=float)
+    p2 = np.zeros(n, dtype=float)
+    step = max(1, int(infer_batch))
+    with torch.no_grad():
+        for i in range(0, n, step):
+            y = _BUNDLE.model(torch.tensor(arr[i:i + step], dtype=torch.float32))
+            if isinstance(y, (list, tuple)):
+                y = y[0]
+            probs = torch.softmax(y, dim=-1).cpu().numpy().astype(float)
+            p0[i:i + step] = probs[:, 0]
+            p2[i:i + step] = probs[:, 2] if probs.shape[1] > 2 else 0.0
+    return {"reason": "ok", "p0": p0, "p2": p2}
@@ -0,0 +1,83 @@
+# ml/management/commands/bench_menu_reco_pipeline.py
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.menu_reco.bench.pipeline import DEFAULT_SIZES, compare_to_baseline, run_pipeline_benchmark, same_host
+from ml.menu_reco.common.io import load_json, save_json
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / "menu_reco" / "bench" / "baselines" / "pipeline.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the menu_reco pipeline (Phase1, Phase2 attach, Phase3 rerank, end-to-end "
+        "recommend_and_commit with an in-memory db_repo) on seeded synthetic artifacts. "
+        "Reports p50/p95 latency, per-call peak allocation and peak RSS per stage, and compares "
+        "against a JSON baseline. The baseline records the host it was measured on; latency is "
+        "only compared on the same host (other hosts compare allocations only). The committed "
+        "baseline is written once per reference host, not regenerated with feature changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=str, default=",".join(str(s) for s in DEFAULT_SIZES),
+            help="Comma-separated food counts (default: 1000,10000,100000).",
+        )
+        parser.add_argument("--n", type=int, default=100, help="Requests per size.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--n-jobs", type=int, default=1, help="Phase2 clustering workers for artifact build.")
+        parser.add_argument("--alloc-sample", type=int, default=30, help="Calls per stage traced with tracemalloc.")
+        parser.add_argument("--baseline", type=str, default=str(DEFAULT_BASELINE))
+        parser.add_argument(
+            "--save-baseline", action="store_true",
+            help="Write results as the baseline (refuses to overwrite an existing one without --force).",
+        )
+        parser.add_argument("--force", action="store_true", help="Allow --save-baseline to overwrite.")
+        parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative regression (0.5 = +50%%).")
+        parser.add_argument("--out", type=str, default="", help="Also write results JSON here.")
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in str(options["sizes"]).split(",") if s.strip()]
+        res = run_pipeline_benchmark(
+            sizes=sizes,
+            n_requests=options["n"],
+            seed=options["seed"],
+            n_jobs=options["n_jobs"],
+            alloc_sample=options["alloc_sample"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(json.dumps(res, ensure_ascii=False, indent=2))
+        if options.get("out"):
+            save_json(res, Path(options["out"]))
+
+        baseline_path = Path(options["baseline"])
+        if options.get("save_baseline"):
+            if baseline_path.exists() and not options.get("force"):
+                raise CommandError(f"Baseline exists: {baseline_path} (use --force to overwrite).")
+            save_json(res, baseline_path)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved: {baseline_path}"))
+            return
+
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(f"No baseline at {baseline_path} (use --save-baseline)."))
+            return
+
+        baseline = load_json(baseline_path)
+        if not same_host(res, baseline):
+            self.stdout.write(self.style.WARNING(
+                f"[BENCH] host differs from baseline ({baseline.get('meta', {}).get('host')}); "
+                "comparing allocations only, latency skipped."
+            ))
+        regressions = compare_to_baseline(res, baseline, tolerance=options["tolerance"])
+        if regressions:
+            for r in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f"[BENCH][REGRESSION] n_foods={r['size']} stage={r['stage']} {r['metric']} "
+                    f"{r['baseline']} -> {r['current']} (x{r['ratio']})"
+                ))
+            raise CommandError(f"{len(regressions)} benchmark regression(s) vs {baseline_path}")
+        self.stdout.write(self.style.SUCCESS(f"No regressions vs {baseline_path} (tolerance={options['tolerance']})."))
@@ -0,0 +1,27 @@
+# ml/management/commands/bench_phase1_catalog.py
+from __future__ import annotations
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from ml.menu_reco.bench.phase1_alloc import run_phase1_alloc_benchmark
+from ml.menu_reco.service import _load_artifacts_cached, _map_phase1_cfg
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark Phase1 single-user recommend: DataFrame path vs FoodCatalog path "
+        "(per-request peak allocation via tracemalloc, p50/p95 latency)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--n", type=int, default=200, help="Number of requests.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        phase1, _phase2, _logs, _phase3 = _load_artifacts_cached()
+        res = run_phase1_alloc_benchmark(
+            phase1, _map_phase1_cfg(phase1), n_requests=options["n"], seed=options["seed"],
+        )
+        self.stdout.write(json.dumps(res, ensure_ascii=False, indent=2))
@@ -0,0 +1,156 @@
+# ml/management/commands/build_menu_reco_phase1.py
+from __future__ import annotations
+
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.menu_reco import db_repo
+from ml.menu_reco.common.config import AppConfig
+from ml.menu_reco.common.io import (
+    active_phase1_dir,
+    arrow_path_for,
+    load_json,
+    load_parquet,
+    new_phase1_staging_dir,
+    prune_phase1_versions,
+    publish_phase1_version,
+    save_arrow,
+    save_arrow_strings,
+    save_json,
+    save_parquet,
+)
+from ml.menu_reco.domain.phase1.incremental import (
+    add_new_foods,
+    apply_log_delta,
+    assemble_phase1_frames,
+    seed_state_from_artifacts,
+)
+
+STATE_DIR = "_state"
+
+# FOOD_TB / 이벤트 컬럼 -> phase1 컬럼
+NUT_RENAME = {"name": "Food", "food": "Food", "kcal": "Calories", "carb_g": "food_carb_g",
+              "protein_g": "food_prot_g", "fat_g": "food_fat_g"}
+LOG_RENAME = {"mood": "Mood", "energy": "Energy", "food": "Food"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Incrementally update menu_reco Phase1 artifacts (food_stats, ctx_food_all, bad_foods, "
+        "unobserved_pool) from CUS_FOOD_TH/CUS_FEEL_TH/FOOD_TB rows newer than the last build "
+        "watermark, and publish them as a new versioned directory (phase1_versions/<version>). "
+        "The first run on artifacts without _state/build.json needs --since set to the time the current "
+        "artifacts' training data ends; otherwise events already counted in them would be added again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--artifacts-dir", type=str, default="", help="Artifacts root (default: AppConfig ARTIFACT_DIR).")
+        parser.add_argument(
+            "--since", type=str, default="",
+            help="Override event watermark (YYYYMMDDHHMMSS). Required on the first run (no _state/build.json).",
+        )
+        parser.add_argument("--keep", type=int, default=5, help="Number of phase1 versions to keep (0 = keep all).")
+        parser.add_argument("--force", action="store_true", help="Publish a new version even if there is no delta.")
+        parser.add_argument("--dry-run", action="store_true", help="Compute and report only, do not write.")
+
+    def handle(self, *args, **options):
+        raw = (options.get("artifacts_dir") or "").strip()
+        artifacts_dir = Path(raw) if raw else AppConfig().resolve_artifacts_dir(Path(settings.BASE_DIR))
+        parent_dir = active_phase1_dir(artifacts_dir)
+        state_dir = parent_dir / STATE_DIR
+
+        meta = load_json(state_dir / "build.json") if (state_dir / "build.json").exists() else {}
+        since = (options.get("since") or "").strip() or meta.get("event_watermark") or ""
+        if not since:
+            # 처음(build.json 없음)엔 부모 artifacts가 이미 집계한 이벤트를 다시 더하지 않도록 시작점을 직접 받는다
+            raise CommandError(
+                f"no build state in {state_dir}: pass --since YYYYMMDDHHMMSS "
+                "(end of the data the current artifacts were trained on)"
+            )
+        if len(since) != 14 or not since.isdigit():
+            raise CommandError("--since must be YYYYMMDDHHMMSS")
+        food_wm = int(meta.get("food_id_watermark") or 0)
+        until = datetime.now().strftime("%Y%m%d%H%M%S")
+
+        parent = {
+            "food_stats": load_parquet(parent_dir / "food_stats.parquet"),
+            "ctx_food_all": load_parquet(parent_dir / "ctx_food_all.parquet"),
+            "unobserved_pool": load_parquet(parent_dir / "unobserved_pool.parquet"),
+        }
+        ctx_sums_path = state_dir / "ctx_sums.parquet"
+        state = seed_state_from_artifacts(
+            parent, ctx_sums=load_parquet(ctx_sums_path) if ctx_sums_path.exists() else None,
+        )
+        self.stdout.write(
+            f"[PHASE1_INC] parent={parent_dir.name} since={since} until={until} food_id>{food_wm} "
+            f"seeded={'state' if ctx_sums_path.exists() else 'artifacts'}"
+        )
+
+        foods = pd.DataFrame(db_repo.fetch_foods_after(food_wm))
+        events = pd.DataFrame(db_repo.fetch_meal_feel_events(since, until))
+
+        n_foods = 0
+        if not foods.empty:
+            n_foods += add_new_foods(state, foods.rename(columns=NUT_RENAME))
+            food_wm = int(foods["food_id"].max())
+        n_logs = 0
+        if not events.empty:
+            # 로그에만 있는(카탈로그에 없는) 음식은 FOOD_TB 영양값으로 추가
+            n_foods += add_new_foods(state, events.rename(columns=NUT_RENAME))
+            n_logs = apply_log_delta(state, events.rename(columns=LOG_RENAME))
+
+        self.stdout.write(f"[PHASE1_INC] delta logs={n_logs} new_foods={n_foods}")
+        if n_logs == 0 and n_foods == 0 and not options.get("force"):
+            self.stdout.write(self.style.SUCCESS("No delta. Nothing published."))
+            return
+
+        frames = assemble_phase1_frames(state)
+        self.stdout.write(
+            f"[PHASE1_INC] food_stats={len(frames['food_stats'])} ctx_food_all={len(frames['ctx_food_all'])} "
+            f"bad_foods={len(frames['bad_foods'])} unobserved_pool={len(frames['unobserved_pool'])}"
+        )
+        if options.get("dry_run"):
+            self.stdout.write(self.style.SUCCESS("Dry run. Nothing written."))
+            return
+
+        version = until
+        staging = new_phase1_staging_dir(artifacts_dir, version)
+        try:
+            for name in ("food_stats", "ctx_food_all", "unobserved_pool"):
+                save_parquet(frames[name], staging / f"{name}.parquet")
+            save_json(frames["bad_foods"], staging / "bad_foods.json")
+            # user_pref/config는 이 빌드 대상이 아니므로 부모 버전 그대로
+            for name in ("user_pref.parquet", "config.json"):
+                shutil.copy2(parent_dir / name, staging / name)
+
+            if AppConfig().USE_ARROW_MMAP:
+                for name in ("food_stats", "ctx_food_all", "unobserved_pool"):
+                    save_arrow(frames[name], arrow_path_for(staging / f"{name}.parquet"))
+                save_arrow(load_parquet(staging / "user_pref.parquet"), arrow_path_for(staging / "user_pref.parquet"))
+                save_arrow_strings(frames["bad_foods"], arrow_path_for(staging / "bad_foods.json"))
+
+            save_parquet(state["ctx_sums"], staging / STATE_DIR / "ctx_sums.parquet")
+            save_json(
+                {
+                    "version": version,
+                    "parent": parent_dir.name,
+                    "event_watermark": until,
+                    "food_id_watermark": food_wm,
+                    "delta_logs": n_logs,
+                    "new_foods": n_foods,
+                },
+                staging / STATE_DIR / "build.json",
+            )
+            vdir = publish_phase1_version(artifacts_dir, staging, version)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        removed = prune_phase1_versions(artifacts_dir, int(options.get("keep") or 0))
+        self.stdout.write(f"[PHASE1_INC] published={vdir} pruned={len(removed)}")
+        self.stdout.write(self.style.SUCCESS(f"Done. active phase1 version={version}"))
@@ -0,0 +1,96 @@
+# ml/management/commands/cluster_menu_reco_phase2.py
+from __future__ import annotations
+
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ml.menu_reco.common.config import AppConfig, Phase2Config
+from ml.menu_reco.common.io import (
+    active_phase1_dir,
+    active_phase_dir,
+    arrow_path_for,
+    load_parquet,
+    new_staging_dir,
+    prune_versions,
+    publish_version,
+    save_arrow,
+    save_parquet,
+)
+from ml.menu_reco.common.ssot import normalize_energy_label, normalize_mood_label
+from ml.menu_reco.domain.phase2.clustering import fit_phase2_clustering
+
+
+def _normalize_labels(df):
+    if df is None or df.empty:
+        return df
+    df = df.copy()
+    df["Mood"] = df["Mood"].map({u: normalize_mood_label(u) for u in df["Mood"].unique()})
+    df["Energy"] = df["Energy"].map({u: normalize_energy_label(u) for u in df["Energy"].unique()})
+    return df
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit menu_reco Phase2 clusters per (Mood, Energy) in a process pool, warm-started from the "
+        "previous cluster_meta centroids, and publish clustered/cluster_meta/scaler as a new versioned "
+        "directory (phase2_versions/<version>, switched via the CURRENT pointer so workers never mix files)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--artifacts-dir", type=str, default="", help="Artifacts root (default: AppConfig ARTIFACT_DIR).")
+        parser.add_argument("--n-jobs", type=int, default=os.cpu_count() or 1, help="Worker processes.")
+        parser.add_argument("--cold", action="store_true", help="Ignore previous centroids (n_init=10 from scratch).")
+        parser.add_argument("--keep", type=int, default=5, help="Number of phase2 versions to keep (0 = keep all).")
+
+    def handle(self, *args, **options):
+        raw = (options.get("artifacts_dir") or "").strip()
+        artifacts_dir = Path(raw) if raw else AppConfig().resolve_artifacts_dir(Path(settings.BASE_DIR))
+        phase2_dir = active_phase_dir(artifacts_dir, "phase2")
+        cfg = Phase2Config()
+
+        ctx = _normalize_labels(load_parquet(active_phase1_dir(artifacts_dir) / "ctx_food_all.parquet"))
+        prev_meta = None
+        if not options.get("cold") and (phase2_dir / "cluster_meta.parquet").exists():
+            prev_meta = _normalize_labels(load_parquet(phase2_dir / "cluster_meta.parquet"))
+
+        t0 = time.perf_counter()
+        clustered, meta, scaler = fit_phase2_clustering(
+            ctx, cfg, n_jobs=int(options["n_jobs"]), prev_cluster_meta=prev_meta,
+        )
+        elapsed = time.perf_counter() - t0
+
+        # 세 파일을 staging에 다 쓴 뒤 CURRENT 교체 (live 디렉토리를 파일 단위로 바꾸지 않음)
+        version = datetime.now().strftime("%Y%m%d%H%M%S")
+        staging = new_staging_dir(artifacts_dir, "phase2", version)
+        frames = {"clustered": clustered, "cluster_meta": meta, "scaler": scaler}
+        try:
+            for name, df in frames.items():
+                path = staging / f"{name}.parquet"
+                save_parquet(df, path)
+                if AppConfig().USE_ARROW_MMAP:
+                    save_arrow(df, arrow_path_for(path))
+                self.stdout.write(f"[PHASE2] {name} rows={len(df)}")
+            # config.json 등 이번에 새로 만들지 않은 파일은 이전 버전 그대로
+            rewritten = {f"{n}.parquet" for n in frames} | {arrow_path_for(Path(f"{n}.parquet")).name for n in frames}
+            if phase2_dir.is_dir():
+                for p in phase2_dir.iterdir():
+                    if p.is_file() and p.name not in rewritten and not p.name.startswith("."):
+                        shutil.copy2(p, staging / p.name)
+            vdir = publish_version(artifacts_dir, "phase2", staging, version)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        removed = prune_versions(artifacts_dir, "phase2", int(options.get("keep") or 0))
+        self.stdout.write(f"[PHASE2] published={vdir} pruned={len(removed)}")
+
+        warm = int(scaler["warm_start"].sum()) if not scaler.empty else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. contexts={len(scaler)} warm_start={warm} n_jobs={options['n_jobs']} fit_sec={elapsed:.2f}"
+        ))
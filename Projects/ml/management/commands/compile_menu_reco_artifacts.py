@@ -0,0 +1,37 @@
+# ml/management/commands/compile_menu_reco_artifacts.py
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ml.menu_reco.common.config import AppConfig
+from ml.menu_reco.common.io import compile_artifacts_to_arrow
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile menu_reco parquet/json artifacts into uncompressed Arrow IPC (.arrow) files "
+        "that gunicorn workers memory-map read-only (the loaded artifact columns share the page cache; "
+        "near-instant cold load), plus the Food name dictionary (phase1/food_vocab.arrow) that assigns dense int ids. "
+        "Structures derived at load time (candidate index, Food catalogs, grid index, lookups) are still "
+        "built per worker in private memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--artifacts-dir",
+            type=str,
+            default="",
+            help="Artifacts root (default: AppConfig ARTIFACT_DIR).",
+        )
+
+    def handle(self, *args, **options):
+        raw = (options.get("artifacts_dir") or "").strip()
+        artifacts_dir = Path(raw) if raw else AppConfig().resolve_artifacts_dir(Path(settings.BASE_DIR))
+
+        written = compile_artifacts_to_arrow(artifacts_dir)
+        for p in written:
+            self.stdout.write(f"[ARROW] {p}")
+        self.stdout.write(self.style.SUCCESS(f"Done. files={len(written)} dir={artifacts_dir}"))
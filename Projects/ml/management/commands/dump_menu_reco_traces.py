@@ -0,0 +1,58 @@
+# ml/management/commands/dump_menu_reco_traces.py
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from ml.menu_reco.common.config import AppConfig
+from ml.menu_reco.trace import TRACE_FILE_PREFIX, load_trace_files, merge, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Dump the per-stage timing histogram of recommend_and_commit, merged over every serving worker's "
+        "trace file (written every MENU_RECO_TRACE_FLUSH_SEC to MENU_RECO_TRACE_DIR). "
+        "For a single live worker use GET /api/menu/traces instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", type=str, default="", help="Trace directory (default: AppConfig().trace_dir).")
+        parser.add_argument(
+            "--max-age-sec", type=float, default=3600.0,
+            help="Ignore worker files not updated within this many seconds (0 = all).",
+        )
+        parser.add_argument("--json", action="store_true", help="Print the merged summary as JSON.")
+        parser.add_argument("--clear", action="store_true", help="Delete the worker files after dumping.")
+
+    def handle(self, *args, **options):
+        trace_dir = Path(options.get("dir") or AppConfig().trace_dir)
+        snaps = load_trace_files(trace_dir, max_age_sec=float(options.get("max_age_sec") or 0))
+        merged = merge(snaps)
+        stages = summarize(merged)
+
+        if options.get("json"):
+            out = {"dir": str(trace_dir), "workers": merged["workers"], "calls": merged["calls"],
+                   "status": merged["status"], "stages": stages}
+            self.stdout.write(json.dumps(out, indent=2, ensure_ascii=False))
+        else:
+            self.stdout.write(
+                f"[TRACES] dir={trace_dir} workers={merged['workers']} calls={merged['calls']} status={merged['status']}"
+            )
+            total = next((r["mean_ms"] for r in stages if r["stage"] == "total"), 0.0)
+            self.stdout.write(
+                f"{'stage':<16}{'count':>8}{'mean_ms':>10}{'share':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>10}{'rows':>7}"
+            )
+            for r in stages:
+                share = f"{r['mean_ms'] * r['count'] / (total * merged['calls']):.0%}" \
+                    if total and merged["calls"] and r["stage"] != "total" else ""
+                self.stdout.write(
+                    f"{r['stage']:<16}{r['count']:>8}{r['mean_ms']:>10.2f}{share:>8}{r['p50_ms']:>9.2f}"
+                    f"{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['max_ms']:>10.2f}{r['rows_mean']:>7.1f}"
+                )
+
+        if options.get("clear"):
+            for p in trace_dir.glob(f"{TRACE_FILE_PREFIX}*.json"):
+                p.unlink(missing_ok=True)
+            self.stdout.write(f"[TRACES] cleared {trace_dir}")
@@ -0,0 +1,48 @@
+# ml/management/commands/pregen_menu_reco.py
+from __future__ import annotations
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.menu_reco.pregen import run_pregen
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-generate next-slot menu recommendations (P/H/E) for every user with meal+mood records on --date "
+        "(default: today; run after the 20:00 window). Users are processed in cust_id order, --chunk-size at a "
+        "time, with batched Phase1-3 and multi-row MENU_RECOM_TH upserts. Targets that already have rows are "
+        "skipped unless --force, so an interrupted run can simply be restarted (or resumed with --after)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=str, default="", help="Record date (YYYYMMDD, default: today).")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Users per chunk.")
+        parser.add_argument("--after", type=str, default="", help="Resume after this cust_id (see last= in the log).")
+        parser.add_argument("--limit", type=int, default=0, help="Max users to process (0 = all).")
+        parser.add_argument("--force", action="store_true", help="Recompute targets that already have rows.")
+        parser.add_argument("--dry-run", action="store_true", help="Compute only, do not write MENU_RECOM_TH.")
+
+    def handle(self, *args, **options):
+        rgs_dt = (options.get("date") or "").strip() or date.today().strftime("%Y%m%d")
+        if len(rgs_dt) != 8 or not rgs_dt.isdigit():
+            raise CommandError("--date must be YYYYMMDD")
+        chunk_size = int(options.get("chunk_size") or 0)
+        if chunk_size <= 0:
+            raise CommandError("--chunk-size must be > 0")
+
+        stats = run_pregen(
+            rgs_dt,
+            chunk_size=chunk_size,
+            after=(options.get("after") or "").strip(),
+            limit=max(0, int(options.get("limit") or 0)),
+            force=bool(options.get("force")),
+            dry_run=bool(options.get("dry_run")),
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"[PREGEN][DONE] date={rgs_dt} users={stats['users']} computed={stats['computed']} "
+            f"skipped={stats['skipped']} empty={stats['empty']} failed={stats['failed']} rows={stats['rows']} "
+            f"last={stats['last']} sec={stats['sec']}"
+        ))
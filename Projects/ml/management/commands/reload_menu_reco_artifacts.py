@@ -0,0 +1,43 @@
+# ml/management/commands/reload_menu_reco_artifacts.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.menu_reco.registry import version_of
+from ml.menu_reco.service import (
+    ARTIFACTS,
+    _artifacts_dir,
+    _artifacts_fingerprint,
+    request_artifacts_reload,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Force a menu_reco artifacts reload: touch the RELOAD marker so every serving worker "
+        "hot-swaps on its next check, and load/validate the new version in this process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-validate",
+            action="store_true",
+            help="Only touch the marker (skip the in-process load/validation).",
+        )
+
+    def handle(self, *args, **options):
+        marker = request_artifacts_reload()
+        version = version_of(_artifacts_fingerprint(_artifacts_dir()))
+        self.stdout.write(f"[ARTIFACTS] marker={marker} version={version}")
+
+        if not options.get("no_validate"):
+            try:
+                bundle = ARTIFACTS.reload(force=True)
+            except Exception as e:
+                # worker들은 검증 실패 시 기존 버전을 유지한다
+                raise CommandError(f"artifacts validation failed (workers keep previous version): {e}") from e
+            self.stdout.write(f"[ARTIFACTS] validated version={bundle.version} load_sec={bundle.load_sec:.2f}")
+
+        self.stdout.write(self.style.SUCCESS(
+            "Done. workers swap on next check (MENU_RECO_ARTIFACT_CHECK_TTL_SEC)."
+        ))
@@ -0,0 +1,94 @@
+# ml/management/commands/replay_menu_reco.py
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml.menu_reco.bench.replay import (
+    build_decision_points,
+    export_replay_snapshot,
+    load_replay_snapshot,
+    replay_configs,
+    resolve_configs,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Offline replay of historical (user, context, slot) decision points against candidate "
+        "Phase1Config/Phase3Config settings. Reads a CUS_FOOD_TH/CUS_FEEL_TH snapshot (parquet dir or .sqlite), "
+        "runs the batched Phase1-3 pipeline over the current artifacts (optionally in parallel) and reports "
+        "hit-rate against what users actually ate next, plus latency, per config. "
+        "Use --export to write the snapshot from the DB first. Prefer a period after the artifacts' training data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--snapshot", type=str, required=True, help="Snapshot path (parquet dir or .sqlite/.db).")
+        parser.add_argument("--export", action="store_true", help="Export --since..--until from the DB to --snapshot first.")
+        parser.add_argument("--since", type=str, default="", help="First decision date (YYYYMMDD).")
+        parser.add_argument("--until", type=str, default="", help="Last decision date (YYYYMMDD).")
+        parser.add_argument(
+            "--configs", type=str, default="",
+            help='JSON file: {"name": {"phase1": {"W_GLOBAL": 0.2}, "phase3": {"alpha": 0.5, "w_map": {...}}}}. '
+                 "'baseline' (current artifacts config) is always included.",
+        )
+        parser.add_argument("--max-points", type=int, default=0, help="Sample at most this many decision points.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--workers", type=int, default=1, help="Worker processes.")
+        parser.add_argument("--chunk-points", type=int, default=256, help="Decision points per task.")
+        parser.add_argument("--out", type=str, default="", help="Write the report JSON here.")
+
+    def handle(self, *args, **options):
+        snapshot = Path(options["snapshot"])
+        since, until = (options.get("since") or "").strip(), (options.get("until") or "").strip()
+        for v in (since, until):
+            if v and (len(v) != 8 or not v.isdigit()):
+                raise CommandError("--since/--until must be YYYYMMDD")
+
+        if options.get("export"):
+            if not since or not until:
+                raise CommandError("--export needs --since and --until")
+            counts = export_replay_snapshot(snapshot, since, until)
+            self.stdout.write(f"[REPLAY][EXPORT] {snapshot} " + " ".join(f"{k}={v}" for k, v in counts.items()))
+
+        spec = {}
+        if options.get("configs"):
+            try:
+                spec = json.loads(Path(options["configs"]).read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                raise CommandError(f"cannot read --configs: {e}") from e
+
+        from ml.menu_reco.service import ARTIFACTS
+
+        payload = ARTIFACTS.get().payload
+        try:
+            configs = resolve_configs(payload[0], spec)
+        except TypeError as e:
+            raise CommandError(f"invalid config field: {e}") from e
+
+        points = build_decision_points(
+            load_replay_snapshot(snapshot), since=since, until=until,
+            max_points=int(options["max_points"] or 0), seed=int(options["seed"]),
+        )
+        if not points:
+            raise CommandError("no decision points (need meal+mood records followed by a recorded next meal)")
+        self.stdout.write(f"[REPLAY] points={len(points)} configs={list(configs)} workers={options['workers']}")
+
+        report = replay_configs(
+            points, payload, configs, workers=int(options["workers"]), chunk_points=int(options["chunk_points"]),
+        )
+        for name, r in report["configs"].items():
+            by_type = " ".join(f"{k}={v:.3f}" for k, v in r["hit_rate_by_type"].items())
+            self.stdout.write(
+                f"{name:<20} hit={r['hit_rate']:.4f} ({by_type}) coverage={r['coverage']:.3f} "
+                f"uniq={r['unique_foods']} chunk_p50={r['p50_chunk_ms_per_point']:.2f}ms/pt "
+                f"chunk_p95={r['p95_chunk_ms_per_point']:.2f}ms/pt "
+                f"{r['points_per_sec']:.0f} pts/s"
+            )
+        self.stdout.write(f"[REPLAY] total_sec={report['total_sec']}")
+
+        if options.get("out"):
+            Path(options["out"]).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+            self.stdout.write(f"[REPLAY] wrote {options['out']}")
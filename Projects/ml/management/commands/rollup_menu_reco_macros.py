@@ -0,0 +1,41 @@
+# ml/management/commands/rollup_menu_reco_macros.py
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ml.menu_reco import db_repo
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-user daily macro rollup (CUS_MACRO_DAILY_TH) from CUS_FOOD_TH for a date range "
+        "(default: the last 8 days up to yesterday). Used by get_user_reco_snapshot when "
+        "MENU_RECO_MACRO_ROLLUP=true, so the 7-day macro sum reads at most 7 rows per user."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--until", type=str, default="", help="Last day to roll up (YYYYMMDD, default: yesterday).")
+        parser.add_argument("--days", type=int, default=8, help="Number of days ending at --until to rebuild.")
+        parser.add_argument("--create-table", action="store_true", help="Create CUS_MACRO_DAILY_TH if missing.")
+
+    def handle(self, *args, **options):
+        yesterday = (date.today() - timedelta(days=1)).strftime("%Y%m%d")
+        until = (options.get("until") or "").strip() or yesterday
+        if len(until) != 8 or not until.isdigit():
+            raise CommandError("--until must be YYYYMMDD")
+        if until > yesterday:
+            # 오늘 행은 snapshot이 CUS_FOOD_TH에서 직접 읽으므로 rollup은 어제까지만
+            raise CommandError(f"--until must be <= yesterday ({yesterday})")
+        days = max(1, int(options.get("days") or 1))
+        since = db_repo._ymd_shift(until, -(days - 1))
+
+        if options.get("create_table"):
+            with connection.cursor() as cur:
+                cur.execute(db_repo.MACRO_DAILY_DDL)
+            self.stdout.write(f"[MACRO_ROLLUP] ensured table {db_repo.MACRO_DAILY_TABLE}")
+
+        n = db_repo.rebuild_macro_daily_rollup(since, until)
+        self.stdout.write(self.style.SUCCESS(f"[MACRO_ROLLUP] {since}..{until} rows={n}"))
@@ -1,13 +1,18 @@
 # ml/management/commands/run_8pm_batch_prediction.py
 from __future__ import annotations
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from ml.lstm.batch import run_8pm_batch_prediction
+from ml.lstm.batch import DEFAULT_CHUNK_USERS, run_8pm_batch_prediction
 
 
 class Command(BaseCommand):
-    help = "Run 20:00 backup batch: create next-slot negative emotion prediction for users with today's TS."
+    help = (
+        "Run 20:00 backup batch: create next-slot negative emotion prediction for users with today's TS. "
+        "Users are processed in chunks by a worker pool; finished chunks are recorded in "
+        "CUS_FEEL_RISK_BATCH_CK (created on first use) so a rerun for the same --date only processes "
+        "the remaining users. If the table cannot be created the batch runs without checkpoints."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -15,8 +20,44 @@ class Command(BaseCommand):
             action="store_true",
             help="Run even if before 20:00 (debug).",
         )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_USERS,
+            help="Users per bulk query / forward pass / upsert.",
+        )
+        parser.add_argument(
+            "--infer-batch",
+            type=int,
+            default=4096,
+            help="Max sequences per LSTM forward call.",
+        )
+        parser.add_argument("--workers", type=int, default=1, help="Chunks processed in parallel (threads).")
+        parser.add_argument("--date", type=str, default="", help="Batch date YYYYMMDD (default: today; resume after midnight).")
+        parser.add_argument("--no-checkpoint", action="store_true", help="Do not read or write chunk checkpoints.")
+        parser.add_argument("--restart", action="store_true", help="Clear this date's checkpoints and start over.")
 
     def handle(self, *args, **options):
         force = bool(options.get("force"))
-        result = run_8pm_batch_prediction(force=force)
+        batch_dt = (options.get("date") or "").strip()
+        if batch_dt and (len(batch_dt) != 8 or not batch_dt.isdigit()):
+            raise CommandError("--date must be YYYYMMDD")
+
+        result = run_8pm_batch_prediction(
+            force=force,
+            chunk_size=int(options["chunk_size"]),
+            infer_batch=int(options["infer_batch"]),
+            workers=int(options["workers"]),
+            checkpoint=not options.get("no_checkpoint"),
+            restart=bool(options.get("restart")),
+            batch_dt=batch_dt or None,
+        )
+        results = result.pop("results", [])
+        for r in results:
+            if not r.get("ok"):
+                self.stdout.write(f"[{r.get('cust_id')}] {r.get('reason')}")
+        if result.get("failed_chunks"):
+            self.stdout.write(self.style.WARNING(
+                f"[BATCH] failed chunks {result['failed_chunks']} - rerun with the same --date to retry them"
+            ))
         self.stdout.write(self.style.SUCCESS(str(result)))
@@ -0,0 +1,89 @@
+# ml/menu_reco/bench/phase1_alloc.py
+from __future__ import annotations
+
+import time
+import tracemalloc
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from ml.menu_reco.common.config import Phase1Config
+from ml.menu_reco.domain.phase1.rule_based import recommend_phase1_2plus1
+
+CATALOG_KEYS = ("candidate_catalogs", "unobserved_catalog")
+CONTEXTS: List[Tuple[str, str]] = [(m, e) for m in ("pos", "neu", "neg") for e in ("low", "med", "hig")]
+
+
+def _requests(artifacts: Dict[str, Any], n: int, seed: int) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    foods = artifacts["ctx_food_all"]["Food"].astype(str).unique()
+    reqs = []
+    for i in range(n):
+        m, e = CONTEXTS[i % len(CONTEXTS)]
+        reqs.append({
+            "mood": m,
+            "energy": e,
+            "history_foods": list(rng.choice(foods, size=min(5, len(foods)), replace=False)),
+            "user_vec_override": rng.dirichlet([1, 1, 1]),
+            "per_meal_target_override": float(rng.uniform(200, 900)),
+            "purpose_override": int(rng.integers(0, 3)),
+        })
+    return reqs
+
+
+def _run(artifacts: Dict[str, Any], cfg: Phase1Config, reqs: List[Dict[str, Any]]) -> Dict[str, float]:
+    # warm-up 1회 (lazy import/캐시 영향 제외)
+    recommend_phase1_2plus1(artifacts, "bench", cfg=cfg, **reqs[0])
+
+    peaks, lat = [], []
+    tracemalloc.start()
+    try:
+        for r in reqs:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            t0 = time.perf_counter()
+            recommend_phase1_2plus1(artifacts, "bench", cfg=cfg, **r)
+            lat.append(time.perf_counter() - t0)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+    finally:
+        tracemalloc.stop()
+
+    lat_ms = np.asarray(lat) * 1000.0
+    peak_kb = np.asarray(peaks) / 1024.0
+    return {
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat_ms, 95)), 3),
+        "peak_alloc_kb_mean": round(float(peak_kb.mean()), 1),
+        "peak_alloc_kb_max": round(float(peak_kb.max()), 1),
+    }
+
+
+def run_phase1_alloc_benchmark(
+    artifacts: Dict[str, Any],
+    cfg: Phase1Config,
+    n_requests: int = 200,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Phase1 단건 추천을 DataFrame 경로(catalog 없음) vs FoodCatalog 경로로 같은 요청 세트에 돌려
+    요청당 peak 할당량(tracemalloc)과 latency를 비교한다.
+    - artifacts에는 build_food_catalogs까지 끝난 phase1 artifacts를 넘긴다
+    """
+    if not all(k in artifacts for k in CATALOG_KEYS):
+        raise ValueError("artifacts must include candidate_catalogs/unobserved_catalog (build_food_catalogs)")
+
+    reqs = _requests(artifacts, n_requests, seed)
+    legacy = {k: v for k, v in artifacts.items() if k not in CATALOG_KEYS}
+
+    frame_res = _run(legacy, cfg, reqs)
+    catalog_res = _run(artifacts, cfg, reqs)
+    return {
+        "n_requests": n_requests,
+        "dataframe": frame_res,
+        "catalog": catalog_res,
+        "peak_alloc_ratio": round(
+            frame_res["peak_alloc_kb_mean"] / max(catalog_res["peak_alloc_kb_mean"], 1e-9), 2
+        ),
+        "p50_speedup": round(frame_res["p50_ms"] / max(catalog_res["p50_ms"], 1e-9), 2),
+    }
@@ -0,0 +1,312 @@
+# ml/menu_reco/bench/pipeline.py
+from __future__ import annotations
+
+import contextlib
+import gc
+import io
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from ml.menu_reco import service
+from ml.menu_reco.bench.phase1_alloc import _requests
+from ml.menu_reco.bench.repo import InMemoryRepo
+from ml.menu_reco.bench.synthetic import make_synthetic_artifacts
+from ml.menu_reco.domain.phase1.rule_based import recommend_phase1_2plus1
+from ml.menu_reco.domain.phase2.clustering import attach_cluster_info
+from ml.menu_reco.registry import ArtifactRegistry
+from ml.menu_reco.result_cache import RecoResultCache
+
+try:
+    import resource  # unix only
+except ImportError:  # pragma: no cover
+    resource = None
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+STAGES = ("phase1", "phase2_attach", "phase3_rerank", "end_to_end")
+SLOTS = ("M", "L", "D")
+
+# baseline 비교 metric -> 이 값 이하 차이는 노이즈로 보고 무시
+# (p95는 리포트만, 비교는 흔들림이 적은 p50 + 결정적인 할당량으로)
+REGRESSION_FLOORS = {"p50_ms": 1.0, "peak_alloc_kb_mean": 16.0}
+# 시간 metric은 baseline과 같은 host에서 잰 경우에만 비교 (다른 머신이면 할당량만 비교)
+TIMING_METRICS = ("p50_ms",)
+HOST_KEYS = ("machine", "cpu_model", "cpu_count", "python", "numpy", "pandas")
+
+
+def _rss_peak_mb() -> Optional[float]:
+    """프로세스 최대 RSS(high-water mark, MB). linux ru_maxrss 단위는 KB"""
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() == "Darwin":
+        kb = kb / 1024.0
+    return round(kb / 1024.0, 1)
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or ""
+
+
+def host_meta() -> Dict[str, Any]:
+    """baseline을 잰 환경 (시간 metric 비교 가능 여부 판단용)"""
+    return {
+        "machine": f"{platform.system()} {platform.machine()}",
+        "cpu_model": _cpu_model(),
+        "cpu_count": os.cpu_count() or 1,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def _calibrate_ms(repeat: int = 7) -> float:
+    """
+    고정 workload(pandas 필터/정렬 + numpy 연산)의 p50 ms.
+    같은 host라도 부하에 따라 속도가 흔들리므로 size마다 재서 baseline 시간을 이 비율로 보정한다.
+    """
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.random(20_000), "b": rng.integers(0, 50, 20_000)})
+    ms = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        sub = df[df["a"] > 0.3]
+        sub.sort_values("a").groupby("b")["a"].sum()
+        np.argsort(rng.random(20_000))
+        ms.append((time.perf_counter() - t0) * 1000.0)
+    return round(float(np.median(ms)), 3)
+
+
+def same_host(current: Dict[str, Any], baseline: Dict[str, Any]) -> bool:
+    a = current.get("meta", {}).get("host") or {}
+    b = baseline.get("meta", {}).get("host") or {}
+    return bool(a) and all(a.get(k) == b.get(k) for k in HOST_KEYS)
+
+
+def _measure(fn: Callable[[Any], Any], inputs: Sequence[Any], alloc_sample: int) -> Dict[str, Any]:
+    """
+    stage 1개 측정.
+    - latency: tracemalloc 없이 전체 inputs
+    - 할당량: tracemalloc으로 앞쪽 alloc_sample개만(추적 오버헤드가 latency에 섞이지 않게 분리)
+    반환 outputs는 다음 stage 입력으로 쓴다.
+    """
+    gc.collect()
+    rss_before = _rss_peak_mb()
+    fn(inputs[0])  # warm-up
+
+    outputs, lat = [], []
+    for x in inputs:
+        t0 = time.perf_counter()
+        outputs.append(fn(x))
+        lat.append(time.perf_counter() - t0)
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for x in inputs[: max(1, alloc_sample)]:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            fn(x)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - base)
+    finally:
+        tracemalloc.stop()
+
+    rss_after = _rss_peak_mb()
+    lat_ms = np.asarray(lat) * 1000.0
+    peak_kb = np.asarray(peaks) / 1024.0
+    return {
+        "n": len(inputs),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat_ms, 95)), 3),
+        "mean_ms": round(float(lat_ms.mean()), 3),
+        "peak_alloc_kb_mean": round(float(peak_kb.mean()), 1),
+        "peak_alloc_kb_max": round(float(peak_kb.max()), 1),
+        "rss_peak_mb": rss_after,
+        "rss_growth_mb": (
+            round(rss_after - rss_before, 1) if rss_after is not None and rss_before is not None else None
+        ),
+        "outputs": outputs,
+    }
+
+
+@contextlib.contextmanager
+def bench_service(payload: tuple, repo: InMemoryRepo, version: str = "bench"):
+    """
+    recommend_and_commit을 DB/파일 없이 돌리기 위한 대체:
+    고정 payload registry + InMemoryRepo + 결과 캐시 끔 + MySQL lock 생략.
+    """
+    registry = ArtifactRegistry(
+        load_fn=lambda: payload, fingerprint_fn=lambda: version, check_ttl_sec=0, name="bench_artifacts",
+    )
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.object(service, "ARTIFACTS", registry))
+        stack.enter_context(mock.patch.object(service, "db_repo", repo))
+        stack.enter_context(mock.patch.object(service, "RESULT_CACHE", RecoResultCache(max_size=0)))
+        stack.enter_context(mock.patch.object(service, "_acquire_mysql_lock", lambda *a, **k: True))
+        stack.enter_context(mock.patch.object(service, "_release_mysql_lock", lambda *a, **k: None))
+        with contextlib.redirect_stdout(io.StringIO()):
+            registry.get()
+        yield registry
+
+
+def build_bench_payload(n_foods: int, seed: int = 0, n_jobs: int = 1) -> tuple:
+    """synthetic artifacts -> 서비스와 같은 준비 경로(_prepare_artifacts_bundle)를 거친 payload"""
+    phase1, phase2 = make_synthetic_artifacts(n_foods, seed=seed, n_jobs=n_jobs)
+    return service._prepare_artifacts_bundle(Path("bench"), phase1, phase2, None)
+
+
+def run_size(n_foods: int, n_requests: int = 100, seed: int = 0, n_jobs: int = 1, alloc_sample: int = 30) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    payload = build_bench_payload(n_foods, seed=seed, n_jobs=n_jobs)
+    build_sec = time.perf_counter() - t0
+    rss_after_build = _rss_peak_mb()
+    phase1, phase2, _logs, phase3 = payload
+    cfg = service._map_phase1_cfg(phase1)
+
+    reqs = _requests(phase1, n_requests, seed)
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    # 1) Phase1
+    res = _measure(lambda r: recommend_phase1_2plus1(phase1, "bench", cfg=cfg, **r), reqs, alloc_sample)
+    p1_out = [
+        service._ensure_phase1_debug_cols(df, mood_req=r["mood"], energy_req=r["energy"])
+        for df, r in zip(res.pop("outputs"), reqs)
+    ]
+    stages["phase1"] = res
+
+    # 2) Phase2 cluster attach
+    res = _measure(
+        lambda df: attach_cluster_info(
+            df, clustered=phase2.get("clustered"), cluster_meta=phase2.get("cluster_meta"),
+            centroid_index=phase2.get("centroid_index"), lookup=phase2.get("cluster_lookup"),
+        ),
+        p1_out, alloc_sample,
+    )
+    p2_out = res.pop("outputs")
+    stages["phase2_attach"] = res
+
+    # 3) Phase3 rerank
+    res = _measure(lambda df: service._rerank_phase3(df.copy(), phase3), p2_out, alloc_sample)
+    res.pop("outputs")
+    stages["phase3_rerank"] = res
+
+    # 4) end-to-end recommend_and_commit (InMemoryRepo)
+    repo = InMemoryRepo(seed=seed)
+    calls = [
+        {
+            "cust_id": str(i + 1),
+            "mood": r["mood"],
+            "energy": r["energy"],
+            "rgs_dt": "20260101",
+            "rec_time_slot": SLOTS[i % len(SLOTS)],
+            "recent_foods": r["history_foods"],
+        }
+        for i, r in enumerate(reqs)
+    ]
+
+    def _e2e(kw: Dict[str, Any]) -> pd.DataFrame:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return service.recommend_and_commit(**kw)
+
+    with bench_service(payload, repo, version=f"bench-{n_foods}-{seed}"):
+        res = _measure(_e2e, calls, alloc_sample)
+    empty = sum(1 for df in res.pop("outputs") if df is None or df.empty)
+    res["empty_results"] = empty
+    stages["end_to_end"] = res
+
+    return {
+        "n_foods": n_foods,
+        "ctx_rows": int(len(phase1["ctx_food_all"])),
+        "unobserved_rows": int(len(phase1["unobserved_pool"])),
+        "build_sec": round(build_sec, 2),
+        "rss_after_build_mb": rss_after_build,
+        "stages": stages,
+    }
+
+
+def run_pipeline_benchmark(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    n_requests: int = 100,
+    seed: int = 0,
+    n_jobs: int = 1,
+    alloc_sample: int = 30,
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    synthetic artifacts(음식 수별)로 Phase1 / Phase2 attach / Phase3 rerank / end-to-end를 측정.
+    같은 seed면 같은 artifacts + 같은 요청 세트 -> baseline과 비교 가능.
+    RSS는 프로세스 high-water mark라 작은 size부터 순서대로 돈다.
+    """
+    out: Dict[str, Any] = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "seed": seed,
+            "n_requests": n_requests,
+            "alloc_sample": alloc_sample,
+            "host": host_meta(),
+        },
+        "sizes": {},
+    }
+    for n in sorted(int(s) for s in sizes):
+        if log:
+            log(f"[BENCH] n_foods={n} ...")
+        calib = _calibrate_ms()
+        out["sizes"][str(n)] = run_size(n, n_requests=n_requests, seed=seed, n_jobs=n_jobs, alloc_sample=alloc_sample)
+        out["sizes"][str(n)]["calib_ms"] = round((calib + _calibrate_ms()) / 2.0, 3)
+    return out
+
+
+def compare_to_baseline(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.5,
+    metrics: Sequence[str] = tuple(REGRESSION_FLOORS),
+) -> List[Dict[str, Any]]:
+    """
+    baseline 대비 (1 + tolerance)배를 넘고, 절대 차이도 floor를 넘는 metric만 regression으로 반환.
+    baseline에 없는 size/stage는 비교하지 않는다.
+    시간 metric은 baseline 값에 calib_ms 비율(current / baseline)을 곱해 부하 차이를 보정하고,
+    host(meta.host)가 다르면 아예 빼고 할당량만 비교한다.
+    """
+    if not same_host(current, baseline):
+        metrics = [m for m in metrics if m not in TIMING_METRICS]
+    regressions: List[Dict[str, Any]] = []
+    for size, cur in current.get("sizes", {}).items():
+        base = baseline.get("sizes", {}).get(size)
+        if not base:
+            continue
+        scale = 1.0
+        if cur.get("calib_ms") and base.get("calib_ms"):
+            scale = float(cur["calib_ms"]) / float(base["calib_ms"])
+        for stage, cur_m in cur.get("stages", {}).items():
+            base_m = base.get("stages", {}).get(stage)
+            if not base_m:
+                continue
+            for m in metrics:
+                b, c = base_m.get(m), cur_m.get(m)
+                if b is None or c is None:
+                    continue
+                if m in TIMING_METRICS:
+                    b = round(float(b) * scale, 3)
+                if c > b * (1.0 + tolerance) and (c - b) > REGRESSION_FLOORS.get(m, 0.0):
+                    regressions.append({
+                        "size": size, "stage": stage, "metric": m,
+                        "baseline": b, "current": c, "ratio": round(c / max(b, 1e-9), 2),
+                    })
+    return regressions
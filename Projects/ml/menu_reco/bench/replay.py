@@ -0,0 +1,363 @@
+# ml/menu_reco/bench/replay.py
+from __future__ import annotations
+
+import dataclasses
+import multiprocessing as mp
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ml.menu_reco.common.config import Phase1Config, Phase3Config
+from ml.menu_reco.db_repo import _next_reco_target, _ymd_shift
+
+# 오프라인 replay 스냅샷: 테이블별 컬럼 (parquet 디렉토리면 <name>.parquet, sqlite면 같은 이름의 테이블)
+SNAPSHOT_TABLES: Dict[str, List[str]] = {
+    "meals": ["cust_id", "rgs_dt", "seq", "time_slot", "kcal", "carb_g", "protein_g", "fat_g"],  # CUS_FOOD_TH
+    "meal_foods": ["cust_id", "rgs_dt", "seq", "food_seq", "name"],                             # CUS_FOOD_TS + FOOD_TB
+    "feels": ["cust_id", "rgs_dt", "seq", "time_slot", "mood", "energy"],                       # CUS_FEEL_TH
+    "profiles": [
+        "cust_id", "purpose", "Recommended_calories", "Ratio_carb", "Ratio_protein", "Ratio_fat", "updated_time",
+    ],                                                                                          # CUS_PROFILE_TS
+}
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+SLOT_ORDER = {"M": 0, "L": 1, "D": 2}
+MACRO_COLS = ("kcal", "carb_g", "protein_g", "fat_g")
+REC_CODES = ("P", "H", "E")
+
+
+# -----------------------------
+# Snapshot export / load
+# -----------------------------
+def export_replay_snapshot(path: Path, since: str, until: str) -> Dict[str, int]:
+    """
+    DB -> replay 스냅샷. [since, until] 결정 시점 + 앞 7일(최근 macro/음식) + 뒤 1일(다음날 아침 정답)까지.
+    path가 .sqlite/.db면 SQLite 1파일, 아니면 parquet 디렉토리. 반환: 테이블별 행 수
+    """
+    from django.db import connection
+
+    lo, hi = _ymd_shift(since, -8), _ymd_shift(until, 1)
+    queries = {
+        "meals": """
+            SELECT cust_id, rgs_dt, seq, time_slot, kcal, carb_g, protein_g, fat_g
+            FROM CUS_FOOD_TH WHERE rgs_dt BETWEEN %s AND %s
+        """,
+        "meal_foods": """
+            SELECT s.cust_id, s.rgs_dt, s.seq, s.food_seq, f.name
+            FROM CUS_FOOD_TS s JOIN FOOD_TB f ON f.food_id = s.food_id
+            WHERE s.rgs_dt BETWEEN %s AND %s
+        """,
+        "feels": """
+            SELECT cust_id, rgs_dt, seq, time_slot, mood, energy
+            FROM CUS_FEEL_TH WHERE rgs_dt BETWEEN %s AND %s
+        """,
+        "profiles": """
+            SELECT cust_id, purpose, Recommended_calories, Ratio_carb, Ratio_protein, Ratio_fat, updated_time
+            FROM CUS_PROFILE_TS
+        """,
+    }
+    frames = {}
+    with connection.cursor() as cur:
+        for name, sql in queries.items():
+            cur.execute(sql, [] if name == "profiles" else [lo, hi])
+            frames[name] = pd.DataFrame(cur.fetchall(), columns=SNAPSHOT_TABLES[name])
+    save_replay_snapshot(frames, path)
+    return {k: len(v) for k, v in frames.items()}
+
+
+def save_replay_snapshot(frames: Dict[str, pd.DataFrame], path: Path) -> None:
+    path = Path(path)
+    if path.suffix.lower() in SQLITE_SUFFIXES:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(str(path)) as con:
+            for name, df in frames.items():
+                df.to_sql(name, con, if_exists="replace", index=False)
+        return
+    path.mkdir(parents=True, exist_ok=True)
+    for name, df in frames.items():
+        df.to_parquet(path / f"{name}.parquet", index=False)
+
+
+def load_replay_snapshot(path: Path) -> Dict[str, pd.DataFrame]:
+    """스냅샷 로드 + 키 컬럼 타입 정리 (cust_id/rgs_dt 문자열, seq 정수, slot 대문자, 라벨 소문자)"""
+    path = Path(path)
+    frames: Dict[str, pd.DataFrame] = {}
+    if path.suffix.lower() in SQLITE_SUFFIXES:
+        with sqlite3.connect(str(path)) as con:
+            for name in SNAPSHOT_TABLES:
+                frames[name] = pd.read_sql_query(f"SELECT * FROM {name}", con)
+    else:
+        for name in SNAPSHOT_TABLES:
+            frames[name] = pd.read_parquet(path / f"{name}.parquet")
+
+    for name, df in frames.items():
+        missing = [c for c in SNAPSHOT_TABLES[name] if c not in df.columns]
+        if missing:
+            raise ValueError(f"replay snapshot {name}: missing columns {missing}")
+        df["cust_id"] = df["cust_id"].astype(str)
+        if "rgs_dt" in df.columns:
+            df["rgs_dt"] = df["rgs_dt"].astype(str)
+        for c in ("seq", "food_seq"):
+            if c in df.columns:
+                df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0).astype(int)
+        if "time_slot" in df.columns:
+            df["time_slot"] = df["time_slot"].astype(str).str.strip().str.upper()
+        for c in ("mood", "energy"):
+            if c in df.columns:
+                df[c] = df[c].fillna("").astype(str).str.strip().str.lower()
+    frames["meal_foods"]["name"] = frames["meal_foods"]["name"].fillna("").astype(str).str.strip()
+    frames["profiles"]["updated_time"] = frames["profiles"]["updated_time"].fillna("").astype(str)
+    return frames
+
+
+# -----------------------------
+# Decision points
+# -----------------------------
+# 시간 순서 key: rgs_dt * _KEY_DAY + 끼니 순서 * _KEY_SLOT + seq  (정수 비교/searchsorted용)
+_KEY_DAY = 10 ** 7
+_KEY_SLOT = 10 ** 6
+
+
+def _order_key(rgs_dt: pd.Series, slot_order: pd.Series, seq: pd.Series) -> np.ndarray:
+    return (
+        pd.to_numeric(rgs_dt, errors="coerce").fillna(0).astype(np.int64).to_numpy() * _KEY_DAY
+        + slot_order.astype(np.int64).to_numpy() * _KEY_SLOT
+        + np.clip(seq.astype(np.int64).to_numpy(), 0, _KEY_SLOT - 1)
+    )
+
+
+def _profile_at(profiles: pd.DataFrame, ymd: str) -> Optional[Dict[str, Any]]:
+    """ymd 시점 최신 프로필. 그 날까지 등록된 프로필이 없으면 None (미래 프로필로 근사하지 않음)"""
+    if profiles.empty:
+        return None
+    before = profiles[profiles["updated_time"].str[:8] <= ymd]
+    if before.empty:
+        return None
+    row = before.iloc[-1]
+    return {k: (None if pd.isna(row[k]) else row[k]) for k in SNAPSHOT_TABLES["profiles"]}
+
+
+def build_decision_points(
+    snap: Dict[str, pd.DataFrame],
+    since: str = "",
+    until: str = "",
+    max_points: int = 0,
+    seed: int = 0,
+    days: int = 7,
+    recent_limit: int = 10,
+) -> List[Dict[str, Any]]:
+    """
+    스냅샷 -> 과거 추천 시점 목록 (recommend_batch item + actual).
+    - 시점: 식사+감정이 기록된 (cust_id, 날짜, 끼니)의 마지막 seq (요청 경로가 추천을 돌리는 순간)
+    - 대상: _derive_reco_target 규칙의 다음 끼니 / actual: 그 끼니에 실제로 먹은 음식 이름(없으면 시점 제외)
+    - 입력(당일/최근 macro, 최근 음식, 프로필)은 시점 이전 기록만 사용 (정답 누수 없음)
+    """
+    meals, foods, feels, profiles = snap["meals"], snap["meal_foods"], snap["feels"], snap["profiles"]
+
+    done = meals.merge(feels, on=["cust_id", "rgs_dt", "seq", "time_slot"], how="inner")
+    done = done[done["time_slot"].isin(list(SLOT_ORDER))]
+    if since:
+        done = done[done["rgs_dt"] >= since]
+    if until:
+        done = done[done["rgs_dt"] <= until]
+    done = done.sort_values(["cust_id", "rgs_dt", "time_slot", "seq"]).drop_duplicates(
+        ["cust_id", "rgs_dt", "time_slot"], keep="last"
+    )
+
+    meals = meals.assign(okey=_order_key(meals["rgs_dt"], meals["time_slot"].map(SLOT_ORDER).fillna(3), meals["seq"]))
+    eaten = foods.merge(meals[["cust_id", "rgs_dt", "seq", "time_slot", "okey"]], on=["cust_id", "rgs_dt", "seq"])
+    eaten = eaten[eaten["name"] != ""]
+    actual = eaten.groupby(["cust_id", "rgs_dt", "time_slot"])["name"].agg(lambda s: sorted(set(s))).to_dict()
+
+    # 시점 선택(정답 있는 것만, 샘플링)을 먼저 -> 입력 계산은 남은 시점만
+    targets = [_next_reco_target(d, t) for d, t in zip(done["rgs_dt"], done["time_slot"])]
+    done = done.assign(reco_dt=[t[0] for t in targets], reco_slot=[t[1] for t in targets])
+    has_truth = [(c, d, t) in actual for c, d, t in zip(done["cust_id"], done["reco_dt"], done["reco_slot"])]
+    done = done[np.asarray(has_truth, dtype=bool)]
+    if max_points and len(done) > max_points:
+        keep = np.sort(np.random.default_rng(seed).choice(len(done), size=int(max_points), replace=False))
+        done = done.iloc[keep]
+    done = done.assign(okey=_order_key(done["rgs_dt"], done["time_slot"].map(SLOT_ORDER), done["seq"]))
+
+    # 사용자별: 식사 key 정렬 + macro 누적합 -> 구간 합은 searchsorted 2번
+    cols = list(MACRO_COLS)
+    meals_by_user = {}
+    for c, g in meals.sort_values("okey").groupby("cust_id", sort=False):
+        cs = np.vstack([np.zeros((1, len(cols))), g[cols].fillna(0).to_numpy(dtype=float).cumsum(axis=0)])
+        meals_by_user[c] = (g["okey"].to_numpy(), cs)
+    # 최근 음식: 요청 경로와 같은 순서(rgs_dt desc, seq desc, food_seq asc)
+    eaten_by_user = {
+        c: (g["okey"].to_numpy(), g["name"].to_numpy())
+        for c, g in eaten.sort_values(["rgs_dt", "seq", "food_seq"], ascending=[False, False, True]).groupby(
+            "cust_id", sort=False
+        )
+    }
+    profiles_by_user = {c: g.sort_values("updated_time") for c, g in profiles.groupby("cust_id")}
+
+    points: List[Dict[str, Any]] = []
+    prof_cache: Dict[Tuple[str, str], Optional[Dict[str, Any]]] = {}
+    for r in done.itertuples(index=False):
+        keys, cs = meals_by_user[r.cust_id]
+        hi = int(np.searchsorted(keys, r.okey, side="right"))
+        day_lo = int(np.searchsorted(keys, int(r.reco_dt) * _KEY_DAY, side="left"))
+        rec_lo = int(np.searchsorted(keys, int(_ymd_shift(r.reco_dt, -int(days))) * _KEY_DAY, side="left"))
+        day = cs[hi] - cs[min(day_lo, hi)]
+        recent = cs[hi] - cs[min(rec_lo, hi)]
+
+        names: List[str] = []
+        if r.cust_id in eaten_by_user:
+            e_keys, e_names = eaten_by_user[r.cust_id]
+            for nm in e_names[e_keys <= r.okey][: int(recent_limit)].tolist():
+                if nm not in names:
+                    names.append(nm)
+
+        if (r.cust_id, r.rgs_dt) not in prof_cache:
+            prof = profiles_by_user.get(r.cust_id)
+            prof_cache[(r.cust_id, r.rgs_dt)] = _profile_at(prof, r.rgs_dt) if prof is not None else None
+        points.append({
+            "cust_id": r.cust_id,
+            "done_dt": r.rgs_dt,
+            "done_slot": r.time_slot,
+            "mood": r.mood,
+            "energy": r.energy,
+            "rgs_dt": r.reco_dt,
+            "rec_time_slot": r.reco_slot,
+            "recent_foods": names or None,
+            "snapshot": {
+                "profile": prof_cache[(r.cust_id, r.rgs_dt)],
+                "day": {f"sum_{c}": float(v) for c, v in zip(cols, day)},
+                "recent": {f"sum_{c}": float(v) for c, v in zip(cols, recent)},
+            },
+            "actual": actual[(r.cust_id, r.reco_dt, r.reco_slot)],
+        })
+    return points
+
+
+# -----------------------------
+# Replay
+# -----------------------------
+def resolve_configs(
+    phase1_artifacts: Dict[str, Any], spec: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Tuple[Phase1Config, Phase3Config]]:
+    """
+    {"이름": {"phase1": {필드: 값}, "phase3": {"alpha": .., "w_map": {..}}}} -> 이름별 (Phase1Config, Phase3Config)
+    - phase1은 artifacts config 위에 덮어씀, phase3 w_map은 기본 map에 merge
+    - "baseline"(artifacts 그대로)은 항상 포함
+    """
+    from ml.menu_reco.service import _map_phase1_cfg
+
+    base1 = _map_phase1_cfg(phase1_artifacts)
+    out: Dict[str, Tuple[Phase1Config, Phase3Config]] = {"baseline": (base1, Phase3Config())}
+    for name, over in (spec or {}).items():
+        over = over or {}
+        p1 = dict(over.get("phase1") or {})
+        for k, v in p1.items():
+            if isinstance(v, list):
+                p1[k] = tuple(v)
+        p3 = dict(over.get("phase3") or {})
+        w_map = {**Phase3Config().w_map, **(p3.pop("w_map", None) or {})}
+        out[name] = (dataclasses.replace(base1, **p1), Phase3Config(w_map=w_map, **p3))
+    return out
+
+
+# fork된 worker가 부모의 payload를 복사 없이 공유하도록 모듈 전역에 둔다
+_WORKER: Dict[str, Any] = {}
+
+
+def _run_chunk(args: Tuple[str, List[Dict[str, Any]]]) -> Tuple[str, List[List[Tuple[str, str]]], List[str], float]:
+    from ml.menu_reco.service import recommend_batch
+
+    name, items = args
+    p1, p3 = _WORKER["configs"][name]
+    t0 = time.perf_counter()
+    res = recommend_batch(
+        items, chunk_size=_WORKER["batch_users"], payload=_WORKER["payload"],
+        phase1_cfg=p1, phase3_cfg=p3, map_ids=False,
+    )
+    sec = time.perf_counter() - t0
+    return name, [r["foods"] for r in res], [r["status"] for r in res], sec
+
+
+def _score(points: List[Dict[str, Any]], foods: List[List[Tuple[str, str]]], status: List[str]) -> Dict[str, Any]:
+    n = len(points)
+    hit_any = 0
+    hit_type = {c: 0 for c in REC_CODES}
+    has_type = {c: 0 for c in REC_CODES}
+    uniq = set()
+    for p, recs in zip(points, foods):
+        truth = set(p["actual"])
+        hit = False
+        for code, food in recs:
+            uniq.add(food)
+            has_type[code] = has_type.get(code, 0) + 1
+            if food in truth:
+                hit_type[code] = hit_type.get(code, 0) + 1
+                hit = True
+        hit_any += int(hit)
+    return {
+        "n": n,
+        "coverage": round(sum(s == "computed" for s in status) / n, 4) if n else 0.0,
+        "failed": sum(s == "failed" for s in status),
+        "hit_rate": round(hit_any / n, 4) if n else 0.0,
+        "hit_rate_by_type": {c: round(hit_type[c] / has_type[c], 4) if has_type[c] else 0.0 for c in REC_CODES},
+        "unique_foods": len(uniq),
+    }
+
+
+def replay_configs(
+    points: List[Dict[str, Any]],
+    payload: Tuple[Any, ...],
+    configs: Dict[str, Tuple[Phase1Config, Phase3Config]],
+    workers: int = 1,
+    chunk_points: int = 256,
+    batch_users: int = 64,
+) -> Dict[str, Any]:
+    """
+    config별로 points 전체를 recommend_batch로 다시 돌려 hit-rate / latency 비교.
+    - chunk_points개씩 나눠 workers개 프로세스(fork)에 분배 (workers<=1이면 현재 프로세스)
+    - latency: chunk별 (실행 시간 / chunk 시점 수)의 분포 -> 시점 단위 latency가 아니라 chunk 평균의 p50/p95, 전체 처리량
+    반환: {"n_points", "workers", "configs": {이름: {hit_rate..., p50_chunk_ms_per_point, p95_chunk_ms_per_point, points_per_sec}}}
+    """
+    _WORKER.update(payload=payload, configs=configs, batch_users=int(batch_users))
+    strip = [{k: v for k, v in p.items() if k != "actual"} for p in points]
+    chunks = [(i, strip[i:i + int(chunk_points)]) for i in range(0, len(strip), int(chunk_points))]
+    tasks = [(name, items) for name in configs for _, items in chunks]
+
+    foods: Dict[str, List[List[Tuple[str, str]]]] = {name: [] for name in configs}
+    status: Dict[str, List[str]] = {name: [] for name in configs}
+    lat: Dict[str, List[float]] = {name: [] for name in configs}
+    wall: Dict[str, float] = {name: 0.0 for name in configs}
+
+    t0 = time.perf_counter()
+    if workers and workers > 1 and len(tasks) > 1:
+        ctx = mp.get_context("fork")
+        with ProcessPoolExecutor(max_workers=int(workers), mp_context=ctx) as ex:
+            results = list(ex.map(_run_chunk, tasks))
+    else:
+        results = [_run_chunk(t) for t in tasks]
+    total_sec = time.perf_counter() - t0
+
+    # ex.map은 입력 순서 유지 -> config별 chunk 순서 = points 순서
+    for (name, items), (_, f, s, sec) in zip(tasks, results):
+        foods[name] += f
+        status[name] += s
+        lat[name].append(sec * 1000.0 / max(1, len(items)))
+        wall[name] += sec
+
+    out: Dict[str, Any] = {
+        "n_points": len(points), "workers": int(workers or 1), "total_sec": round(total_sec, 3), "configs": {},
+    }
+    for name in configs:
+        rep = _score(points, foods[name], status[name])
+        ms = np.asarray(lat[name] or [0.0])
+        rep.update({
+            "p50_chunk_ms_per_point": round(float(np.percentile(ms, 50)), 3),
+            "p95_chunk_ms_per_point": round(float(np.percentile(ms, 95)), 3),
+            "points_per_sec": round(len(points) / wall[name], 1) if wall[name] > 0 else 0.0,
+        })
+        out["configs"][name] = rep
+    return out
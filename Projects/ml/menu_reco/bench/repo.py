@@ -0,0 +1,108 @@
+# ml/menu_reco/bench/repo.py
+from __future__ import annotations
+
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class InMemoryRepo:
+    """
+    bench/replay용 db_repo 대체(in-memory).
+    recommend_and_commit이 쓰는 함수 이름/반환 형태만 맞춘다.
+    - 프로필/섭취량은 cust_id + seed로 고정 생성(같은 cust_id면 항상 같은 값)
+    - MENU_RECOM_TH upsert는 dict에 저장
+    """
+
+    def __init__(self, seed: int = 0):
+        self.seed = int(seed)
+        self.food_ids: Dict[str, int] = {}
+        self.menu_recom: Dict[Tuple[str, str, str, str], str] = {}
+        self.n_upserts = 0
+        # fetch_pregen_targets가 돌려줄 대상 (cust_id 순) + 페이지에는 들지만 대상은 안 되는 cust_id
+        self.pregen_targets: List[Dict[str, Any]] = []
+        self.pregen_scan_ids: List[str] = []
+
+    def _rng(self, *parts: Any) -> np.random.Generator:
+        key = "|".join(str(p) for p in parts)
+        return np.random.default_rng([self.seed, zlib.crc32(key.encode("utf-8"))])
+
+    # 1) CUS_PROFILE_TS
+    def get_profile(self, cust_id: str) -> Optional[Dict[str, Any]]:
+        rng = self._rng("profile", cust_id)
+        return {
+            "cust_id": str(cust_id),
+            "purpose": int(rng.integers(1, 4)),
+            "Recommended_calories": round(float(rng.uniform(1500, 2800))),
+            "Ratio_carb": None,
+            "Ratio_protein": None,
+            "Ratio_fat": None,
+            "updated_time": "20260101000000",
+        }
+
+    # 2) CUS_FOOD_TH 당일 합계
+    def get_day_eaten_sum(self, cust_id: str, rgs_dt: str) -> Dict[str, Any]:
+        rng = self._rng("eaten", cust_id, rgs_dt)
+        g = rng.gamma(2.0, (40.0, 15.0, 10.0))
+        return {
+            "sum_kcal": float(g @ np.array([4.0, 4.0, 9.0])),
+            "sum_carb_g": float(g[0]),
+            "sum_protein_g": float(g[1]),
+            "sum_fat_g": float(g[2]),
+        }
+
+    # 3) 최근 N일 macro 합계
+    def get_recent_macro_sum(self, cust_id: str, days: int = 7) -> Dict[str, Any]:
+        rng = self._rng("recent", cust_id, days)
+        g = rng.gamma(4.0, (250.0, 90.0, 60.0))
+        return {"sum_carb_g": float(g[0]), "sum_protein_g": float(g[1]), "sum_fat_g": float(g[2])}
+
+    # 3-1) 추천 입력 스냅샷
+    def get_user_reco_snapshot(self, cust_id: str, rgs_dt: str, days: int = 7, use_rollup: bool = False) -> Dict[str, Any]:
+        return {
+            "profile": self.get_profile(cust_id),
+            "day": self.get_day_eaten_sum(cust_id, rgs_dt),
+            "recent": self.get_recent_macro_sum(cust_id, days=days),
+        }
+
+    # 4) FOOD_TB name -> food_id
+    def map_food_names_to_ids(self, food_names: List[str]) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for n in food_names:
+            name = str(n)
+            if name not in self.food_ids:
+                self.food_ids[name] = len(self.food_ids) + 1
+            out[name] = self.food_ids[name]
+        return out
+
+    # 5) MENU_RECOM_TH upsert
+    def upsert_menu_recom_rows(self, *, cust_id: str, rgs_dt: str, rec_time_slot: str, rows: List[Tuple[str, str]]) -> None:
+        for rec_type, food_id in rows:
+            self.menu_recom[(str(cust_id), str(rgs_dt), str(rec_time_slot), str(rec_type))] = str(food_id)
+        self.n_upserts += 1
+
+    # 8) 야간 사전 생성(bulk)
+    def fetch_pregen_targets(
+        self, rgs_dt: str, after_cust_id: str = "", limit: int = 500
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        by_id = {t["cust_id"]: t for t in self.pregen_targets}
+        ids = sorted(set(self.pregen_scan_ids) | set(by_id))
+        page = [c for c in ids if c > (after_cust_id or "")][: int(limit)]
+        return [dict(by_id[c]) for c in page if c in by_id], (page[-1] if page else "")
+
+    def get_users_reco_snapshots(self, cust_ids: List[str], rgs_dt: str, days: int = 7) -> Dict[str, Dict[str, Any]]:
+        return {str(c): self.get_user_reco_snapshot(str(c), rgs_dt, days=days) for c in cust_ids}
+
+    def fetch_recent_food_names_bulk(self, cust_ids: List[str], limit: int = 10) -> Dict[str, List[str]]:
+        return {str(c): [] for c in cust_ids}
+
+    def existing_menu_recom_keys(self, keys: List[Tuple[str, str, str]]) -> set:
+        have = {k[:3] for k in self.menu_recom}
+        return {tuple(map(str, k)) for k in keys} & have
+
+    def upsert_menu_recom_rows_bulk(self, rows: List[Tuple[str, str, str, str, str]], chunk_rows: int = 500) -> int:
+        for cust_id, rgs_dt, slot, rec_type, food_id in rows:
+            self.menu_recom[(str(cust_id), str(rgs_dt), str(slot), str(rec_type))] = str(food_id)
+        self.n_upserts += (len(rows) + int(chunk_rows) - 1) // int(chunk_rows)
+        return len(rows)
@@ -0,0 +1,118 @@
+# ml/menu_reco/bench/synthetic.py
+from __future__ import annotations
+
+from dataclasses import asdict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ml.menu_reco.common.config import Phase1Config, Phase2Config
+from ml.menu_reco.domain.phase1.incremental import (
+    CTX_SUM_COLS,
+    UNOBSERVED_COLS,
+    _with_macro_ratios,
+    assemble_phase1_frames,
+)
+from ml.menu_reco.domain.phase2.clustering import fit_phase2_clustering
+
+MOODS = ("pos", "neu", "neg")
+ENERGIES = ("low", "med", "hig")
+# guardrail(keyword blacklist) 경로도 타도록 일부 이름에 섞음
+BLACKLIST_SUFFIXES = ("소스", "드레싱", "마요")
+
+
+def synthetic_food_nut(n_foods: int, seed: int = 0) -> pd.DataFrame:
+    """Food + 영양(g/kcal) + macro ratio. 이름/값 모두 seed로 고정"""
+    rng = np.random.default_rng(seed)
+    names = np.array([f"food_{i:06d}" for i in range(n_foods)], dtype=object)
+    tagged = np.arange(0, n_foods, 47)
+    names[tagged] = [f"{names[i]} {BLACKLIST_SUFFIXES[i % len(BLACKLIST_SUFFIXES)]}" for i in tagged]
+
+    grams = rng.gamma(shape=2.0, scale=(25.0, 12.0, 8.0), size=(n_foods, 3))
+    kcal = grams @ np.array([4.0, 4.0, 9.0]) * rng.uniform(0.9, 1.1, size=n_foods)
+    nut = pd.DataFrame({
+        "Food": names,
+        "Calories": kcal.round(1),
+        "food_carb_g": grams[:, 0],
+        "food_prot_g": grams[:, 1],
+        "food_fat_g": grams[:, 2],
+    })
+    return _with_macro_ratios(nut)
+
+
+def synthetic_ctx_sums(
+    food_nut: pd.DataFrame,
+    seed: int = 0,
+    logged_frac: float = 0.8,
+    ctx_frac: float = 0.4,
+) -> pd.DataFrame:
+    """
+    (Mood, Energy, Food)별 running sum/count (incremental 상태와 같은 형태).
+    - 전체 음식 중 logged_frac만 로그가 있고, 나머지는 미관측 풀로 남는다
+    - 문맥마다 로그 음식의 ctx_frac 정도가 등장
+    """
+    rng = np.random.default_rng(seed + 1)
+    foods = food_nut["Food"].to_numpy()
+    logged = foods[rng.random(len(foods)) < logged_frac]
+    parts = []
+    for m in MOODS:
+        for e in ENERGIES:
+            f = logged[rng.random(len(logged)) < ctx_frac]
+            n = rng.poisson(3.0, size=len(f)) + 1
+            p = rng.beta(2.0, 2.0, size=len(f))
+            parts.append(pd.DataFrame({
+                "Mood": m,
+                "Energy": e,
+                "Food": f,
+                "n_logs_ctx": n.astype("int64"),
+                "sum_y_ctx": rng.binomial(n, p).astype(float),
+            }))
+    return pd.concat(parts, ignore_index=True)[CTX_SUM_COLS]
+
+
+def synthetic_user_pref(n_users: int = 100, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed + 2)
+    ratios = rng.dirichlet([4, 3, 2], size=n_users)
+    return pd.DataFrame({
+        "Product_Name": [f"bench_{i}" for i in range(n_users)],
+        "Purpose": rng.integers(0, 3, size=n_users),
+        "Recommended_calories": rng.uniform(1500, 2800, size=n_users).round(0),
+        "hybrid_ratio_c": ratios[:, 0],
+        "hybrid_ratio_p": ratios[:, 1],
+        "hybrid_ratio_f": ratios[:, 2],
+    })
+
+
+def make_synthetic_artifacts(
+    n_foods: int,
+    seed: int = 0,
+    n_jobs: int = 1,
+    phase2_cfg: Optional[Phase2Config] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    n_foods 규모의 raw phase1/phase2 artifacts (파일 저장 전 형태, 같은 seed면 같은 결과).
+    phase1은 incremental 조립 경로, phase2는 fit_phase2_clustering으로 만든다.
+    """
+    food_nut = synthetic_food_nut(n_foods, seed)
+    state = {
+        "ctx_sums": synthetic_ctx_sums(food_nut, seed),
+        "food_nut": food_nut,
+        "unobserved_pool": food_nut[UNOBSERVED_COLS].copy(),
+    }
+    frames = assemble_phase1_frames(state)
+    phase1 = {
+        "food_stats": frames["food_stats"],
+        "user_pref": synthetic_user_pref(seed=seed),
+        "ctx_food_all": frames["ctx_food_all"],
+        "unobserved_pool": frames["unobserved_pool"],
+        "bad_foods_set": set(frames["bad_foods"]),
+        "config": asdict(Phase1Config()),
+    }
+
+    clustered, cluster_meta, scaler = fit_phase2_clustering(
+        phase1["ctx_food_all"], phase2_cfg or Phase2Config(), n_jobs=n_jobs,
+    )
+    phase2 = {"clustered": clustered, "cluster_meta": cluster_meta, "scaler": scaler}
+    return phase1, phase2
+
@@ -4,6 +4,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Tuple, Dict, Optional
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -14,6 +15,27 @@ load_dotenv()
 class AppConfig:
     DATA_DIR: str = os.getenv("DATA_DIR", "./ml/menu_reco/data/raw")
     ARTIFACTS_DIR: str = os.getenv("ARTIFACT_DIR", "./ml/menu_reco/artifacts")
+    # compile된 .arrow(memory-map) artifact가 있으면 parquet 대신 사용
+    USE_ARROW_MMAP: bool = os.getenv("MENU_RECO_ARROW_MMAP", "true").lower() in ("true", "1", "yes")
+    # artifacts 변경 확인 주기(초). 0이면 최초 로드 이후 자동 확인 안 함(reload 커맨드로만 교체)
+    ARTIFACT_CHECK_TTL_SEC: float = float(os.getenv("MENU_RECO_ARTIFACT_CHECK_TTL_SEC", "60"))
+    # 추천 결과 캐시(워커별 in-process). SIZE=0이면 캐시 끔
+    RESULT_CACHE_SIZE: int = int(os.getenv("MENU_RECO_RESULT_CACHE_SIZE", "4096"))
+    RESULT_CACHE_TTL_SEC: float = float(os.getenv("MENU_RECO_RESULT_CACHE_TTL_SEC", "1800"))
+    # 섭취 kcal을 이 단위로 묶어서 key에 넣음(0이면 정확값)
+    RESULT_CACHE_KCAL_BUCKET: float = float(os.getenv("MENU_RECO_RESULT_CACHE_KCAL_BUCKET", "50"))
+    # 최근 7일 macro를 CUS_MACRO_DAILY_TH(일별 rollup)에서 읽음. rollup_menu_reco_macros를 매일 돌릴 때만 켤 것
+    USE_MACRO_ROLLUP: bool = os.getenv("MENU_RECO_MACRO_ROLLUP", "false").lower() in ("true", "1", "yes")
+    # worker 간 직렬화용 MySQL GET_LOCK (gunicorn worker 여러 개라 기본 켬). 프로세스 내 중복 호출은 그 앞에서 single-flight로 합침
+    RECO_MYSQL_LOCK: bool = os.getenv("MENU_RECO_MYSQL_LOCK", "true").lower() in ("true", "1", "yes")
+    # Phase1 후보 검색용 grid index(macro/칼로리 공간). 결과는 full scan과 같음, 끄면 항상 full scan
+    USE_SPATIAL_INDEX: bool = os.getenv("MENU_RECO_SPATIAL_INDEX", "true").lower() in ("true", "1", "yes")
+    # recommend_and_commit stage별 소요시간 trace(호출당 [RECO][TRACE] 로그 1줄 + 프로세스 내 histogram)
+    RECO_TRACE: bool = os.getenv("MENU_RECO_TRACE", "true").lower() in ("true", "1", "yes")
+    RECO_TRACE_LOG: bool = os.getenv("MENU_RECO_TRACE_LOG", "true").lower() in ("true", "1", "yes")
+    # worker별 histogram 파일 위치/주기(dump_menu_reco_traces가 합쳐서 보여줌). FLUSH_SEC=0이면 파일 안 씀
+    RECO_TRACE_DIR: str = os.getenv("MENU_RECO_TRACE_DIR", "")
+    RECO_TRACE_FLUSH_SEC: float = float(os.getenv("MENU_RECO_TRACE_FLUSH_SEC", "60"))
 
     @property
     def data_dir(self) -> str:
@@ -28,6 +50,10 @@ class AppConfig:
         p = Path(self.DATA_DIR)
         return p if p.is_absolute() else (base_dir / p).resolve()
 
+    @property
+    def trace_dir(self) -> Path:
+        return Path(self.RECO_TRACE_DIR) if self.RECO_TRACE_DIR else Path(tempfile.gettempdir()) / "menu_reco_traces"
+
     def resolve_artifacts_dir(self, base_dir: Path) -> Path:
         p = Path(self.ARTIFACTS_DIR)
         return p if p.is_absolute() else (base_dir / p).resolve()
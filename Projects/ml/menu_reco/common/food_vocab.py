@@ -0,0 +1,71 @@
+from __future__ import annotations
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# compile_menu_reco_artifacts가 phase1 디렉토리에 쓰는 공용 이름 사전 (id = 행 위치)
+FOOD_VOCAB_FILE = "food_vocab.arrow"
+
+
+class FoodVocab:
+    """
+    menu_reco artifacts 공용 Food 이름 사전: 이름 <-> dense int32 id (0..V-1).
+    - 요청 경로의 집합 연산(bad_foods / exclude / history)은 이름 대신 id로 (bitmap, 정수 isin)
+    - 이름 문자열은 사전에 1번만 있음(catalog는 int32 id 배열만 들고 있음)
+    - DB FOOD_TB.food_id와는 무관한 artifact 내부 id (artifacts 버전마다 달라질 수 있음)
+    """
+
+    def __init__(self, names: Sequence[str]):
+        arr = np.asarray(list(names), dtype=object)
+        arr.setflags(write=False)
+        self.names = arr
+        self.index = pd.Index(arr, dtype=object)
+        if not self.index.is_unique:
+            raise ValueError("FoodVocab names must be unique")
+
+    @classmethod
+    def from_frames(cls, frames: Iterable[Optional[pd.DataFrame]], extra: Iterable[str] = ()) -> "FoodVocab":
+        """frames의 Food 컬럼 + extra 이름의 합집합(정렬)으로 사전 생성"""
+        parts = [pd.Index(list(map(str, extra)), dtype=object)]
+        for df in frames:
+            if df is not None and "Food" in df.columns:
+                parts.append(pd.Index(df["Food"].astype(str).unique(), dtype=object))
+        names = parts[0].append(parts[1:]).unique() if len(parts) > 1 else parts[0].unique()
+        return cls(np.sort(np.asarray(names, dtype=object)))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def encode(self, values: Iterable[str]) -> np.ndarray:
+        """이름 -> id (int32, 사전에 없으면 -1). 벡터화(hash) 조회"""
+        v = values.astype(str) if isinstance(values, pd.Series) else pd.Index(list(map(str, values)), dtype=object)
+        return self.index.get_indexer(v).astype(np.int32, copy=False)
+
+    def covers(self, values: Iterable[str]) -> bool:
+        return bool((self.encode(values) >= 0).all())
+
+    def ids(self, names: Iterable[str]) -> np.ndarray:
+        """이름 집합 -> 사전에 있는 id만 (정수 isin 용)"""
+        names = list(names)
+        if not names:
+            return np.empty(0, dtype=np.int32)
+        codes = self.encode(names)
+        return np.unique(codes[codes >= 0])
+
+    def bitmap(self, names: Iterable[str]) -> np.ndarray:
+        """이름 집합 -> 길이 V bool 배열 (bitmap[code]로 membership)"""
+        out = np.zeros(len(self), dtype=bool)
+        out[self.ids(names)] = True
+        out.setflags(write=False)
+        return out
+
+    def name(self, code: int) -> str:
+        return str(self.names[int(code)])
+
+
+def codes_in(codes: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """codes 중 ids에 속하는 위치 (정수 isin, ids가 비면 전부 False)"""
+    if len(ids) == 0:
+        return np.zeros(len(codes), dtype=bool)
+    return np.isin(codes, ids)
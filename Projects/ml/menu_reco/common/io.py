@@ -1,10 +1,14 @@
 from __future__ import annotations
 from dataclasses import asdict
 from pathlib import Path
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, Tuple, Optional, List, Iterable
 import json
+import os
+import numpy as np
 import pandas as pd
 
+from ml.menu_reco.common.food_vocab import FOOD_VOCAB_FILE, FoodVocab
+
 def ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
@@ -68,6 +72,183 @@ def load_phase2_artifacts(cfg) -> Dict[str, Any]:
         "config": load_json(base / "config.json"),
     }
 
+# ----------------------------
+# Arrow IPC(feather v2, 무압축) : worker 간 공유되는 memory-map artifact
+#   공유되는 건 로드한 artifact 컬럼(null 없는 숫자/Arrow 문자열)까지.
+#   로드 시 만드는 파생 구조(candidate_index, FoodCatalog, CatalogGrid, lookup 등)는 worker마다 따로 만든다
+# ----------------------------
+ARROW_SUFFIX = ".arrow"
+
+# (phase, name) : parquet -> arrow 로 compile 대상
+ARROW_FRAME_ARTIFACTS: Tuple[Tuple[str, str], ...] = (
+    ("phase1", "food_stats"),
+    ("phase1", "user_pref"),
+    ("phase1", "ctx_food_all"),
+    ("phase1", "unobserved_pool"),
+    ("phase2", "clustered"),
+    ("phase2", "cluster_meta"),
+    ("phase2", "scaler"),
+    ("phase3", "logs"),
+    ("phase3", "p_stable_cluster"),
+)
+
+def _atomic_write_arrow(table, path: Path) -> None:
+    import pyarrow.feather as pf
+
+    ensure_dir(path.parent)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    # mmap zero-copy를 위해 무압축으로 저장
+    pf.write_feather(table, str(tmp), compression="uncompressed")
+    # 기존 파일을 mmap 중인 worker가 있어도 안전하도록 rename으로 교체
+    os.replace(tmp, path)
+
+def save_arrow(df: pd.DataFrame, path: Path) -> None:
+    import pyarrow as pa
+
+    _atomic_write_arrow(pa.Table.from_pandas(df, preserve_index=False), path)
+
+def save_arrow_strings(values: Iterable[str], path: Path, column: str = "Food") -> None:
+    import pyarrow as pa
+
+    _atomic_write_arrow(pa.table({column: pa.array(sorted(map(str, values)), type=pa.string())}), path)
+
+def load_arrow_mmap(path: Path) -> pd.DataFrame:
+    """
+    Arrow IPC 파일을 read-only memory-map으로 연다.
+    - null 없는 숫자 컬럼은 복사 없이 mmap 버퍼를 그대로 씀(프로세스 간 page cache 공유)
+    - 문자열 컬럼은 Arrow 기반 string dtype(역시 mmap 버퍼)
+    - 반환 배열은 read-only이므로 in-place 수정 금지(컬럼 교체/추가는 OK)
+    """
+    import pyarrow as pa
+    import pyarrow.feather as pf
+
+    table = pf.read_table(str(path), memory_map=True)
+    str_dtype = pd.StringDtype(storage="pyarrow", na_value=np.nan)
+    mapper = {pa.string(): str_dtype, pa.large_string(): str_dtype}.get
+    return table.to_pandas(split_blocks=True, types_mapper=mapper)
+
+def arrow_path_for(path: Path) -> Path:
+    return path.with_suffix(ARROW_SUFFIX)
+
+def compile_artifacts_to_arrow(artifacts_dir: Path) -> List[Path]:
+    """
+    artifacts/phase*/ 의 parquet + bad_foods.json 을 같은 위치의 .arrow 로 변환한다.
+    (phase1/phase2는 active 버전 디렉토리 기준, 없는 parquet은 건너뜀) 반환: 생성된 파일 목록
+    """
+    artifacts_dir = Path(artifacts_dir)
+    written: List[Path] = []
+    for phase, name in ARROW_FRAME_ARTIFACTS:
+        base = active_phase_dir(artifacts_dir, phase) if phase in VERSIONED_PHASES else artifacts_dir / phase
+        src = base / f"{name}.parquet"
+        if not src.exists():
+            continue
+        dst = arrow_path_for(src)
+        save_arrow(load_parquet(src), dst)
+        written.append(dst)
+
+    bad = active_phase1_dir(artifacts_dir) / "bad_foods.json"
+    bad_names = load_json(bad) if bad.exists() else []
+    if bad.exists():
+        dst = arrow_path_for(bad)
+        save_arrow_strings(bad_names, dst)
+        written.append(dst)
+
+    # 공용 Food 이름 사전: phase1 frame + clustered + bad_foods의 합집합 (id = 정렬 위치)
+    frames = []
+    for phase, name in (("phase1", "ctx_food_all"), ("phase1", "food_stats"), ("phase1", "unobserved_pool"), ("phase2", "clustered")):
+        base = active_phase_dir(artifacts_dir, phase) if phase in VERSIONED_PHASES else artifacts_dir / phase
+        src = base / f"{name}.parquet"
+        if src.exists():
+            frames.append(pd.read_parquet(src, columns=["Food"]))
+    if frames:
+        vocab = FoodVocab.from_frames(frames, extra=bad_names)
+        dst = active_phase1_dir(artifacts_dir) / FOOD_VOCAB_FILE
+        save_arrow_strings(vocab.names, dst)
+        written.append(dst)
+    return written
+
+# ----------------------------
+# Phase1/Phase2 버전 디렉토리 (빌드 커맨드 산출물)
+#   artifacts/<phase>_versions/<version>/  +  artifacts/<phase>_versions/CURRENT (active 버전 이름)
+#   CURRENT가 없으면 기존 artifacts/<phase> 사용
+#   파일을 live 디렉토리에서 하나씩 바꾸지 않고 staging에 다 쓴 뒤 포인터 교체 -> worker가 섞인 버전을 읽지 않음
+# ----------------------------
+VERSIONED_PHASES = ("phase1", "phase2")
+CURRENT_POINTER = "CURRENT"
+
+def versions_root(artifacts_dir: Path, phase: str) -> Path:
+    return Path(artifacts_dir) / f"{phase}_versions"
+
+def version_pointer_path(artifacts_dir: Path, phase: str) -> Path:
+    return versions_root(artifacts_dir, phase) / CURRENT_POINTER
+
+def active_phase_dir(artifacts_dir: Path, phase: str) -> Path:
+    try:
+        version = version_pointer_path(artifacts_dir, phase).read_text(encoding="utf-8").strip()
+    except OSError:
+        version = ""
+    if version:
+        vdir = versions_root(artifacts_dir, phase) / version
+        if vdir.is_dir():
+            return vdir
+    return Path(artifacts_dir) / phase
+
+def new_staging_dir(artifacts_dir: Path, phase: str, version: str) -> Path:
+    staging = versions_root(artifacts_dir, phase) / f".staging-{version}-{os.getpid()}"
+    ensure_dir(staging)
+    return staging
+
+def publish_version(artifacts_dir: Path, phase: str, staging_dir: Path, version: str) -> Path:
+    """
+    다 쓴 staging 디렉토리를 버전 디렉토리로 rename -> CURRENT 포인터를 원자적으로 교체.
+    (서비스는 CURRENT 변경을 fingerprint로 감지해서 새 버전으로 hot-swap)
+    """
+    root = versions_root(artifacts_dir, phase)
+    vdir = root / version
+    if vdir.exists():
+        raise FileExistsError(f"{phase} version already exists: {vdir}")
+    os.rename(staging_dir, vdir)
+
+    ptr = version_pointer_path(artifacts_dir, phase)
+    tmp = ptr.with_name(f".{ptr.name}.{os.getpid()}.tmp")
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, ptr)
+    return vdir
+
+def prune_versions(artifacts_dir: Path, phase: str, keep: int) -> List[Path]:
+    """active 버전은 남기고, 오래된 버전 디렉토리를 keep개만 남기고 삭제"""
+    import shutil
+
+    root = versions_root(artifacts_dir, phase)
+    if keep <= 0 or not root.is_dir():
+        return []
+    active = active_phase_dir(artifacts_dir, phase)
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))
+    removed: List[Path] = []
+    for p in versions[:-keep]:
+        if p != active:
+            shutil.rmtree(p, ignore_errors=True)
+            removed.append(p)
+    return removed
+
+def phase1_versions_root(artifacts_dir: Path) -> Path:
+    return versions_root(artifacts_dir, "phase1")
+
+def phase1_pointer_path(artifacts_dir: Path) -> Path:
+    return version_pointer_path(artifacts_dir, "phase1")
+
+def active_phase1_dir(artifacts_dir: Path) -> Path:
+    return active_phase_dir(artifacts_dir, "phase1")
+
+def new_phase1_staging_dir(artifacts_dir: Path, version: str) -> Path:
+    return new_staging_dir(artifacts_dir, "phase1", version)
+
+def publish_phase1_version(artifacts_dir: Path, staging_dir: Path, version: str) -> Path:
+    return publish_version(artifacts_dir, "phase1", staging_dir, version)
+
+def prune_phase1_versions(artifacts_dir: Path, keep: int) -> List[Path]:
+    return prune_versions(artifacts_dir, "phase1", keep)
+
 def save_json(obj: Any, path: Path) -> None:
     ensure_dir(path.parent)
     with open(path, "w", encoding="utf-8") as f:
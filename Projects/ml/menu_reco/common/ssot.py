@@ -1,5 +1,8 @@
 from __future__ import annotations
 from typing import Iterable, Optional, Set
+import hashlib
+import json
+import re
 import numpy as np
 import pandas as pd
 
@@ -9,6 +12,28 @@ def to_numeric_safe(df: pd.DataFrame, cols: Iterable[str]) -> pd.DataFrame:
             df[c] = pd.to_numeric(df[c], errors="coerce")
     return df
 
+def normalize_mood_label(x) -> str:
+    """pos/neu/neg 정규화 (Pos, positive 등 -> pos)"""
+    s = str(x).strip().lower()
+    if s in ("pos", "positive"):
+        return "pos"
+    if s in ("neu", "neutral"):
+        return "neu"
+    if s in ("neg", "negative"):
+        return "neg"
+    return s
+
+def normalize_energy_label(x) -> str:
+    """low/med/hig 정규화 (High, mid 등 -> hig/med)"""
+    s = str(x).strip().lower()
+    if s in ("low",):
+        return "low"
+    if s in ("med", "mid"):
+        return "med"
+    if s in ("high", "hig"):
+        return "hig"
+    return s
+
 def normalize_macro(c: float, p: float, f: float) -> np.ndarray:
     vec = np.array([c, p, f], dtype=float)
     s = float(np.nansum(vec))
@@ -25,6 +50,18 @@ def macro_ratio_from_grams_to_kcal(c_g: float, p_g: float, f_g: float) -> np.nda
 def l1_distance_batch(mat: np.ndarray, vec: np.ndarray) -> np.ndarray:
     return np.abs(mat - vec).sum(axis=1)
 
+def l1_distance_matrix(mat: np.ndarray, vecs: np.ndarray) -> np.ndarray:
+    """
+    users x foods L1 거리. 행 i는 l1_distance_batch(mat, vecs[i])와 같다.
+    (U, N, k) 임시 배열 없이 열 단위로 더해 peak 메모리를 U x N으로 유지.
+    """
+    mat = np.asarray(mat, dtype=float)
+    vecs = np.asarray(vecs, dtype=float)
+    out = np.abs(mat[None, :, 0] - vecs[:, 0, None])
+    for k in range(1, mat.shape[1]):
+        out += np.abs(mat[None, :, k] - vecs[:, k, None])
+    return out
+
 def compute_calorie_penalty(food_cal: float, target_cal: float, lambda_cal: float, soft_clip: float) -> float:
     if target_cal <= 0 or pd.isna(target_cal):
         return 0.0
@@ -49,6 +86,66 @@ def compute_purpose_delta_penalty(food_cal: float, target_cal: float, purpose: i
             return -lambda_purpose * under
     return 0.0
 
+def calorie_penalty_batch(food_cal: np.ndarray, target_cal: float, lambda_cal: float, soft_clip: float) -> np.ndarray:
+    """
+    compute_calorie_penalty의 NumPy 배열 버전(같은 값 반환).
+    """
+    cal = np.asarray(food_cal, dtype=float)
+    if target_cal is None or pd.isna(target_cal) or target_cal <= 0:
+        return np.zeros(cal.shape, dtype=float)
+    t = float(target_cal)
+    ratio = np.abs(cal - t) / t
+    ratio = np.minimum(ratio, soft_clip)
+    return -lambda_cal * ratio
+
+def purpose_delta_penalty_batch(food_cal: np.ndarray, target_cal: float, purpose: int, delta: float, lambda_purpose: float) -> np.ndarray:
+    """
+    compute_purpose_delta_penalty의 NumPy 배열 버전(같은 값 반환).
+    """
+    cal = np.asarray(food_cal, dtype=float)
+    out = np.zeros(cal.shape, dtype=float)
+    if target_cal is None or pd.isna(target_cal) or target_cal <= 0:
+        return out
+    t = float(target_cal)
+
+    if int(purpose) == 0:  # Diet
+        hi = t * (1.0 + delta)
+        m = cal > hi
+        out[m] = -lambda_purpose * ((cal[m] - hi) / t)
+    elif int(purpose) == 2:  # Bulk
+        lo = t * (1.0 - delta)
+        m = cal < lo
+        out[m] = -lambda_purpose * ((lo - cal[m]) / t)
+    return out
+
+def calorie_penalty_matrix(food_cal: np.ndarray, target_cals: np.ndarray, lambda_cal: float, soft_clip: float) -> np.ndarray:
+    """
+    users x foods calorie penalty. 행 i는 calorie_penalty_batch(food_cal, target_cals[i], ...)와 같다.
+    """
+    cal = np.asarray(food_cal, dtype=float)[None, :]
+    t = np.asarray(target_cals, dtype=float).reshape(-1, 1)
+    valid = ~np.isnan(t) & (t > 0)
+    t = np.where(valid, t, 1.0)
+    ratio = np.abs(cal - t) / t
+    ratio = np.minimum(ratio, soft_clip)
+    return np.where(valid, -lambda_cal * ratio, 0.0)
+
+def purpose_delta_penalty_matrix(food_cal: np.ndarray, target_cals: np.ndarray, purposes: np.ndarray, delta: float, lambda_purpose: float) -> np.ndarray:
+    """
+    users x foods purpose penalty. 행 i는 purpose_delta_penalty_batch(food_cal, target_cals[i], purposes[i], ...)와 같다.
+    """
+    cal = np.asarray(food_cal, dtype=float)[None, :]
+    t = np.asarray(target_cals, dtype=float).reshape(-1, 1)
+    p = np.asarray(purposes, dtype=int).reshape(-1, 1)
+    valid = ~np.isnan(t) & (t > 0)
+    t = np.where(valid, t, 1.0)
+
+    hi = t * (1.0 + delta)
+    lo = t * (1.0 - delta)
+    diet = np.where(valid & (p == 0) & (cal > hi), -lambda_purpose * ((cal - hi) / t), 0.0)
+    bulk = np.where(valid & (p == 2) & (cal < lo), -lambda_purpose * ((lo - cal) / t), 0.0)
+    return diet + bulk
+
 def keyword_blacklist_hit(food_name: str, blacklist: Iterable[str]) -> bool:
     if not isinstance(food_name, str):
         return False
@@ -57,6 +154,49 @@ def keyword_blacklist_hit(food_name: str, blacklist: Iterable[str]) -> bool:
             return True
     return False
 
+def guardrail_mask(
+    cand: pd.DataFrame,
+    fat_ratio_cap: float,
+    protein_min_g: float,
+    use_keyword_blacklist: bool,
+    keyword_blacklist: Iterable[str],
+) -> np.ndarray:
+    """
+    apply_guardrails 조건(fat ratio cap / protein min / keyword blacklist)을 bool mask로 반환.
+    True = guardrail 통과
+    """
+    ok = np.ones(len(cand), dtype=bool)
+
+    if "macro_ratio_f" in cand.columns:
+        ok &= (cand["macro_ratio_f"].fillna(0) <= fat_ratio_cap).to_numpy(dtype=bool)
+
+    if protein_min_g is not None and protein_min_g > 0:
+        if "food_prot_g" in cand.columns:
+            ok &= (cand["food_prot_g"].fillna(0) >= protein_min_g).to_numpy(dtype=bool)
+
+    kws = [str(k) for k in keyword_blacklist if str(k)] if keyword_blacklist else []
+    if use_keyword_blacklist and kws and "Food" in cand.columns:
+        pattern = "|".join(re.escape(k) for k in kws)
+        hit = cand["Food"].astype(str).str.contains(pattern, regex=True).fillna(False)
+        ok &= ~hit.to_numpy(dtype=bool)
+
+    return ok
+
+def guardrail_config_key(
+    fat_ratio_cap: float,
+    protein_min_g: float,
+    use_keyword_blacklist: bool,
+    keyword_blacklist: Iterable[str],
+) -> str:
+    """
+    guardrail 관련 config만으로 만든 hash. 미리 계산한 mask가 현재 config와 맞는지 확인용.
+    """
+    payload = json.dumps(
+        [float(fat_ratio_cap), protein_min_g, bool(use_keyword_blacklist), list(keyword_blacklist or [])],
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
 def apply_guardrails(
     cand: pd.DataFrame,
     fat_ratio_cap: float,
@@ -64,32 +204,70 @@ def apply_guardrails(
     use_keyword_blacklist: bool,
     keyword_blacklist: Iterable[str],
 ) -> pd.DataFrame:
-    df = cand.copy()
+    mask = guardrail_mask(cand, fat_ratio_cap, protein_min_g, use_keyword_blacklist, keyword_blacklist)
+    return cand[mask]
 
-    if "macro_ratio_f" in df.columns:
-        df = df[df["macro_ratio_f"].fillna(0) <= fat_ratio_cap].copy()
+def topk_unique_positions(
+    scores: np.ndarray,
+    keys: Optional[np.ndarray],
+    k: int,
+    allowed: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    sort(score desc, stable) -> key(Food id) 중복 제거 -> 앞에서 k개 와 같은 위치 배열을 반환.
+    - 전체 정렬 대신 argpartition으로 상위 head만 뽑아 정렬/중복 제거 (head가 모자라면 넓혀서 재시도)
+    - 동점은 앞 위치 우선, NaN은 맨 뒤(위치 순), allowed=False 위치는 제외
+    """
+    scores = np.asarray(scores, dtype=float)
+    pos = np.arange(len(scores)) if allowed is None else np.flatnonzero(allowed)
+    if k <= 0 or pos.size == 0:
+        return np.empty(0, dtype=np.int64)
 
-    if protein_min_g is not None and protein_min_g > 0:
-        if "food_prot_g" in df.columns:
-            df = df[df["food_prot_g"].fillna(0) >= protein_min_g].copy()
+    s = scores[pos]
+    finite = ~np.isnan(s)
+    fpos, fs = pos[finite], s[finite]
 
-    if use_keyword_blacklist and "Food" in df.columns:
-        mask = df["Food"].apply(lambda x: not keyword_blacklist_hit(str(x), keyword_blacklist))
-        df = df[mask].copy()
+    # k=1 & key 중복 제거 불필요: argmax 한 번(첫 최대값 위치)
+    if k == 1 and fpos.size:
+        return fpos[[int(np.argmax(fs))]]
 
-    return df
+    picked = np.empty(0, dtype=np.int64)
+    head = min(fpos.size, max(4 * k, 16))
+    while fpos.size:
+        if head < fpos.size:
+            part = np.argpartition(-fs, head - 1)[:head]
+            cand = np.flatnonzero(fs >= fs[part].min())  # 경계 동점까지 포함해야 stable 결과와 같음
+        else:
+            cand = np.arange(fpos.size)
+        order = fpos[cand[np.lexsort((fpos[cand], -fs[cand]))]]
+        picked = _first_unique(order, keys, k)
+        if picked.size >= k or head >= fpos.size:
+            break
+        head = min(fpos.size, head * 4)
+
+    if picked.size < k:
+        rest = pos[~finite]
+        if rest.size:
+            picked = _first_unique(np.concatenate([picked, rest]), keys, k)
+    return picked
+
+def _first_unique(order: np.ndarray, keys: Optional[np.ndarray], k: int) -> np.ndarray:
+    if keys is None:
+        return order[:k]
+    _, first = np.unique(np.asarray(keys)[order], return_index=True)
+    return order[np.sort(first)][:k]
 
 def diversity_unique_food(df_sorted: pd.DataFrame, k: int, used: Optional[Set[str]] = None) -> pd.DataFrame:
-    used = set() if used is None else set(used)
-    rows = []
-    for _, r in df_sorted.iterrows():
-        f = str(r.get("Food"))
-        if f in used:
-            continue
-        used.add(f)
-        rows.append(r)
-        if len(rows) >= k:
-            break
-    if not rows:
+    """
+    정렬된 후보에서 Food 중복/used 제외 후 앞에서 k개 (iterrows 없이 mask로 처리)
+    """
+    if k <= 0 or df_sorted.empty:
         return df_sorted.head(0)
-    return pd.DataFrame(rows).reset_index(drop=True)
\ No newline at end of file
+    if "Food" in df_sorted.columns:
+        f = df_sorted["Food"].astype(str)
+    else:
+        f = pd.Series("None", index=df_sorted.index)
+    keep = ~f.duplicated(keep="first").to_numpy()
+    if used:
+        keep &= ~f.isin(list(map(str, used))).to_numpy()
+    return df_sorted[keep].head(k).reset_index(drop=True)
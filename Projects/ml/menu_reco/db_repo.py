@@ -1,8 +1,13 @@
 # ml/menu_reco/db_repo.py
 from __future__ import annotations
 
+from datetime import datetime, timedelta
 from typing import Dict, Any, List, Tuple, Optional
 from django.db import connection, transaction
+from django.utils import timezone
+
+from conf.db_batch import bulk_insert
+from ml.menu_reco.food_dict import FOOD_NAMES
 
 def _fetchone_dict(sql: str, params: List[Any]) -> Optional[Dict[str, Any]]:
     with connection.cursor() as cur:
@@ -31,7 +36,8 @@ def get_profile(cust_id: str) -> Optional[Dict[str, Any]]:
         Recommended_calories,
         Ratio_carb,
         Ratio_protein,
-        Ratio_fat
+        Ratio_fat,
+        updated_time
     FROM CUS_PROFILE_TS
     WHERE cust_id = %s
     ORDER BY updated_time DESC
@@ -54,9 +60,9 @@ def get_day_eaten_sum(cust_id: str, rgs_dt: str) -> Dict[str, Any]:
 
 # 3) 최근 n일 macro 합(CUS_FOOD_TH 기반)
 def get_recent_macro_sum(cust_id: str, days: int = 7) -> Dict[str, Any]:
-    # rgs_dt가 YYYYMMDD 문자열이므로 날짜함수 적용이 어렵다면 그냥 최근 N일 기준을 python에서 계산해 넣는 게 더 안전.
-    # 여기서는 MySQL STR_TO_DATE를 사용(형식이 항상 YYYYMMDD라는 전제)
-    sql = f"""
+    # rgs_dt(YYYYMMDD 문자열)에 함수 적용하면 index를 못 타므로 시작일을 python에서 계산해서 그대로 비교
+    since = (timezone.localdate() - timedelta(days=int(days))).strftime("%Y%m%d")
+    sql = """
     SELECT
         COALESCE(SUM(kcal), 0)      AS sum_kcal,
         COALESCE(SUM(carb_g), 0)    AS sum_carb_g,
@@ -64,30 +70,151 @@ def get_recent_macro_sum(cust_id: str, days: int = 7) -> Dict[str, Any]:
         COALESCE(SUM(fat_g), 0)     AS sum_fat_g
     FROM CUS_FOOD_TH
     WHERE cust_id=%s
-      AND STR_TO_DATE(rgs_dt, '%%Y%%m%%d') >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+      AND rgs_dt >= %s
     """
-    return _fetchone_dict(sql, [cust_id, int(days)]) or {"sum_kcal": 0, "sum_carb_g": 0, "sum_protein_g": 0, "sum_fat_g": 0}
+    return _fetchone_dict(sql, [cust_id, since]) or {"sum_kcal": 0, "sum_carb_g": 0, "sum_protein_g": 0, "sum_fat_g": 0}
 
-# 4) Food name -> id 매핑
-def map_food_names_to_ids(food_names: List[str]) -> Dict[str, int]:
-    food_names = [str(x).strip() for x in (food_names or []) if str(x).strip()]
-    if not food_names:
-        return {}
+# 3-1) 추천 입력 스냅샷(프로필 + 당일 합계 + 최근 n일 합계)을 한 번에
+MACRO_KEYS = ("sum_kcal", "sum_carb_g", "sum_protein_g", "sum_fat_g")
+MACRO_DAILY_TABLE = "CUS_MACRO_DAILY_TH"
+# 일별 macro rollup (rollup_menu_reco_macros 커맨드가 어제까지 채움)
+MACRO_DAILY_DDL = f"""
+CREATE TABLE IF NOT EXISTS {MACRO_DAILY_TABLE} (
+    created_time VARCHAR(14),
+    updated_time VARCHAR(14),
+    cust_id      VARCHAR(10) NOT NULL,
+    rgs_dt       VARCHAR(8)  NOT NULL,
+    kcal         INT NOT NULL DEFAULT 0,
+    carb_g       INT NOT NULL DEFAULT 0,
+    protein_g    INT NOT NULL DEFAULT 0,
+    fat_g        INT NOT NULL DEFAULT 0,
+    n_meals      INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (cust_id, rgs_dt)
+)
+"""
 
-    in_ph = ",".join(["%s"] * len(food_names))
-    sql = f"""
-    SELECT name, food_id
-    FROM FOOD_TB
-    WHERE name IN ({in_ph})
+
+def _ymd_shift(ymd: str, days: int) -> str:
+    return (datetime.strptime(str(ymd), "%Y%m%d") + timedelta(days=days)).strftime("%Y%m%d")
+
+
+def _macro_dict(row: Dict[str, Any], prefix: str) -> Dict[str, float]:
+    return {k: float(row.get(f"{prefix}_{k}") or 0) for k in MACRO_KEYS}
+
+
+def get_user_reco_snapshot(cust_id: str, rgs_dt: str, days: int = 7, use_rollup: bool = False) -> Dict[str, Any]:
+    """
+    get_profile + get_day_eaten_sum + 최근 n일 macro 합을 1 round-trip으로.
+      - 최근 n일: rgs_dt BETWEEN (rgs_dt - days) AND rgs_dt (문자열 그대로 비교 -> (cust_id, rgs_dt) index 사용)
+      - use_rollup: 어제까지는 CUS_MACRO_DAILY_TH(사용자/일 1행), 오늘 이후만 CUS_FOOD_TH에서 직접 합산
+        -> 기록 이력 길이와 무관하게 최대 days+1행만 읽음
+    반환: {"profile": dict|None, "day": {sum_*}, "recent": {sum_*}}
+    """
+    start = _ymd_shift(rgs_dt, -int(days))
+    profile_sql = """
+        SELECT cust_id, purpose, Recommended_calories, Ratio_carb, Ratio_protein, Ratio_fat, updated_time
+        FROM CUS_PROFILE_TS
+        WHERE cust_id = %s
+        ORDER BY updated_time DESC
+        LIMIT 1
+    """
+    day_cols = """
+        COALESCE(SUM(CASE WHEN f.rgs_dt = %s THEN f.kcal END), 0)      AS day_sum_kcal,
+        COALESCE(SUM(CASE WHEN f.rgs_dt = %s THEN f.carb_g END), 0)    AS day_sum_carb_g,
+        COALESCE(SUM(CASE WHEN f.rgs_dt = %s THEN f.protein_g END), 0) AS day_sum_protein_g,
+        COALESCE(SUM(CASE WHEN f.rgs_dt = %s THEN f.fat_g END), 0)     AS day_sum_fat_g
+    """
+    group_by = """
+    GROUP BY p.cust_id, p.purpose, p.Recommended_calories, p.Ratio_carb, p.Ratio_protein, p.Ratio_fat, p.updated_time
     """
-    rows = _fetchall_dict(sql, food_names)
-    out: Dict[str, int] = {}
-    for r in rows:
-        nm = str(r["name"])
-        out[nm] = int(r["food_id"])
-    return out
 
-# 5) MENU_RECOM_TH upsert
+    if not use_rollup:
+        sql = f"""
+        SELECT
+            p.*,
+            {day_cols},
+            COALESCE(SUM(f.kcal), 0)      AS recent_sum_kcal,
+            COALESCE(SUM(f.carb_g), 0)    AS recent_sum_carb_g,
+            COALESCE(SUM(f.protein_g), 0) AS recent_sum_protein_g,
+            COALESCE(SUM(f.fat_g), 0)     AS recent_sum_fat_g
+        FROM ({profile_sql}) p
+        LEFT JOIN CUS_FOOD_TH f
+          ON f.cust_id = p.cust_id AND f.rgs_dt BETWEEN %s AND %s
+        {group_by}
+        """
+        params = [rgs_dt] * 4 + [cust_id, start, rgs_dt]
+    else:
+        # rollup은 어제까지만 확정본, 오늘(이후)은 원본에서
+        today = timezone.localdate().strftime("%Y%m%d")
+        rollup_end = min(str(rgs_dt), _ymd_shift(today, -1))
+        live_start = max(start, today)
+        f_start = min(live_start, rgs_dt)
+        sql = f"""
+        SELECT
+            p.*,
+            {day_cols},
+            COALESCE(MAX(r.kcal), 0)      + COALESCE(SUM(CASE WHEN f.rgs_dt >= %s THEN f.kcal END), 0)      AS recent_sum_kcal,
+            COALESCE(MAX(r.carb_g), 0)    + COALESCE(SUM(CASE WHEN f.rgs_dt >= %s THEN f.carb_g END), 0)    AS recent_sum_carb_g,
+            COALESCE(MAX(r.protein_g), 0) + COALESCE(SUM(CASE WHEN f.rgs_dt >= %s THEN f.protein_g END), 0) AS recent_sum_protein_g,
+            COALESCE(MAX(r.fat_g), 0)     + COALESCE(SUM(CASE WHEN f.rgs_dt >= %s THEN f.fat_g END), 0)     AS recent_sum_fat_g
+        FROM ({profile_sql}) p
+        LEFT JOIN (
+            SELECT cust_id, SUM(kcal) AS kcal, SUM(carb_g) AS carb_g, SUM(protein_g) AS protein_g, SUM(fat_g) AS fat_g
+            FROM {MACRO_DAILY_TABLE}
+            WHERE cust_id = %s AND rgs_dt BETWEEN %s AND %s
+            GROUP BY cust_id
+        ) r ON r.cust_id = p.cust_id
+        LEFT JOIN CUS_FOOD_TH f
+          ON f.cust_id = p.cust_id AND f.rgs_dt BETWEEN %s AND %s
+        {group_by}
+        """
+        params = [rgs_dt] * 4 + [live_start] * 4 + [cust_id, cust_id, start, rollup_end, f_start, rgs_dt]
+
+    row = _fetchone_dict(sql, params)
+    if row is None:
+        zeros = {k: 0.0 for k in MACRO_KEYS}
+        return {"profile": None, "day": dict(zeros), "recent": dict(zeros)}
+
+    profile = {k: row.get(k) for k in (
+        "cust_id", "purpose", "Recommended_calories", "Ratio_carb", "Ratio_protein", "Ratio_fat", "updated_time",
+    )}
+    return {"profile": profile, "day": _macro_dict(row, "day"), "recent": _macro_dict(row, "recent")}
+
+
+def rebuild_macro_daily_rollup(since: str, until: str) -> int:
+    """
+    CUS_FOOD_TH [since, until] 구간을 사용자/일 단위로 다시 집계해 CUS_MACRO_DAILY_TH를 교체.
+    (삭제된 식사도 반영되도록 구간 delete 후 insert, 한 트랜잭션)
+    반환: 기록된 (cust_id, rgs_dt) 행 수
+    """
+    delete_sql = f"DELETE FROM {MACRO_DAILY_TABLE} WHERE rgs_dt BETWEEN %s AND %s"
+    insert_sql = f"""
+    INSERT INTO {MACRO_DAILY_TABLE}
+      (created_time, updated_time, cust_id, rgs_dt, kcal, carb_g, protein_g, fat_g, n_meals)
+    SELECT
+      DATE_FORMAT(NOW(),'%%Y%%m%%d%%H%%i%%s'),
+      DATE_FORMAT(NOW(),'%%Y%%m%%d%%H%%i%%s'),
+      cust_id, rgs_dt,
+      COALESCE(SUM(kcal), 0), COALESCE(SUM(carb_g), 0), COALESCE(SUM(protein_g), 0), COALESCE(SUM(fat_g), 0),
+      COUNT(*)
+    FROM CUS_FOOD_TH
+    WHERE rgs_dt BETWEEN %s AND %s
+    GROUP BY cust_id, rgs_dt
+    """
+    with transaction.atomic(), connection.cursor() as cur:
+        cur.execute(delete_sql, [since, until])
+        cur.execute(insert_sql, [since, until])
+        return int(cur.rowcount or 0)
+
+# 4) Food name -> id 매핑 (프로세스 로컬 사전, 없는 이름만 DB 조회)
+def map_food_names_to_ids(food_names: List[str]) -> Dict[str, int]:
+    return FOOD_NAMES.ids_for_names(food_names or [])
+
+# 5) MENU_RECOM_TH upsert (단건/다건 모두 multi-row INSERT ... ON DUPLICATE KEY UPDATE 1문장)
+MENU_RECOM_COLS = ("cust_id", "rgs_dt", "rec_time_slot", "rec_type", "food_id")
+_NOW14_SQL = "DATE_FORMAT(NOW(),'%%Y%%m%%d%%H%%i%%s')"
+
+
 def upsert_menu_recom_rows(
     *, cust_id: str, rgs_dt: str, rec_time_slot: str, rows: List[Tuple[str, str]]
 ) -> None:
@@ -97,20 +224,253 @@ def upsert_menu_recom_rows(
       - food_id: str/int
     MENU_RECOM_TH 컬럼(이미지 기준): cust_id, rgs_dt, rec_time_slot, rec_type, food_id (+ created_time/updated_time)
     """
-    if not rows:
-        return
+    upsert_menu_recom_rows_bulk(
+        [(cust_id, rgs_dt, rec_time_slot, rec_type, food_id) for rec_type, food_id in rows or []]
+    )
+
+
+# 6) Phase1 incremental: watermark 이후 확정된 식사-감정 이벤트
+def fetch_meal_feel_events(since: str, until: str) -> List[Dict[str, Any]]:
+    """
+    식사(CUS_FOOD_TH/TS + FOOD_TB) 1건 = 로그 1행 (음식 단위)
+      - Mood/Energy: 같은 날짜/끼니의 CUS_FEEL_TH (식사 시점 context)
+      - y_final: 다음 끼니(M->L->D->다음날 M) 감정이 stable_yn='y'이면 1
+    다음 끼니 감정이 기록돼야 라벨이 확정되므로,
+    event_time = GREATEST(식사 created_time, 다음 감정 created_time) 기준으로 (since, until] 구간만 가져온다.
+    (같은 이벤트가 두 번 집계되지 않음. 이미 집계된 식사의 수정분은 반영되지 않음)
+    """
+    sql = """
+    SELECT
+        c.mood      AS mood,
+        c.energy    AS energy,
+        f.name      AS food,
+        f.kcal      AS kcal,
+        f.carb_g    AS carb_g,
+        f.protein_g AS protein_g,
+        f.fat_g     AS fat_g,
+        CASE WHEN n.stable_yn = 'y' THEN 1 ELSE 0 END AS y_final,
+        GREATEST(h.created_time, n.created_time) AS event_time
+    FROM CUS_FOOD_TH h
+    JOIN CUS_FOOD_TS s
+      ON s.cust_id = h.cust_id AND s.rgs_dt = h.rgs_dt AND s.seq = h.seq
+    JOIN FOOD_TB f
+      ON f.food_id = s.food_id
+    JOIN CUS_FEEL_TH c
+      ON c.cust_id = h.cust_id AND c.rgs_dt = h.rgs_dt AND c.time_slot = h.time_slot
+    JOIN CUS_FEEL_TH n
+      ON n.cust_id = h.cust_id
+     AND (
+          (h.time_slot = 'M' AND n.rgs_dt = h.rgs_dt AND n.time_slot = 'L')
+       OR (h.time_slot = 'L' AND n.rgs_dt = h.rgs_dt AND n.time_slot = 'D')
+       OR (h.time_slot = 'D' AND n.time_slot = 'M'
+           AND n.rgs_dt = DATE_FORMAT(DATE_ADD(STR_TO_DATE(h.rgs_dt, '%%Y%%m%%d'), INTERVAL 1 DAY), '%%Y%%m%%d'))
+     )
+    WHERE GREATEST(h.created_time, n.created_time) > %s
+      AND GREATEST(h.created_time, n.created_time) <= %s
+    """
+    return _fetchall_dict(sql, [since, until])
 
+# 7) FOOD_TB 증가분(food_id watermark)
+def fetch_foods_after(food_id: int) -> List[Dict[str, Any]]:
     sql = """
-    INSERT INTO MENU_RECOM_TH
-      (created_time, updated_time, cust_id, rgs_dt, rec_time_slot, rec_type, food_id)
-    VALUES
-      (DATE_FORMAT(NOW(),'%%Y%%m%%d%%H%%i%%s'),
-       DATE_FORMAT(NOW(),'%%Y%%m%%d%%H%%i%%s'),
-       %s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE
-       updated_time = VALUES(updated_time),
-       food_id      = VALUES(food_id)
+    SELECT food_id, name, kcal, carb_g, protein_g, fat_g
+    FROM FOOD_TB
+    WHERE food_id > %s
+    ORDER BY food_id
+    """
+    return _fetchall_dict(sql, [int(food_id)])
+
+# 8) 야간 사전 생성(pregen_menu_reco)용 bulk 조회/저장
+SLOT_ORDER = {"M": 0, "L": 1, "D": 2}
+
+
+def _in_ph(values: List[Any]) -> str:
+    return ",".join(["%s"] * len(values))
+
+
+def _next_reco_target(rgs_dt: str, slot: str) -> Tuple[str, str]:
+    """conf.views._derive_reco_target와 같은 규칙: M->같은날 L, L->같은날 D, D->다음날 M"""
+    if slot == "M":
+        return rgs_dt, "L"
+    if slot == "L":
+        return rgs_dt, "D"
+    return _ymd_shift(rgs_dt, 1), "M"
+
+
+def fetch_pregen_targets(
+    rgs_dt: str, after_cust_id: str = "", limit: int = 500
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    rgs_dt에 식사+감정 기록이 있는 사용자 중 cust_id > after_cust_id 인 limit명 (cust_id 순, keyset).
+    사용자별 마지막 완료 끼니(M<L<D, 같은 끼니면 seq 큰 쪽)의 mood/energy로 다음 추천 대상 계산.
+    반환: ([{cust_id, mood, energy, done_slot, reco_rgs_dt, reco_time_slot}], 이번 페이지 마지막 cust_id)
+      - 다음 페이지는 마지막 cust_id부터. 대상이 비어도 페이지가 남았을 수 있으니 끝은 마지막 cust_id == ""
+    """
+    # 페이지 = 감정 기록이 붙은 식사가 있는 사용자 (대상 계산과 같은 조인) -> 빈 페이지로 끝나지 않게
+    ids_sql = """
+    SELECT DISTINCT f.cust_id
+    FROM CUS_FOOD_TH f
+    WHERE f.rgs_dt = %s AND f.cust_id > %s
+      AND EXISTS (
+        SELECT 1 FROM CUS_FEEL_TH e
+        WHERE e.cust_id=f.cust_id AND e.rgs_dt=f.rgs_dt AND e.seq=f.seq AND e.time_slot=f.time_slot
+      )
+    ORDER BY f.cust_id
+    LIMIT %s
     """
+    with connection.cursor() as cur:
+        cur.execute(ids_sql, [rgs_dt, after_cust_id or "", int(limit)])
+        cust_ids = [str(r[0]) for r in cur.fetchall()]
+    if not cust_ids:
+        return [], ""
+
+    sql = f"""
+    SELECT f.cust_id, f.time_slot, f.seq, e.mood, e.energy
+    FROM CUS_FOOD_TH f
+    JOIN CUS_FEEL_TH e
+      ON e.cust_id=f.cust_id
+     AND e.rgs_dt=f.rgs_dt
+     AND e.seq=f.seq
+     AND e.time_slot=f.time_slot
+    WHERE f.rgs_dt = %s AND f.cust_id IN ({_in_ph(cust_ids)})
+    """
+    last: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+    for r in _fetchall_dict(sql, [rgs_dt] + cust_ids):
+        slot = str(r.get("time_slot") or "").strip().upper()
+        if slot not in SLOT_ORDER:
+            continue
+        key = (SLOT_ORDER[slot], int(r.get("seq") or 0))
+        cid = str(r["cust_id"])
+        if cid not in last or key > last[cid][0]:
+            last[cid] = (key, {**r, "time_slot": slot})
+
+    out = []
+    for cid in cust_ids:
+        if cid not in last:
+            continue  # 감정 기록 없는 식사만 있으면 추천 입력 없음(요청 경로와 같음)
+        r = last[cid][1]
+        reco_dt, reco_slot = _next_reco_target(rgs_dt, r["time_slot"])
+        out.append({
+            "cust_id": cid,
+            "mood": (r.get("mood") or "").strip().lower(),
+            "energy": (r.get("energy") or "").strip().lower(),
+            "done_slot": r["time_slot"],
+            "reco_rgs_dt": reco_dt,
+            "reco_time_slot": reco_slot,
+        })
+    return out, cust_ids[-1]
+
+
+def get_users_reco_snapshots(cust_ids: List[str], rgs_dt: str, days: int = 7) -> Dict[str, Dict[str, Any]]:
+    """
+    get_user_reco_snapshot의 다건 버전 (같은 rgs_dt 기준, 사용자 수와 무관하게 1 round-trip).
+    프로필 없는 사용자는 {"profile": None, ...}
+    """
+    zeros = {k: 0.0 for k in MACRO_KEYS}
+    out = {str(c): {"profile": None, "day": dict(zeros), "recent": dict(zeros)} for c in cust_ids}
+    if not cust_ids:
+        return out
+
+    ids = list(out.keys())
+    start = _ymd_shift(rgs_dt, -int(days))
+    sql = f"""
+    SELECT
+        p.cust_id, p.purpose, p.Recommended_calories, p.Ratio_carb, p.Ratio_protein, p.Ratio_fat, p.updated_time,
+        COALESCE(SUM(CASE WHEN f.rgs_dt = %s THEN f.kcal END), 0)      AS day_sum_kcal,
+        COALESCE(SUM(CASE WHEN f.rgs_dt = %s THEN f.carb_g END), 0)    AS day_sum_carb_g,
+        COALESCE(SUM(CASE WHEN f.rgs_dt = %s THEN f.protein_g END), 0) AS day_sum_protein_g,
+        COALESCE(SUM(CASE WHEN f.rgs_dt = %s THEN f.fat_g END), 0)     AS day_sum_fat_g,
+        COALESCE(SUM(f.kcal), 0)      AS recent_sum_kcal,
+        COALESCE(SUM(f.carb_g), 0)    AS recent_sum_carb_g,
+        COALESCE(SUM(f.protein_g), 0) AS recent_sum_protein_g,
+        COALESCE(SUM(f.fat_g), 0)     AS recent_sum_fat_g
+    FROM CUS_PROFILE_TS p
+    JOIN (
+        SELECT cust_id, MAX(updated_time) AS updated_time
+        FROM CUS_PROFILE_TS
+        WHERE cust_id IN ({_in_ph(ids)})
+        GROUP BY cust_id
+    ) m ON m.cust_id = p.cust_id AND m.updated_time = p.updated_time
+    LEFT JOIN CUS_FOOD_TH f
+      ON f.cust_id = p.cust_id AND f.rgs_dt BETWEEN %s AND %s
+    GROUP BY p.cust_id, p.purpose, p.Recommended_calories, p.Ratio_carb, p.Ratio_protein, p.Ratio_fat, p.updated_time
+    """
+    seen = set()
+    for row in _fetchall_dict(sql, [rgs_dt] * 4 + ids + [start, rgs_dt]):
+        cid = str(row["cust_id"])
+        if cid in seen:
+            continue  # 같은 updated_time 프로필이 여러 개면 1개만
+        seen.add(cid)
+        profile = {k: row.get(k) for k in (
+            "cust_id", "purpose", "Recommended_calories", "Ratio_carb", "Ratio_protein", "Ratio_fat", "updated_time",
+        )}
+        out[cid] = {"profile": profile, "day": _macro_dict(row, "day"), "recent": _macro_dict(row, "recent")}
+    return out
+
+
+def fetch_recent_food_names_bulk(cust_ids: List[str], limit: int = 10) -> Dict[str, List[str]]:
+    """
+    record.views_api._fetch_recent_food_names의 다건 버전(같은 정렬: rgs_dt desc, seq desc, food_seq asc).
+    사용자별 최근 limit행(ROW_NUMBER) -> 이름 중복 제거
+    """
+    out: Dict[str, List[str]] = {str(c): [] for c in cust_ids}
+    if not cust_ids:
+        return out
+    ids = list(out.keys())
+    sql = f"""
+    SELECT x.cust_id, x.name
+    FROM (
+        SELECT
+            s.cust_id, f.name,
+            ROW_NUMBER() OVER (PARTITION BY s.cust_id ORDER BY s.rgs_dt DESC, s.seq DESC, s.food_seq ASC) AS rn
+        FROM CUS_FOOD_TS s
+        JOIN FOOD_TB f ON f.food_id = s.food_id
+        WHERE s.cust_id IN ({_in_ph(ids)})
+    ) x
+    WHERE x.rn <= %s
+    ORDER BY x.cust_id, x.rn
+    """
+    with connection.cursor() as cur:
+        cur.execute(sql, ids + [int(limit)])
+        for cid, nm in cur.fetchall():
+            nm = (nm or "").strip()
+            names = out.setdefault(str(cid), [])
+            if nm and nm not in names:
+                names.append(nm)
+    return out
+
+
+def existing_menu_recom_keys(keys: List[Tuple[str, str, str]]) -> set:
+    """(cust_id, rgs_dt, rec_time_slot) 중 MENU_RECOM_TH에 이미 있는 것"""
+    if not keys:
+        return set()
+    cust_ids = sorted({k[0] for k in keys})
+    dates = sorted({k[1] for k in keys})
+    sql = f"""
+    SELECT DISTINCT cust_id, rgs_dt, rec_time_slot
+    FROM MENU_RECOM_TH
+    WHERE cust_id IN ({_in_ph(cust_ids)}) AND rgs_dt IN ({_in_ph(dates)})
+    """
+    with connection.cursor() as cur:
+        cur.execute(sql, cust_ids + dates)
+        found = {(str(a), str(b), str(c)) for a, b, c in cur.fetchall()}
+    return found & set(keys)
+
+
+def upsert_menu_recom_rows_bulk(rows: List[Tuple[str, str, str, str, str]], chunk_rows: int = 500) -> int:
+    """
+    rows: List[(cust_id, rgs_dt, rec_time_slot, rec_type, food_id)]
+    chunk_rows행씩 multi-row INSERT ... ON DUPLICATE KEY UPDATE 1문장 (전체 1 트랜잭션).
+    반환: 보낸 행 수
+    """
+    if not rows:
+        return 0
+    values = [tuple(map(str, r)) for r in rows]
     with transaction.atomic(), connection.cursor() as cur:
-        for rec_type, food_id in rows:
-            cur.execute(sql, [cust_id, rgs_dt, rec_time_slot, rec_type, str(food_id)])
\ No newline at end of file
+        bulk_insert(
+            cur, "MENU_RECOM_TH", MENU_RECOM_COLS, values,
+            const_exprs={"created_time": _NOW14_SQL, "updated_time": _NOW14_SQL},
+            update_columns=("updated_time", "food_id"),
+            chunk_rows=chunk_rows,
+        )
+    return len(values)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from ml.menu_reco.common.food_vocab import FoodVocab, codes_in
+
+MACRO_COLS = ("macro_ratio_c", "macro_ratio_p", "macro_ratio_f")
+
+
+def _readonly(a: np.ndarray) -> np.ndarray:
+    a.setflags(write=False)
+    return a
+
+
+def _float_col(df: pd.DataFrame, col: str, fill: Optional[float] = None) -> np.ndarray:
+    if col not in df.columns:
+        v = np.full(len(df), np.nan if fill is None else fill, dtype=float)
+        return _readonly(v)
+    s = pd.to_numeric(df[col], errors="coerce")
+    if fill is not None:
+        s = s.fillna(fill)
+    return _readonly(s.to_numpy(dtype=float, copy=True))
+
+
+@dataclass(frozen=True)
+class FoodCatalog:
+    """
+    후보 풀 1개를 struct-of-arrays로 들고 있는 불변 catalog (artifacts 로드 시 1회 생성).
+    - 요청 경로는 위치(index) 배열/mask로만 점수 계산 -> DataFrame copy 없음
+    - 최종 추천 행만 frame.iloc[pos]로 꺼낸다(frame은 공유, 읽기 전용)
+    """
+    frame: pd.DataFrame
+    vocab: FoodVocab            # 공용 Food 이름 사전 (이름 문자열은 여기만)
+    food_code: np.ndarray       # int32 Food id (vocab 기준, 같은 Food면 같은 code)
+    macro: np.ndarray           # (N, 3) macro_ratio_c/p/f
+    calories: np.ndarray        # NaN -> 0
+    protein_g: np.ndarray
+    emotion: np.ndarray         # NaN -> 0
+    mean_y_ctx: np.ndarray      # NaN -> 0
+    guardrail_ok: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pd.DataFrame,
+        guardrail_col: Optional[str] = None,
+        vocab: Optional[FoodVocab] = None,
+    ) -> "FoodCatalog":
+        food = df["Food"].astype(str) if "Food" in df.columns else pd.Series(["nan"] * len(df), dtype=object)
+        if vocab is None or not vocab.covers(food):
+            vocab = FoodVocab.from_frames([pd.DataFrame({"Food": food})], extra=vocab.names if vocab is not None else ())
+        codes = vocab.encode(food)
+        macro = np.column_stack([
+            pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float) if c in df.columns
+            else np.full(len(df), np.nan)
+            for c in MACRO_COLS
+        ]) if len(df) else np.empty((0, 3), dtype=float)
+
+        ok = None
+        if guardrail_col and guardrail_col in df.columns:
+            ok = _readonly(df[guardrail_col].to_numpy(dtype=bool, copy=True))
+
+        return cls(
+            frame=df,
+            vocab=vocab,
+            food_code=_readonly(codes),
+            macro=_readonly(np.ascontiguousarray(macro, dtype=float)),
+            calories=_float_col(df, "Calories", 0.0),
+            protein_g=_float_col(df, "food_prot_g"),
+            emotion=_float_col(df, "emotion_score", 0.0),
+            mean_y_ctx=_float_col(df, "mean_y_ctx", 0.0),
+            guardrail_ok=ok,
+        )
+
+    def __len__(self) -> int:
+        return len(self.food_code)
+
+    def food_name(self, pos: int) -> str:
+        return self.vocab.name(self.food_code[int(pos)])
+
+    def skip_mask(self, skip_foods: Iterable[str], pos: Optional[np.ndarray] = None) -> np.ndarray:
+        """skip_foods(exclude/history)에 해당하면 True (pos가 있으면 그 위치만). 이름 -> id 후 정수 isin"""
+        codes = self.food_code if pos is None else self.food_code[pos]
+        return codes_in(codes, self.vocab.ids(skip_foods))
+
+    def row(self, pos: int) -> Dict[str, Any]:
+        return self.frame.iloc[int(pos)].to_dict()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+from typing import Any, Dict, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from ml.menu_reco.common.constants import UNSTABLE_CONTEXTS
+from ml.menu_reco.common.ssot import (
+    macro_ratio_from_grams_to_kcal, normalize_mood_label, normalize_energy_label
+)
+
+# ----------------------------
+# Incremental Phase1 (running sum/count 기반)
+# ----------------------------
+# 상태: (Mood, Energy, Food)별 로그 수/ y_final 합 -> ctx_food_all, food_stats(emotion), bad_foods 전부 여기서 유도
+CTX_KEYS = ["Mood", "Energy", "Food"]
+CTX_SUM_COLS = CTX_KEYS + ["n_logs_ctx", "sum_y_ctx"]
+
+NUT_COLS = ["Calories", "food_carb_g", "food_prot_g", "food_fat_g"]
+MACRO_COLS = ["macro_ratio_c", "macro_ratio_p", "macro_ratio_f"]
+FOOD_NUT_COLS = ["Food"] + NUT_COLS + MACRO_COLS
+UNOBSERVED_COLS = ["Food", "Calories"] + MACRO_COLS
+
+
+def _normalize_ctx_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["Mood"] = df["Mood"].map({u: normalize_mood_label(u) for u in df["Mood"].unique()})
+    df["Energy"] = df["Energy"].map({u: normalize_energy_label(u) for u in df["Energy"].unique()})
+    df["Food"] = df["Food"].astype(str)
+    return df
+
+
+def _with_macro_ratios(nut: pd.DataFrame) -> pd.DataFrame:
+    nut = nut.copy()
+    if nut.empty:
+        for c in MACRO_COLS:
+            nut[c] = pd.Series(dtype=float)
+        return nut
+    ratios = np.vstack([
+        macro_ratio_from_grams_to_kcal(c, p, f)
+        for c, p, f in zip(nut["food_carb_g"], nut["food_prot_g"], nut["food_fat_g"])
+    ])
+    nut["macro_ratio_c"] = ratios[:, 0]
+    nut["macro_ratio_p"] = ratios[:, 1]
+    nut["macro_ratio_f"] = ratios[:, 2]
+    return nut
+
+
+def seed_state_from_artifacts(artifacts: Dict[str, Any], ctx_sums: Optional[pd.DataFrame] = None) -> Dict[str, pd.DataFrame]:
+    """
+    phase1 artifacts -> incremental 상태
+    - ctx_sums: 이전 빌드가 저장한 running sum이 있으면 그대로, 없으면(최초 1회)
+      ctx_food_all에서 복원(sum_y_ctx = mean_y_ctx * n_logs_ctx)
+    - food_nut: food_stats의 영양/ macro ratio (로그와 무관한 음식 카탈로그)
+    """
+    if ctx_sums is None:
+        ctx = _normalize_ctx_frame(artifacts["ctx_food_all"][CTX_KEYS + ["n_logs_ctx", "mean_y_ctx"]])
+        n = pd.to_numeric(ctx["n_logs_ctx"], errors="coerce").fillna(0).astype("int64")
+        ctx_sums = pd.DataFrame({
+            "Mood": ctx["Mood"].to_numpy(),
+            "Energy": ctx["Energy"].to_numpy(),
+            "Food": ctx["Food"].to_numpy(),
+            "n_logs_ctx": n.to_numpy(),
+            "sum_y_ctx": (pd.to_numeric(ctx["mean_y_ctx"], errors="coerce").fillna(0.0) * n).to_numpy(dtype=float),
+        })
+        ctx_sums = ctx_sums.groupby(CTX_KEYS, as_index=False, sort=False)[["n_logs_ctx", "sum_y_ctx"]].sum()
+    else:
+        ctx_sums = ctx_sums[CTX_SUM_COLS].copy()
+
+    food_nut = artifacts["food_stats"][FOOD_NUT_COLS].copy()
+    food_nut["Food"] = food_nut["Food"].astype(str)
+    food_nut = food_nut.drop_duplicates("Food", keep="first").reset_index(drop=True)
+
+    unobs = artifacts["unobserved_pool"][UNOBSERVED_COLS].copy()
+    unobs["Food"] = unobs["Food"].astype(str)
+    return {"ctx_sums": ctx_sums, "food_nut": food_nut, "unobserved_pool": unobs.reset_index(drop=True)}
+
+
+def add_new_foods(state: Dict[str, pd.DataFrame], foods: pd.DataFrame) -> int:
+    """
+    신규 음식(FOOD_TB food_id 증가분 / 로그에만 등장한 이름)을 카탈로그와 미관측 풀에 추가(in-place).
+    - foods: Food, Calories, food_carb_g, food_prot_g, food_fat_g
+    - 이미 있는 이름은 기존 영양값 유지
+    반환: 추가된 음식 수
+    """
+    if foods is None or foods.empty:
+        return 0
+    new = foods[["Food"] + NUT_COLS].copy()
+    new["Food"] = new["Food"].astype(str).str.strip()
+    new = new[new["Food"] != ""]
+    for c in NUT_COLS:
+        new[c] = pd.to_numeric(new[c], errors="coerce")
+    # 같은 이름이 여러 번이면 평균(build_food_stats와 동일 규칙)
+    new = new.groupby("Food", as_index=False, sort=False)[NUT_COLS].mean()
+    new = new[~new["Food"].isin(state["food_nut"]["Food"])]
+    if new.empty:
+        return 0
+
+    new = _with_macro_ratios(new)
+    state["food_nut"] = pd.concat([state["food_nut"], new[FOOD_NUT_COLS]], ignore_index=True)
+    state["unobserved_pool"] = pd.concat([state["unobserved_pool"], new[UNOBSERVED_COLS]], ignore_index=True)
+    return int(len(new))
+
+
+def apply_log_delta(state: Dict[str, pd.DataFrame], logs: pd.DataFrame) -> int:
+    """
+    watermark 이후 로그(Mood, Energy, Food, y_final)를 running sum/count에 더한다(in-place).
+    전체 로그 재집계 없이 delta만 groupby.
+    반환: 반영된 로그 행 수
+    """
+    if logs is None or logs.empty:
+        return 0
+    d = _normalize_ctx_frame(logs[CTX_KEYS + ["y_final"]])
+    d["y_final"] = pd.to_numeric(d["y_final"], errors="coerce").fillna(0.0)
+    agg = d.groupby(CTX_KEYS, sort=False).agg(n_logs_ctx=("y_final", "size"), sum_y_ctx=("y_final", "sum"))
+
+    cur = state["ctx_sums"].set_index(CTX_KEYS)
+    merged = cur.add(agg, fill_value=0)
+    merged["n_logs_ctx"] = merged["n_logs_ctx"].astype("int64")
+    state["ctx_sums"] = merged.reset_index()[CTX_SUM_COLS]
+    return int(len(d))
+
+
+def assemble_phase1_frames(state: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    """
+    상태 -> phase1 artifacts (food_stats, ctx_food_all, bad_foods, unobserved_pool)
+    컬럼 구성은 build_phase1_artifacts 결과와 동일.
+    """
+    ctx_sums = state["ctx_sums"]
+    food_nut = state["food_nut"]
+
+    per_food = ctx_sums.groupby("Food", sort=False).agg(
+        n_logs_total=("n_logs_ctx", "sum"), sum_y=("sum_y_ctx", "sum"),
+    )
+    fs = food_nut.set_index("Food")
+    n_total = per_food["n_logs_total"].reindex(fs.index).fillna(0).astype(int)
+    sum_y = per_food["sum_y"].reindex(fs.index).fillna(0.0)
+    food_stats = pd.DataFrame({
+        "Food": fs.index.to_numpy(),
+        **{c: fs[c].to_numpy() for c in NUT_COLS},
+        "emotion_score": (sum_y / n_total.replace(0, np.nan)).fillna(0.0).to_numpy(),
+        "n_logs_total": n_total.to_numpy(),
+        **{c: fs[c].to_numpy() for c in MACRO_COLS},
+    })
+
+    ctx = ctx_sums[ctx_sums["n_logs_ctx"] > 0]
+    ctx_food_all = pd.DataFrame({
+        "Mood": ctx["Mood"].to_numpy(),
+        "Energy": ctx["Energy"].to_numpy(),
+        "Food": ctx["Food"].to_numpy(),
+        "n_logs_ctx": ctx["n_logs_ctx"].to_numpy(dtype="int64"),
+        "mean_y_ctx": (ctx["sum_y_ctx"] / ctx["n_logs_ctx"]).to_numpy(dtype=float),
+    }).merge(food_stats, on="Food", how="left")
+
+    keys = list(zip(ctx["Mood"], ctx["Energy"]))
+    bad_foods: Set[str] = {f for f, k in zip(ctx["Food"], keys) if k in UNSTABLE_CONTEXTS}
+
+    logged = set(ctx["Food"])
+    unobs = state["unobserved_pool"]
+    unobserved_pool = unobs[~unobs["Food"].isin(logged)].reset_index(drop=True)
+
+    return {
+        "food_stats": food_stats,
+        "ctx_food_all": ctx_food_all,
+        "bad_foods": sorted(bad_foods),
+        "unobserved_pool": unobserved_pool[UNOBSERVED_COLS],
+    }
+
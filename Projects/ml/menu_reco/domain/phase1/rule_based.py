@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Dict, Tuple, Optional, Iterable, Set, Any  # ✅ Any 추가
+from typing import Dict, Tuple, Optional, Iterable, Set, Any, List, Sequence  # ✅ Any 추가
 import numpy as np
 import pandas as pd
 
@@ -7,9 +7,13 @@ from ml.menu_reco.common.config import Phase1Config
 from ml.menu_reco.common.constants import STABLE_CONTEXTS, UNSTABLE_CONTEXTS, RECOVERY_CONTEXTS
 from ml.menu_reco.common.ssot import (
     to_numeric_safe, normalize_macro, macro_ratio_from_grams_to_kcal,
-    l1_distance_batch, compute_calorie_penalty, compute_purpose_delta_penalty,
-    apply_guardrails, diversity_unique_food
+    l1_distance_batch, l1_distance_matrix, calorie_penalty_batch, purpose_delta_penalty_batch,
+    calorie_penalty_matrix, purpose_delta_penalty_matrix,
+    apply_guardrails, guardrail_mask, guardrail_config_key, topk_unique_positions
 )
+from ml.menu_reco.common.food_vocab import FoodVocab, codes_in
+from ml.menu_reco.domain.phase1.catalog import FoodCatalog
+from ml.menu_reco.domain.phase1.spatial import CatalogGrid
 
 # ----------------------------
 # Build artifacts (pure)
@@ -131,11 +135,103 @@ def build_phase1_artifacts(foods: pd.DataFrame, users: pd.DataFrame, logs: pd.Da
         "unobserved_pool": unobserved_pool,
     }
 
+# ----------------------------
+# Candidate index (artifacts 로드 시 1회)
+# ----------------------------
+GUARDRAIL_COL = "guardrail_ok"
+
+def _guardrail_key(cfg: Phase1Config) -> str:
+    return guardrail_config_key(cfg.FAT_RATIO_CAP, cfg.PROTEIN_MIN_G, cfg.USE_KEYWORD_BLACKLIST, cfg.KEYWORD_BLACKLIST)
+
+def precompute_guardrails(artifacts: Dict[str, Any], cfg: Phase1Config) -> None:
+    """
+    ctx_food_all에 guardrail 통과 여부(guardrail_ok) 컬럼을 미리 붙인다(in-place).
+    - artifacts 데이터 + Phase1Config에만 의존하므로 로드 시 1회
+    - config hash(guardrail_cfg_key)를 같이 저장해서, 요청 cfg가 다르면 기존 apply_guardrails로 처리
+    """
+    ctx = artifacts["ctx_food_all"]
+    ctx[GUARDRAIL_COL] = guardrail_mask(
+        ctx,
+        fat_ratio_cap=cfg.FAT_RATIO_CAP,
+        protein_min_g=cfg.PROTEIN_MIN_G,
+        use_keyword_blacklist=cfg.USE_KEYWORD_BLACKLIST,
+        keyword_blacklist=cfg.KEYWORD_BLACKLIST,
+    )
+    artifacts["guardrail_cfg_key"] = _guardrail_key(cfg)
+
+RECOVERY_POOL_KEY: Tuple[str, str] = ("RECOVERY", "POOL")
+
+def build_candidate_index(
+    ctx_food_all: pd.DataFrame,
+    bad_foods: Set[str],
+    vocab: Optional[FoodVocab] = None,
+) -> Dict[Tuple[str, str], pd.DataFrame]:
+    """
+    (Mood, Energy)별 후보 풀과 recovery 풀(RECOVERY_CONTEXTS concat)을 미리 나눠 둔다.
+    - bad_foods는 여기서 미리 제외 (vocab이 있으면 문자열 isin 대신 bitmap[Food id])
+    - 반환되는 DataFrame은 요청 간 공유되므로 읽기 전용으로만 사용(in-place 수정 금지)
+    """
+    df = ctx_food_all
+    if "Food" in df.columns and len(bad_foods) > 0:
+        if vocab is not None:
+            codes = vocab.encode(df["Food"])
+            bad = vocab.bitmap(bad_foods)
+            df = df[~((codes >= 0) & bad[np.maximum(codes, 0)])]
+        else:
+            df = df[~df["Food"].astype(str).isin(bad_foods)]
+
+    index: Dict[Tuple[str, str], pd.DataFrame] = {}
+    for (m, e), g in df.groupby(["Mood","Energy"], sort=False):
+        index[(str(m), str(e))] = g
+
+    empty = df.head(0)
+    rec_parts = [index.get((rm, re), empty) for rm, re in RECOVERY_CONTEXTS]
+    index[RECOVERY_POOL_KEY] = pd.concat(rec_parts, ignore_index=True) if rec_parts else empty
+    return index
+
+def ensure_food_vocab(artifacts: Dict[str, Any]) -> FoodVocab:
+    """
+    artifacts["food_vocab"](compile된 food_vocab.arrow 등)이 ctx_food_all / unobserved_pool의 Food를 다 덮으면 그대로,
+    아니면 두 frame으로 새로 만든다(in-place, 반환도 함)
+    """
+    vocab: Optional[FoodVocab] = artifacts.get("food_vocab")
+    frames = [artifacts.get("ctx_food_all"), artifacts.get("unobserved_pool")]
+    if vocab is None or not all(vocab.covers(df["Food"]) for df in frames if df is not None and "Food" in df.columns):
+        vocab = FoodVocab.from_frames(frames)
+    artifacts["food_vocab"] = vocab
+    return vocab
+
+def build_food_catalogs(artifacts: Dict[str, Any]) -> None:
+    """
+    candidate_index 블록 / unobserved_pool을 FoodCatalog(struct-of-arrays)로 변환해 artifacts에 둔다(in-place).
+    - food_vocab: 공용 이름 사전 (없거나 풀 Food를 다 못 덮으면 ctx_food_all + unobserved_pool로 새로 만듦)
+    - candidate_catalogs: (Mood, Energy) / RECOVERY_POOL_KEY -> FoodCatalog
+    - unobserved_catalog: 탐색형 풀
+    """
+    vocab = ensure_food_vocab(artifacts)
+    index = artifacts.get("candidate_index") or {}
+    artifacts["candidate_catalogs"] = {
+        key: FoodCatalog.from_frame(block, guardrail_col=GUARDRAIL_COL, vocab=vocab) for key, block in index.items()
+    }
+    artifacts["unobserved_catalog"] = FoodCatalog.from_frame(artifacts["unobserved_pool"], vocab=vocab)
+
 # ----------------------------
 # Recommend (pure)
 # ----------------------------
-def _get_candidate_pool(mood: str, energy: str, ctx_food_all: pd.DataFrame) -> Tuple[pd.DataFrame, Tuple[str, str]]:
+def _get_candidate_pool(
+    mood: str,
+    energy: str,
+    ctx_food_all: pd.DataFrame,
+    candidate_index: Optional[Dict[Tuple[str, str], pd.DataFrame]] = None,
+) -> Tuple[pd.DataFrame, Tuple[str, str]]:
     key = (str(mood), str(energy))
+
+    # ✅ 미리 만든 index가 있으면 table scan 없이 블록만 꺼냄(bad_foods 제외 완료 상태)
+    if candidate_index is not None:
+        if key in STABLE_CONTEXTS:
+            return candidate_index.get(key, ctx_food_all.head(0)), key
+        return candidate_index.get(RECOVERY_POOL_KEY, ctx_food_all.head(0)), RECOVERY_POOL_KEY
+
     if key in STABLE_CONTEXTS:
         pool = ctx_food_all[(ctx_food_all["Mood"]==key[0]) & (ctx_food_all["Energy"]==key[1])].copy()
         return pool, key
@@ -145,7 +241,7 @@ def _get_candidate_pool(mood: str, energy: str, ctx_food_all: pd.DataFrame) -> T
         sub = ctx_food_all[(ctx_food_all["Mood"]==rm) & (ctx_food_all["Energy"]==re)].copy()
         rec_parts.append(sub)
     pool = pd.concat(rec_parts, ignore_index=True) if rec_parts else ctx_food_all.head(0).copy()
-    return pool, ("RECOVERY", "POOL")
+    return pool, RECOVERY_POOL_KEY
 
 def _score_foods(pool: pd.DataFrame, user_vec_pref: np.ndarray, health_vec: np.ndarray, purpose: int, per_meal_target: float, cfg: Phase1Config,
                  w_pref: float, w_health: float) -> pd.DataFrame:
@@ -158,17 +254,242 @@ def _score_foods(pool: pd.DataFrame, user_vec_pref: np.ndarray, health_vec: np.n
     ctx_bonus = cfg.W_CTX * df["mean_y_ctx"].fillna(0).to_numpy()
     global_bonus = cfg.W_GLOBAL * df["emotion_score"].fillna(0).to_numpy()
 
-    cal_pen = df["Calories"].fillna(0).apply(
-        lambda c: compute_calorie_penalty(c, per_meal_target, cfg.LAMBDA_CAL, cfg.CAL_SOFT_CLIP)
-    ).to_numpy()
-    pur_pen = df["Calories"].fillna(0).apply(
-        lambda c: compute_purpose_delta_penalty(c, per_meal_target, purpose, cfg.DELTA, cfg.LAMBDA_PURPOSE)
-    ).to_numpy()
+    cal = df["Calories"].fillna(0).to_numpy(dtype=float)
+    cal_pen = calorie_penalty_batch(cal, per_meal_target, cfg.LAMBDA_CAL, cfg.CAL_SOFT_CLIP)
+    pur_pen = purpose_delta_penalty_batch(cal, per_meal_target, purpose, cfg.DELTA, cfg.LAMBDA_PURPOSE)
 
     df["score_base"] = base
     df["score_final"] = base + ctx_bonus + global_bonus + cal_pen + pur_pen
     return df
 
+def _score_catalog(cat: FoodCatalog, user_vec_pref: np.ndarray, health_vec: np.ndarray, purpose: int, per_meal_target: float,
+                   cfg: Phase1Config, w_pref: float, w_health: float,
+                   pos: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    _score_foods와 같은 식을 catalog 배열 전체(pos가 있으면 그 위치만)에 계산 -> (score_base, score_final)
+    후보 제외는 점수 대신 mask로 처리한다.
+    """
+    macro = cat.macro if pos is None else cat.macro[pos]
+    cal = cat.calories if pos is None else cat.calories[pos]
+    d_pref = l1_distance_batch(macro, user_vec_pref)
+    d_health = l1_distance_batch(macro, health_vec)
+
+    base = -(w_pref*d_pref + w_health*d_health)
+    ctx_bonus = cfg.W_CTX * (cat.mean_y_ctx if pos is None else cat.mean_y_ctx[pos])
+    global_bonus = cfg.W_GLOBAL * (cat.emotion if pos is None else cat.emotion[pos])
+
+    cal_pen = calorie_penalty_batch(cal, per_meal_target, cfg.LAMBDA_CAL, cfg.CAL_SOFT_CLIP)
+    pur_pen = purpose_delta_penalty_batch(cal, per_meal_target, purpose, cfg.DELTA, cfg.LAMBDA_PURPOSE)
+    return base, base + ctx_bonus + global_bonus + cal_pen + pur_pen
+
+def _explore_scores(cat: FoodCatalog, target_vec: np.ndarray, purpose: int, per_meal_target: float, cfg: Phase1Config,
+                    pos: Optional[np.ndarray] = None) -> np.ndarray:
+    """탐색형 점수: -L1(macro, target_vec) + calorie/purpose penalty"""
+    macro = cat.macro if pos is None else cat.macro[pos]
+    cal = cat.calories if pos is None else cat.calories[pos]
+    cal_pen = calorie_penalty_batch(cal, per_meal_target, cfg.LAMBDA_CAL, cfg.CAL_SOFT_CLIP)
+    pur_pen = purpose_delta_penalty_batch(cal, per_meal_target, purpose, cfg.DELTA, cfg.LAMBDA_PURPOSE)
+    return -l1_distance_batch(macro, target_vec) + cal_pen + pur_pen
+
+def _candidate_mask(cat: FoodCatalog, artifacts: Dict[str, Any], cfg: Phase1Config, skip_foods: Set[str]) -> np.ndarray:
+    """
+    _prepare_pool의 mask 버전: guardrail AND not(exclude/history)
+    """
+    if cat.guardrail_ok is not None and artifacts.get("guardrail_cfg_key") == _guardrail_key(cfg):
+        ok = cat.guardrail_ok
+    else:
+        ok = guardrail_mask(
+            cat.frame,
+            fat_ratio_cap=cfg.FAT_RATIO_CAP,
+            protein_min_g=cfg.PROTEIN_MIN_G,
+            use_keyword_blacklist=cfg.USE_KEYWORD_BLACKLIST,
+            keyword_blacklist=cfg.KEYWORD_BLACKLIST,
+        )
+    if skip_foods:
+        ok = ok & ~cat.skip_mask(skip_foods)
+    return ok
+
+def _grid_usable(cat: FoodCatalog, artifacts: Dict[str, Any], cfg: Phase1Config) -> bool:
+    """grid 경로 조건: 로드 시 guardrail mask가 현재 cfg 기준 + 거리 가중치가 음수가 아님(upper bound 성립)"""
+    return (
+        cat.guardrail_ok is not None
+        and artifacts.get("guardrail_cfg_key") == _guardrail_key(cfg)
+        and cfg.W_PREF >= 0 and cfg.W_HEALTH >= 0
+    )
+
+def _grid_best(grid: CatalogGrid, ub: np.ndarray, score_fn, allowed_fn) -> int:
+    """CatalogGrid.best_first 결과를 _first_best 형태(-1 = 못 찾음 -> full scan)로"""
+    pos = grid.best_first(ub, score_fn, allowed_fn)
+    return -1 if pos is None else int(pos)
+
+REC_PREF = ("선호형 (Preference)", "hybrid 선호 중심 + 칼로리/목표(Purpose δ) + Guardrail")
+REC_HEALTH = ("건강형 (Health 5:3:2)", "5:3:2 근접 중심 + 칼로리/목표(Purpose δ) + Guardrail")
+
+def _prepare_pool(pool: pd.DataFrame, artifacts: Dict[str, Any], cfg: Phase1Config, skip_foods: Set[str]) -> pd.DataFrame:
+    """
+    후보 풀 필터: bad_foods(index 미사용 시) -> exclude/history -> guardrail
+    """
+    if "Food" in pool.columns:
+        if artifacts.get("candidate_index") is None:
+            pool = pool[~pool["Food"].astype(str).isin(artifacts["bad_foods_set"])].copy()
+        if skip_foods:
+            pool = pool[~pool["Food"].astype(str).isin(skip_foods)].copy()
+
+    # ✅ 로드 시 계산한 mask가 현재 cfg와 같으면 mask AND 한 번으로 끝
+    if GUARDRAIL_COL in pool.columns and artifacts.get("guardrail_cfg_key") == _guardrail_key(cfg):
+        return pool[pool[GUARDRAIL_COL].to_numpy(dtype=bool)]
+    return apply_guardrails(
+        pool,
+        fat_ratio_cap=cfg.FAT_RATIO_CAP,
+        protein_min_g=cfg.PROTEIN_MIN_G,
+        use_keyword_blacklist=cfg.USE_KEYWORD_BLACKLIST,
+        keyword_blacklist=cfg.KEYWORD_BLACKLIST
+    )
+
+def _error_frame(pool_used: Tuple[str, str]) -> pd.DataFrame:
+    return pd.DataFrame([{
+        "rec_type": "ERROR",
+        "Food": "N/A",
+        "Explanation": f"No candidates. pool_used={pool_used}"
+    }])
+
+def _explore_weights(explore_weight_pref: float, explore_weight_health: float) -> Tuple[float, float]:
+    wp, wh = float(explore_weight_pref), float(explore_weight_health)
+    s = (wp + wh) if (wp + wh) > 1e-12 else 1.0
+    return wp/s, wh/s
+
+def _scored_row(pool: pd.DataFrame, pos: int, score_base: float, score_final: float) -> Dict[str, Any]:
+    r = pool.iloc[pos].to_dict()
+    r["score_base"] = score_base
+    r["score_final"] = score_final
+    return r
+
+def _pack_pick(row: Optional[Dict[str, Any]], rec: Tuple[str, str], mood: str, energy: str, pool_used: Tuple[str, str]) -> Dict:
+    rec_type, explanation = rec
+    if row is None:
+        return {"rec_type": rec_type, "Food": "N/A", "Explanation": explanation}
+    r = dict(row)
+    r["rec_type"] = rec_type
+    r["Explanation"] = explanation
+    r["Mood_req"] = str(mood)
+    r["Energy_req"] = str(energy)
+    r["Pool_used"] = f"{pool_used}"
+    r["score_phase1"] = r.get("score_final", np.nan)
+    return r
+
+def _pack_explore(row: Optional[Dict[str, Any]], mood: str, energy: str, wp: float, wh: float) -> Dict:
+    if row is None:
+        return {
+            "rec_type": "탐색형 (Exploration)",
+            "Food": "N/A",
+            "Calories": 0,
+            "Explanation": "미관측 풀 부족/중복 제외로 후보 없음",
+            "Mood_req": str(mood),
+            "Energy_req": str(energy),
+            "Pool_used": "UNOBSERVED_POOL",
+            "score_phase1": np.nan,
+        }
+    r = dict(row)
+    r["rec_type"] = "탐색형 (Exploration)"
+    r["Mood_req"] = str(mood)
+    r["Energy_req"] = str(energy)
+    r["Pool_used"] = "UNOBSERVED_POOL"
+    r["Explanation"] = f"미관측 풀에서 target_vec={wp:.2f}*pref + {wh:.2f}*healthy"
+    r["score_phase1"] = r.get("score_final", np.nan)
+    return r
+
+def _recommend_from_catalog(
+    artifacts: Dict[str, Any],
+    cat: Optional[FoodCatalog],
+    pool_used: Tuple[str, str],
+    mood: str,
+    energy: str,
+    cfg: Phase1Config,
+    user_vec: np.ndarray,
+    healthy_vec: np.ndarray,
+    purpose: int,
+    per_meal_target: float,
+    skip_set: Set[str],
+    explore_weight_pref: float,
+    explore_weight_health: float,
+) -> pd.DataFrame:
+    """
+    recommend_phase1_2plus1의 catalog 경로 (결과는 DataFrame 경로와 동일)
+    - 후보 필터: mask, 정렬+diversity: _first_best(동점이면 앞 위치)
+    """
+    # ✅ grid index가 있으면 upper bound 높은 cell부터만 점수 계산 (결과는 full scan과 동일, 못 찾으면 full scan)
+    grid = (artifacts.get("catalog_grids") or {}).get(pool_used) if cat is not None else None
+    p = h = -1
+    if grid is not None and _grid_usable(cat, artifacts, cfg):
+        skip_ids = cat.vocab.ids(skip_set)
+
+        def _ok(pos: np.ndarray) -> np.ndarray:
+            return cat.guardrail_ok[pos] & ~codes_in(cat.food_code[pos], skip_ids)
+
+        ub_p = grid.upper_bounds([(user_vec, cfg.W_PREF)], cfg.W_CTX, cfg.W_GLOBAL, per_meal_target, purpose, cfg)
+        p = _grid_best(grid, ub_p, lambda pos: _score_catalog(
+            cat, user_vec, healthy_vec, purpose, per_meal_target, cfg, w_pref=cfg.W_PREF, w_health=0.0, pos=pos)[1], _ok)
+        if p >= 0:
+            ub_h = grid.upper_bounds([(healthy_vec, cfg.W_HEALTH)], cfg.W_CTX, cfg.W_GLOBAL, per_meal_target, purpose, cfg)
+            code_p = cat.food_code[p]
+            h = _grid_best(grid, ub_h, lambda pos: _score_catalog(
+                cat, user_vec, healthy_vec, purpose, per_meal_target, cfg, w_pref=0.0, w_health=cfg.W_HEALTH, pos=pos)[1],
+                lambda pos: _ok(pos) & (cat.food_code[pos] != code_p))
+
+    if p >= 0 and h >= 0:
+        at_p, at_h = np.array([p]), np.array([h])
+        base_p, s_p = _score_catalog(cat, user_vec, healthy_vec, purpose, per_meal_target, cfg, w_pref=cfg.W_PREF, w_health=0.0, pos=at_p)
+        base_h, s_h = _score_catalog(cat, user_vec, healthy_vec, purpose, per_meal_target, cfg, w_pref=0.0, w_health=cfg.W_HEALTH, pos=at_h)
+        row_p = _scored_row(cat.frame, p, float(base_p[0]), float(s_p[0]))
+        row_h = _scored_row(cat.frame, h, float(base_h[0]), float(s_h[0]))
+    else:
+        ok = _candidate_mask(cat, artifacts, cfg, skip_set) if cat is not None else None
+        if ok is None or not ok.any():
+            return _error_frame(pool_used)
+
+        base_p, s_p = _score_catalog(cat, user_vec, healthy_vec, purpose, per_meal_target, cfg, w_pref=cfg.W_PREF, w_health=0.0)
+        base_h, s_h = _score_catalog(cat, user_vec, healthy_vec, purpose, per_meal_target, cfg, w_pref=0.0, w_health=cfg.W_HEALTH)
+
+        p = _first_best(s_p, ok)
+        h = _first_best(s_h, ok & (cat.food_code != cat.food_code[p]))
+        row_p = _scored_row(cat.frame, p, float(base_p[p]), float(s_p[p]))
+        row_h = _scored_row(cat.frame, h, float(base_h[h]), float(s_h[h])) if h >= 0 else None
+
+    used = set(skip_set)
+    used.add(cat.food_name(p))
+    if h >= 0:
+        used.add(cat.food_name(h))
+
+    # exploration
+    wp, wh = _explore_weights(explore_weight_pref, explore_weight_health)
+    target_vec = wp*user_vec + wh*healthy_vec
+
+    row_e = None
+    ex_cat: FoodCatalog = artifacts["unobserved_catalog"]
+    if len(ex_cat):
+        ex_grid = artifacts.get("unobserved_grid")
+        j = -1
+        if ex_grid is not None:
+            used_ids = ex_cat.vocab.ids(used)
+            ub_e = ex_grid.upper_bounds([(target_vec, 1.0)], 0.0, 0.0, per_meal_target, purpose, cfg)
+            j = _grid_best(ex_grid, ub_e, lambda pos: _explore_scores(ex_cat, target_vec, purpose, per_meal_target, cfg, pos=pos),
+                           lambda pos: ~codes_in(ex_cat.food_code[pos], used_ids))
+        if j >= 0:
+            s_j = float(_explore_scores(ex_cat, target_vec, purpose, per_meal_target, cfg, pos=np.array([j]))[0])
+        else:
+            s_e = _explore_scores(ex_cat, target_vec, purpose, per_meal_target, cfg)
+            j = _first_best(s_e, ~ex_cat.skip_mask(used))
+            s_j = float(s_e[j]) if j >= 0 else np.nan
+        if j >= 0:
+            row_e = ex_cat.row(j)
+            row_e["score_final"] = s_j
+
+    return pd.DataFrame([
+        _pack_pick(row_p, REC_PREF, mood, energy, pool_used),
+        _pack_pick(row_h, REC_HEALTH, mood, energy, pool_used),
+        _pack_explore(row_e, mood, energy, wp, wh),
+    ])
+
 def recommend_phase1_2plus1(
     artifacts: Dict[str, Any],
     product_name: str,
@@ -187,10 +508,10 @@ def recommend_phase1_2plus1(
 ) -> pd.DataFrame:
     user_pref: pd.DataFrame = artifacts["user_pref"]
     ctx_food_all: pd.DataFrame = artifacts["ctx_food_all"]
-    bad_foods: Set[str] = artifacts["bad_foods_set"]
     unobserved_pool: pd.DataFrame = artifacts["unobserved_pool"]
+    candidate_index = artifacts.get("candidate_index")
 
-    pool, pool_used = _get_candidate_pool(mood, energy, ctx_food_all)
+    pool, pool_used = _get_candidate_pool(mood, energy, ctx_food_all, candidate_index=candidate_index)
 
     # ✅ override가 있으면 user_pref lookup 없이 진행
     if user_vec_override is not None and per_meal_target_override is not None and purpose_override is not None:
@@ -214,99 +535,251 @@ def recommend_phase1_2plus1(
     exclude_set = set(map(str, exclude_foods)) if exclude_foods else set()
     hist_set = set(map(str, history_foods)) if history_foods else set()
 
-    if "Food" in pool.columns:
-        pool = pool[~pool["Food"].astype(str).isin(bad_foods)].copy()
-        if exclude_set:
-            pool = pool[~pool["Food"].astype(str).isin(exclude_set)].copy()
-        if hist_set:
-            pool = pool[~pool["Food"].astype(str).isin(hist_set)].copy()
+    # ✅ 로드 시 catalog가 만들어져 있으면 배열/mask 경로 (DataFrame은 최종 3행만)
+    catalogs = artifacts.get("candidate_catalogs")
+    if catalogs is not None:
+        return _recommend_from_catalog(
+            artifacts, catalogs.get(pool_used), pool_used, mood, energy, cfg,
+            user_vec, healthy_vec, purpose, per_meal_target, exclude_set | hist_set,
+            explore_weight_pref, explore_weight_health,
+        )
 
-    pool = apply_guardrails(
-        pool,
-        fat_ratio_cap=cfg.FAT_RATIO_CAP,
-        protein_min_g=cfg.PROTEIN_MIN_G,
-        use_keyword_blacklist=cfg.USE_KEYWORD_BLACKLIST,
-        keyword_blacklist=cfg.KEYWORD_BLACKLIST
-    )
+    pool = _prepare_pool(pool, artifacts, cfg, exclude_set | hist_set)
 
     if pool.empty:
-        return pd.DataFrame([{
-            "rec_type": "ERROR",
-            "Food": "N/A",
-            "Explanation": f"No candidates. pool_used={pool_used}"
-        }])
+        return _error_frame(pool_used)
 
-    # pref/health scoring
-    scored_pref = _score_foods(pool, user_vec, healthy_vec, purpose, per_meal_target, cfg, w_pref=cfg.W_PREF, w_health=0.0)\
-        .sort_values("score_final", ascending=False)
+    # pref/health scoring: 전체 sort 대신 top-k(argpartition) + Food id 중복 제거 (동점이면 pool 순서 우선)
+    codes, _ = pd.factorize(pool["Food"].astype(str))
+    scored_pref = _score_foods(pool, user_vec, healthy_vec, purpose, per_meal_target, cfg, w_pref=cfg.W_PREF, w_health=0.0)
+    scored_health = _score_foods(pool, user_vec, healthy_vec, purpose, per_meal_target, cfg, w_pref=0.0, w_health=cfg.W_HEALTH)
 
-    scored_health = _score_foods(pool, user_vec, healthy_vec, purpose, per_meal_target, cfg, w_pref=0.0, w_health=cfg.W_HEALTH)\
-        .sort_values("score_final", ascending=False)
+    p = topk_unique_positions(scored_pref["score_final"].to_numpy(dtype=float), codes, k=1)
+    top_pref = scored_pref.iloc[p]
+    allowed_h = (codes != codes[p[0]]) if p.size else None
+    h = topk_unique_positions(scored_health["score_final"].to_numpy(dtype=float), codes, k=1, allowed=allowed_h)
+    top_health = scored_health.iloc[h]
+    used_foods: Set[str] = set(top_pref["Food"].astype(str)) | set(top_health["Food"].astype(str))
 
-    used_foods: Set[str] = set()
-    top_pref = diversity_unique_food(scored_pref, k=1, used=used_foods)
-    used_foods.update(top_pref["Food"].astype(str).tolist())
-
-    scored_health2 = scored_health[~scored_health["Food"].astype(str).isin(used_foods)].copy()
-    top_health = diversity_unique_food(scored_health2, k=1, used=used_foods)
-    used_foods.update(top_health["Food"].astype(str).tolist())
-
-    # exploration
+    # exploration (미관측 풀 copy/sort 없이 mask + top-1)
     explore_row = None
-    ex = unobserved_pool.copy()
-    if "Food" in ex.columns:
-        ex = ex[~ex["Food"].astype(str).isin(used_foods | exclude_set | hist_set)].copy()
-
-    wp, wh = float(explore_weight_pref), float(explore_weight_health)
-    s = (wp + wh) if (wp + wh) > 1e-12 else 1.0
-    wp, wh = wp/s, wh/s
+    wp, wh = _explore_weights(explore_weight_pref, explore_weight_health)
     target_vec = wp*user_vec + wh*healthy_vec
 
-    if not ex.empty:
-        mat = ex[["macro_ratio_c","macro_ratio_p","macro_ratio_f"]].to_numpy()
+    if not unobserved_pool.empty:
+        allowed_e = None
+        if "Food" in unobserved_pool.columns:
+            allowed_e = ~unobserved_pool["Food"].astype(str).isin(used_foods | exclude_set | hist_set).to_numpy()
+        mat = unobserved_pool[["macro_ratio_c","macro_ratio_p","macro_ratio_f"]].to_numpy()
         d = l1_distance_batch(mat, target_vec)
         base = -d
-        cal_pen = ex["Calories"].fillna(0).apply(lambda c: compute_calorie_penalty(c, per_meal_target, cfg.LAMBDA_CAL, cfg.CAL_SOFT_CLIP)).to_numpy()
-        pur_pen = ex["Calories"].fillna(0).apply(lambda c: compute_purpose_delta_penalty(c, per_meal_target, purpose, cfg.DELTA, cfg.LAMBDA_PURPOSE)).to_numpy()
-        ex["score_final"] = base + cal_pen + pur_pen
-        ex = ex.sort_values("score_final", ascending=False)
-        explore_row = ex.iloc[0].to_dict()
-
-    def _pack(df_one: pd.DataFrame, rec_type: str, explanation: str) -> Dict:
-        if df_one is None or df_one.empty:
-            return {"rec_type": rec_type, "Food": "N/A", "Explanation": explanation}
-        r = df_one.iloc[0].to_dict()
-        r["rec_type"] = rec_type
-        r["Explanation"] = explanation
-        r["Mood_req"] = str(mood)
-        r["Energy_req"] = str(energy)
-        r["Pool_used"] = f"{pool_used}"
-        r["score_phase1"] = r.get("score_final", np.nan)
-        return r
+        cal = unobserved_pool["Calories"].fillna(0).to_numpy(dtype=float)
+        cal_pen = calorie_penalty_batch(cal, per_meal_target, cfg.LAMBDA_CAL, cfg.CAL_SOFT_CLIP)
+        pur_pen = purpose_delta_penalty_batch(cal, per_meal_target, purpose, cfg.DELTA, cfg.LAMBDA_PURPOSE)
+        score = base + cal_pen + pur_pen
+        j = topk_unique_positions(score, None, k=1, allowed=allowed_e)
+        if j.size:
+            explore_row = unobserved_pool.iloc[int(j[0])].to_dict()
+            explore_row["score_final"] = float(score[j[0]])
 
     recs = [
-        _pack(top_pref, "선호형 (Preference)", "hybrid 선호 중심 + 칼로리/목표(Purpose δ) + Guardrail"),
-        _pack(top_health, "건강형 (Health 5:3:2)", "5:3:2 근접 중심 + 칼로리/목표(Purpose δ) + Guardrail"),
+        _pack_pick(None if top_pref.empty else top_pref.iloc[0].to_dict(), REC_PREF, mood, energy, pool_used),
+        _pack_pick(None if top_health.empty else top_health.iloc[0].to_dict(), REC_HEALTH, mood, energy, pool_used),
+        _pack_explore(explore_row, mood, energy, wp, wh),
     ]
+    return pd.DataFrame(recs)
 
-    if explore_row is not None:
-        explore_row["rec_type"] = "탐색형 (Exploration)"
-        explore_row["Mood_req"] = str(mood)
-        explore_row["Energy_req"] = str(energy)
-        explore_row["Pool_used"] = "UNOBSERVED_POOL"
-        explore_row["Explanation"] = f"미관측 풀에서 target_vec={wp:.2f}*pref + {wh:.2f}*healthy"
-        explore_row["score_phase1"] = explore_row.get("score_final", np.nan)
-        recs.append(explore_row)
-    else:
-        recs.append({
-            "rec_type": "탐색형 (Exploration)",
-            "Food": "N/A",
-            "Calories": 0,
-            "Explanation": "미관측 풀 부족/중복 제외로 후보 없음",
-            "Mood_req": str(mood),
-            "Energy_req": str(energy),
-            "Pool_used": "UNOBSERVED_POOL",
-            "score_phase1": np.nan,
-        })
+# ----------------------------
+# Batch recommend (pure) : 여러 사용자 x food pool을 한 번에
+# ----------------------------
+def _first_best(scores: np.ndarray, allowed: Optional[np.ndarray]) -> int:
+    """
+    sort_values(ascending=False, kind="mergesort") 후 첫 행과 같은 위치를 반환.
+    - 최고점 동점이면 앞 위치, NaN은 맨 뒤, 후보가 없으면 -1
+    """
+    pos = topk_unique_positions(scores, None, k=1, allowed=allowed)
+    return int(pos[0]) if pos.size else -1
+
+def _best_per_row(S: np.ndarray, allowed: Optional[np.ndarray]) -> np.ndarray:
+    """
+    행(사용자)마다 _first_best. 대부분은 argmax 한 번으로 끝나고,
+    후보가 -inf/NaN뿐인 행만 _first_best로 다시 계산한다.
+    """
+    if S.shape[1] == 0:
+        return np.full(S.shape[0], -1, dtype=int)
+    masked = np.where(np.isnan(S), -np.inf, S)
+    if allowed is not None:
+        masked = np.where(allowed, masked, -np.inf)
+    best = np.argmax(masked, axis=1)
+    rows = np.arange(S.shape[0])
+    for i in np.flatnonzero(masked[rows, best] == -np.inf):
+        best[i] = _first_best(S[i], None if allowed is None else allowed[i])
+    return best
+
+def _food_codes(vocab: Optional[FoodVocab], df: pd.DataFrame) -> Optional[np.ndarray]:
+    """df Food -> vocab id 배열. vocab이 없거나 사전에 없는 이름이 있으면 None(문자열 경로)"""
+    if vocab is None or "Food" not in df.columns:
+        return None
+    codes = vocab.encode(df["Food"])
+    return codes if (codes >= 0).all() else None
+
+def _skip_mask(vocab: Optional[FoodVocab], codes: np.ndarray, foods: Optional[np.ndarray], skip: Set[str]) -> np.ndarray:
+    if foods is None:
+        return codes_in(codes, vocab.ids(skip))
+    return np.isin(foods, list(skip))
+
+def recommend_phase1_batch(
+    artifacts: Dict[str, Any],
+    contexts: Sequence[Tuple[str, str]],
+    cfg: Phase1Config,
+    user_vecs: np.ndarray,                  # shape (U, 3)
+    per_meal_targets: Sequence[float],      # shape (U,)
+    purposes: Sequence[int],                # shape (U,) 0/1/2
+    exclude_foods: Optional[Sequence[Optional[Iterable[str]]]] = None,
+    history_foods: Optional[Sequence[Optional[Iterable[str]]]] = None,
+    explore_weight_pref: float = 0.6,
+    explore_weight_health: float = 0.4,
+    chunk_size: int = 256,
+) -> List[Optional[pd.DataFrame]]:
+    """
+    recommend_phase1_2plus1(override 모드)의 batch 버전.
+    - 같은 후보 풀(context)을 쓰는 사용자끼리 묶어 users x foods 거리/penalty 행렬을 broadcasting으로 계산
+    - 사용자별 결과(P/H/E DataFrame)는 단건 경로와 동일
+    - chunk_size: 한 번에 계산할 사용자 수(행렬 메모리 = chunk_size x pool 크기)
+    """
+    U = len(contexts)
+    user_vecs = np.asarray(user_vecs, dtype=float).reshape(U, 3)
+    targets = np.asarray(per_meal_targets, dtype=float).reshape(U)
+    purposes_arr = np.asarray(purposes, dtype=int).reshape(U)
+    if exclude_foods is not None and len(exclude_foods) != U:
+        raise ValueError("exclude_foods length must match contexts")
+    if history_foods is not None and len(history_foods) != U:
+        raise ValueError("history_foods length must match contexts")
+
+    ctx_food_all: pd.DataFrame = artifacts["ctx_food_all"]
+    unobserved_pool: pd.DataFrame = artifacts["unobserved_pool"]
+    candidate_index = artifacts.get("candidate_index")
+
+    healthy_vec = np.array(cfg.HEALTH_532, dtype=float)
+    wp, wh = _explore_weights(explore_weight_pref, explore_weight_health)
+
+    # 사용자별 제외 set (exclude | history)
+    skip_sets: List[Set[str]] = []
+    for i in range(U):
+        ex_i = exclude_foods[i] if exclude_foods is not None else None
+        hi_i = history_foods[i] if history_foods is not None else None
+        skip_sets.append(
+            (set(map(str, ex_i)) if ex_i else set()) | (set(map(str, hi_i)) if hi_i else set())
+        )
 
-    return pd.DataFrame(recs)
\ No newline at end of file
+    # 탐색 풀 배열(공통). vocab이 있으면 Food는 int32 id로 (제외 필터 = 정수 isin)
+    vocab: Optional[FoodVocab] = artifacts.get("food_vocab")
+    ex_codes = _food_codes(vocab, unobserved_pool)
+    ex_foods = unobserved_pool["Food"].astype(str).to_numpy() \
+        if ex_codes is None and "Food" in unobserved_pool.columns else None
+    ex_mat = unobserved_pool[["macro_ratio_c","macro_ratio_p","macro_ratio_f"]].to_numpy(dtype=float)
+    ex_cal = unobserved_pool["Calories"].fillna(0).to_numpy(dtype=float)
+
+    # context -> 사용자 그룹
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for i, (m, e) in enumerate(contexts):
+        groups.setdefault((str(m), str(e)), []).append(i)
+
+    out: List[Optional[pd.DataFrame]] = [None] * U
+
+    for (mood, energy), members in groups.items():
+        pool, pool_used = _get_candidate_pool(mood, energy, ctx_food_all, candidate_index=candidate_index)
+        pool = _prepare_pool(pool, artifacts, cfg, set())
+
+        if pool.empty:
+            for i in members:
+                out[i] = _error_frame(pool_used)
+            continue
+
+        codes, foods = _food_codes(vocab, pool), None
+        if codes is None:
+            foods = pool["Food"].astype(str).to_numpy()
+            codes, _ = pd.factorize(foods)
+        macro_mat = pool[["macro_ratio_c","macro_ratio_p","macro_ratio_f"]].to_numpy(dtype=float)
+        d_health = l1_distance_batch(macro_mat, healthy_vec)
+        # 단건 경로의 0.0*d_health / 0.0*d_pref 항은 NaN만 전파 -> 행렬 곱 대신 NaN mask(0 또는 NaN)로
+        health_nan = np.where(np.isfinite(d_health), 0.0, np.nan)
+        food_nan = np.where(np.isfinite(macro_mat).all(axis=1), 0.0, np.nan)
+        ctx_bonus = cfg.W_CTX * pool["mean_y_ctx"].fillna(0).to_numpy()
+        global_bonus = cfg.W_GLOBAL * pool["emotion_score"].fillna(0).to_numpy()
+        cal = pool["Calories"].fillna(0).to_numpy(dtype=float)
+
+        for c0 in range(0, len(members), max(1, int(chunk_size))):
+            idx = np.asarray(members[c0:c0 + max(1, int(chunk_size))])
+            C = len(idx)
+
+            # users x foods 행렬
+            d_pref = l1_distance_matrix(macro_mat, user_vecs[idx])
+            cal_pen = calorie_penalty_matrix(cal, targets[idx], cfg.LAMBDA_CAL, cfg.CAL_SOFT_CLIP)
+            pur_pen = purpose_delta_penalty_matrix(cal, targets[idx], purposes_arr[idx], cfg.DELTA, cfg.LAMBDA_PURPOSE)
+
+            user_nan = np.where(np.isfinite(user_vecs[idx]).all(axis=1), 0.0, np.nan)
+            base_pref = -(cfg.W_PREF*d_pref + health_nan[None, :])
+            base_health = -(cfg.W_HEALTH*d_health[None, :] + (food_nan[None, :] + user_nan[:, None]))
+            s_pref = base_pref + ctx_bonus + global_bonus + cal_pen + pur_pen
+            s_health = base_health + ctx_bonus + global_bonus + cal_pen + pur_pen
+
+            # 사용자별 exclude/history 제외
+            allowed = None
+            if any(skip_sets[i] for i in idx):
+                allowed = np.ones((C, len(pool)), dtype=bool)
+                for r, i in enumerate(idx):
+                    if skip_sets[i]:
+                        allowed[r] = ~_skip_mask(vocab, codes, foods, skip_sets[i])
+
+            best_p = _best_per_row(s_pref, allowed)
+            # 건강형: 선호형으로 뽑힌 Food 제외
+            used_p = np.where(best_p >= 0, codes[np.maximum(best_p, 0)], -1)
+            allowed_h = codes[None, :] != used_p[:, None]
+            if allowed is not None:
+                allowed_h &= allowed
+            best_h = _best_per_row(s_health, allowed_h)
+
+            # 탐색형(미관측 풀)
+            tvecs = wp*user_vecs[idx] + wh*healthy_vec
+            s_ex = None
+            if len(unobserved_pool):
+                d_ex = l1_distance_matrix(ex_mat, tvecs)
+                s_ex = -d_ex \
+                    + calorie_penalty_matrix(ex_cal, targets[idx], cfg.LAMBDA_CAL, cfg.CAL_SOFT_CLIP) \
+                    + purpose_delta_penalty_matrix(ex_cal, targets[idx], purposes_arr[idx], cfg.DELTA, cfg.LAMBDA_PURPOSE)
+
+            for r, i in enumerate(idx):
+                if allowed is not None and not allowed[r].any():
+                    out[i] = _error_frame(pool_used)
+                    continue
+
+                row_p = _scored_row(pool, int(best_p[r]), float(base_pref[r, best_p[r]]), float(s_pref[r, best_p[r]])) \
+                    if best_p[r] >= 0 else None
+                row_h = _scored_row(pool, int(best_h[r]), float(base_health[r, best_h[r]]), float(s_health[r, best_h[r]])) \
+                    if best_h[r] >= 0 else None
+
+                row_e = None
+                if s_ex is not None:
+                    used = set(skip_sets[i])
+                    if row_p is not None:
+                        used.add(str(row_p.get("Food")))
+                    if row_h is not None:
+                        used.add(str(row_h.get("Food")))
+                    allowed_e = None
+                    if used and ex_codes is not None:
+                        allowed_e = ~codes_in(ex_codes, vocab.ids(used))
+                    elif used and ex_foods is not None:
+                        allowed_e = ~np.isin(ex_foods, list(used))
+                    j = _first_best(s_ex[r], allowed_e)
+                    if j >= 0:
+                        row_e = unobserved_pool.iloc[j].to_dict()
+                        row_e["score_final"] = float(s_ex[r, j])
+
+                out[i] = pd.DataFrame([
+                    _pack_pick(row_p, REC_PREF, mood, energy, pool_used),
+                    _pack_pick(row_h, REC_HEALTH, mood, energy, pool_used),
+                    _pack_explore(row_e, mood, energy, wp, wh),
+                ])
+
+    return out
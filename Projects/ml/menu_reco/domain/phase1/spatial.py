@@ -0,0 +1,181 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ml.menu_reco.common.config import Phase1Config
+from ml.menu_reco.common.ssot import calorie_penalty_batch, purpose_delta_penalty_batch
+from ml.menu_reco.domain.phase1.catalog import FoodCatalog
+
+# 이 행 수 미만 catalog는 grid 없이 full scan (작은 풀은 scan이 더 빠름)
+GRID_MIN_ROWS = 2000
+# 축별 bin 수: macro_ratio_c / p / f / Calories
+GRID_BINS: Tuple[int, int, int, int] = (4, 4, 4, 8)
+# 한 번에 점수 계산할 최소 행 수 / 이 비율 이상 훑게 되면 포기하고 full scan
+BATCH_ROWS = 256
+MAX_SCAN_FRAC = 0.5
+# upper bound와 실제 점수의 계산 순서 차이(부동소수) 여유
+_EPS = 1e-9
+
+
+def _quantile_bins(x: np.ndarray, n_bins: int) -> np.ndarray:
+    """분위수 경계로 bin 번호(0..n_bins-1). 값 분포가 치우쳐도 cell 크기가 고르게"""
+    if n_bins <= 1 or len(x) == 0:
+        return np.zeros(len(x), dtype=np.int64)
+    edges = np.unique(np.quantile(x, np.linspace(0, 1, n_bins + 1)[1:-1]))
+    return np.searchsorted(edges, x, side="right").astype(np.int64)
+
+
+@dataclass(frozen=True)
+class CatalogGrid:
+    """
+    FoodCatalog 위의 grid index: (macro_ratio_c, macro_ratio_p, macro_ratio_f, Calories) 공간을 cell로 나누고
+    cell별 실제 bounding box + 보너스 항(mean_y_ctx/emotion) 범위를 들고 있다.
+    - 요청 시 cell별 점수 upper bound를 계산 -> 높은 cell부터 정확 점수 계산 (best-first)
+    - 남은 cell의 upper bound가 현재 최고점보다 낮으면 종료 -> full scan과 같은 결과
+    - macro가 NaN인 행은 grid에 넣지 않음(점수 NaN -> 이길 수 없음, 후보가 없으면 호출 측 full scan)
+    """
+    order: np.ndarray       # cell 순서로 정렬된 catalog 위치
+    starts: np.ndarray      # cell i의 행 = order[starts[i]:starts[i+1]]
+    box_lo: np.ndarray      # (n_cells, 4)
+    box_hi: np.ndarray      # (n_cells, 4)
+    ctx_lo: np.ndarray
+    ctx_hi: np.ndarray
+    emo_lo: np.ndarray
+    emo_hi: np.ndarray
+    n_rows: int
+
+    @classmethod
+    def from_catalog(cls, cat: FoodCatalog, bins: Sequence[int] = GRID_BINS) -> "CatalogGrid":
+        pts = np.column_stack([cat.macro, cat.calories]) if len(cat) else np.empty((0, 4))
+        pos = np.flatnonzero(np.isfinite(pts).all(axis=1))
+        pts = pts[pos]
+
+        b = np.column_stack([_quantile_bins(pts[:, d], int(n)) for d, n in enumerate(bins)]) \
+            if len(pos) else np.empty((0, 4), dtype=np.int64)
+        cell = np.ravel_multi_index(b.T, tuple(int(n) for n in bins)) if len(pos) else np.empty(0, dtype=np.int64)
+
+        srt = np.argsort(cell, kind="stable")
+        cell, pos, pts = cell[srt], pos[srt], pts[srt]
+        _, starts = np.unique(cell, return_index=True)
+        starts = np.append(starts, len(cell)).astype(np.int64)
+        seg = starts[:-1]
+
+        def _red(ufunc, a: np.ndarray) -> np.ndarray:
+            return ufunc.reduceat(a, seg, axis=0) if len(seg) else np.empty((0,) + a.shape[1:])
+
+        ctx, emo = cat.mean_y_ctx[pos], cat.emotion[pos]
+        return cls(
+            order=pos.astype(np.int64),
+            starts=starts,
+            box_lo=_red(np.minimum, pts),
+            box_hi=_red(np.maximum, pts),
+            ctx_lo=_red(np.minimum, ctx),
+            ctx_hi=_red(np.maximum, ctx),
+            emo_lo=_red(np.minimum, emo),
+            emo_hi=_red(np.maximum, emo),
+            n_rows=len(cat),
+        )
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.starts) - 1
+
+    def _min_l1(self, vec: np.ndarray) -> np.ndarray:
+        """cell box까지의 최소 L1 거리(macro 3축)"""
+        lo, hi = self.box_lo[:, :3], self.box_hi[:, :3]
+        return (np.maximum(lo - vec, 0.0) + np.maximum(vec - hi, 0.0)).sum(axis=1)
+
+    def upper_bounds(
+        self,
+        targets: Sequence[Tuple[np.ndarray, float]],
+        w_ctx: float,
+        w_global: float,
+        per_meal_target: float,
+        purpose: int,
+        cfg: Phase1Config,
+    ) -> np.ndarray:
+        """
+        cell별 점수 상한: -(sum w*L1(macro, vec)) + W_CTX*ctx + W_GLOBAL*emotion + calorie/purpose penalty
+        - 거리: box까지 최소 거리 / 보너스: cell 내 min/max 중 큰 쪽
+        - calorie penalty: target에 가장 가까운 cell 내 칼로리 / purpose penalty: 구간 양 끝 중 큰 쪽(단조)
+        """
+        ub = np.zeros(self.n_cells, dtype=float)
+        for vec, w in targets:
+            if w:
+                ub -= float(w) * self._min_l1(np.asarray(vec, dtype=float))
+        if w_ctx:
+            ub += np.maximum(w_ctx * self.ctx_lo, w_ctx * self.ctx_hi)
+        if w_global:
+            ub += np.maximum(w_global * self.emo_lo, w_global * self.emo_hi)
+
+        cal_lo, cal_hi = self.box_lo[:, 3], self.box_hi[:, 3]
+        t = per_meal_target
+        near = np.clip(t, cal_lo, cal_hi) if t is not None and np.isfinite(t) else cal_lo
+        ub += calorie_penalty_batch(near, t, cfg.LAMBDA_CAL, cfg.CAL_SOFT_CLIP)
+        ub += np.maximum(
+            purpose_delta_penalty_batch(cal_lo, t, purpose, cfg.DELTA, cfg.LAMBDA_PURPOSE),
+            purpose_delta_penalty_batch(cal_hi, t, purpose, cfg.DELTA, cfg.LAMBDA_PURPOSE),
+        )
+        return ub
+
+    def best_first(
+        self,
+        ub: np.ndarray,
+        score_fn: Callable[[np.ndarray], np.ndarray],
+        allowed_fn: Callable[[np.ndarray], np.ndarray],
+        batch_rows: int = BATCH_ROWS,
+        max_scan_frac: float = MAX_SCAN_FRAC,
+    ) -> Optional[int]:
+        """
+        upper bound 높은 cell부터 점수 계산해서 최고점 위치(동점이면 앞 위치)를 찾는다.
+        - score_fn(pos) -> 해당 위치들의 정확한 점수, allowed_fn(pos) -> 후보 여부
+        - 남은 cell 상한이 최고점 이상이면 계속, 후보가 없거나 max_scan_frac을 넘으면 None(full scan)
+        """
+        if self.n_cells == 0:
+            return None
+        cells = np.argsort(-ub, kind="stable")
+        sizes = np.diff(self.starts)
+        limit = max_scan_frac * self.n_rows
+
+        best_pos, best_score = -1, -np.inf
+        scanned, i = 0, 0
+        while i < len(cells):
+            j, n = i, 0
+            while j < len(cells) and n < batch_rows:
+                n += int(sizes[cells[j]])
+                j += 1
+            pos = np.concatenate([self.order[self.starts[c]:self.starts[c + 1]] for c in cells[i:j]])
+            i, scanned = j, scanned + n
+
+            s = score_fn(pos)
+            ok = allowed_fn(pos) & ~np.isnan(s)
+            if ok.any():
+                s_ok, p_ok = s[ok], pos[ok]
+                m = s_ok.max()
+                p = int(p_ok[s_ok == m].min())
+                if m > best_score or (m == best_score and p < best_pos):
+                    best_pos, best_score = p, float(m)
+
+            if best_pos >= 0 and (i >= len(cells) or best_score > ub[cells[i]] + _EPS):
+                return best_pos
+            if scanned > limit:
+                return None
+        return best_pos if best_pos >= 0 else None
+
+
+def build_catalog_grids(artifacts: dict, min_rows: int = GRID_MIN_ROWS) -> None:
+    """
+    build_food_catalogs 이후 호출: min_rows 이상인 catalog에만 CatalogGrid를 만들어 둔다(in-place).
+    - catalog_grids: candidate_catalogs와 같은 key -> CatalogGrid
+    - unobserved_grid: 탐색형 풀 (없으면 None)
+    """
+    cats = artifacts.get("candidate_catalogs") or {}
+    artifacts["catalog_grids"] = {
+        key: CatalogGrid.from_catalog(cat) for key, cat in cats.items() if len(cat) >= min_rows
+    }
+    ex_cat = artifacts.get("unobserved_catalog")
+    artifacts["unobserved_grid"] = (
+        CatalogGrid.from_catalog(ex_cat) if ex_cat is not None and len(ex_cat) >= min_rows else None
+    )
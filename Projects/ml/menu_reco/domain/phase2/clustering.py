@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Optional
 import numpy as np
 import pandas as pd
 
@@ -40,35 +40,94 @@ def label_cluster_text(message_key: str, cal_norm: float) -> str:
     }[message_key]
     return f"{cal_tag} {base}"
 
-def perform_phase2_clustering(ctx_food_all: pd.DataFrame, cfg: Phase2Config) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    df = ctx_food_all.copy()
-    df["cal_norm"] = df["Calories"].fillna(0) / float(cfg.CAL_NORM_DENOM)
+PHASE2_FEATURES = ["macro_ratio_c","macro_ratio_p","macro_ratio_f","cal_norm","emotion_score"]
+CENTER_COLS = ["center_macro_c","center_macro_p","center_macro_f","center_cal_norm","center_emo_score"]
+SCALER_MEAN_COLS = [f"mean_{c}" for c in PHASE2_FEATURES]
+SCALER_SCALE_COLS = [f"scale_{c}" for c in PHASE2_FEATURES]
 
-    feat_cols = ["macro_ratio_c","macro_ratio_p","macro_ratio_f","cal_norm"]
+def _with_phase2_features(df: pd.DataFrame, cfg: Phase2Config) -> pd.DataFrame:
+    df = df.copy()
+    df["cal_norm"] = df["Calories"].fillna(0) / float(cfg.CAL_NORM_DENOM)
     if "emotion_score" not in df.columns:
         df["emotion_score"] = 0.0
-    feat_cols.append("emotion_score")
+    return df
 
-    results = []
-    meta_rows = []
-    healthy_vec = np.array(cfg.HEALTH_532, dtype=float)
+def _fit_context(args: Tuple[Any, ...]) -> Dict[str, Any]:
+    """
+    (Mood, Energy) 1개 fit (process pool worker에서 실행되므로 top-level 함수)
+    - init_centers(원 feature 공간)가 있으면 새 scaler로 변환해서 warm-start(n_init=1)
+    """
+    mood, energy, X_raw, k, init_centers = args
+    scaler = StandardScaler()
+    X = scaler.fit_transform(X_raw)
+
+    if init_centers is not None:
+        km = KMeans(n_clusters=k, init=scaler.transform(init_centers), n_init=1, random_state=42)
+    else:
+        km = KMeans(n_clusters=k, random_state=42, n_init=10)
+    labels = km.fit_predict(X)
+    return {
+        "mood": mood, "energy": energy,
+        "labels": labels,
+        "centers": scaler.inverse_transform(km.cluster_centers_),
+        "mean": scaler.mean_, "scale": scaler.scale_,
+        "n_iter": int(km.n_iter_),
+    }
 
+def _prev_centers(cluster_meta: Optional[pd.DataFrame], k: int) -> Dict[Tuple[str, str], np.ndarray]:
+    """이전 cluster_meta의 center(원 feature 공간) -> context별 (K, 5) init 배열"""
+    out: Dict[Tuple[str, str], np.ndarray] = {}
+    if cluster_meta is None or cluster_meta.empty or not set(CENTER_COLS) <= set(cluster_meta.columns):
+        return out
+    for (m, e), g in cluster_meta.groupby(["Mood","Energy"], sort=False):
+        g = g.sort_values("cluster_id")
+        if len(g) == k:
+            out[(str(m), str(e))] = g[CENTER_COLS].to_numpy(dtype=float)
+    return out
+
+def fit_phase2_clustering(
+    ctx_food_all: pd.DataFrame,
+    cfg: Phase2Config,
+    n_jobs: int = 1,
+    prev_cluster_meta: Optional[pd.DataFrame] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    (Mood, Energy)별 StandardScaler + KMeans를 process pool로 병렬 fit.
+    - prev_cluster_meta가 있으면 그 center로 warm-start (cluster_id도 이전 run과 대응 유지)
+    - n_jobs=1 & prev 없음 -> 기존 perform_phase2_clustering과 같은 결과
+    반환: (clustered, cluster_meta, scaler)  scaler: Mood, Energy, mean_*, scale_*
+    """
+    df = _with_phase2_features(ctx_food_all, cfg)
+    feat_cols = list(PHASE2_FEATURES)
+    prev = _prev_centers(prev_cluster_meta, cfg.K)
+
+    groups = []
+    tasks = []
     for (mood, energy), g in df.groupby(["Mood","Energy"]):
         if len(g) < cfg.K:
             continue
+        groups.append(g)
+        tasks.append((mood, energy, g[feat_cols].to_numpy(), cfg.K, prev.get((str(mood), str(energy)))))
 
-        X_raw = g[feat_cols].to_numpy()
-        scaler = StandardScaler()
-        X = scaler.fit_transform(X_raw)
+    if n_jobs and n_jobs > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(int(n_jobs), len(tasks))) as ex:
+            fits = list(ex.map(_fit_context, tasks))
+    else:
+        fits = [_fit_context(t) for t in tasks]
 
-        km = KMeans(n_clusters=cfg.K, random_state=42, n_init=10)
-        labels = km.fit_predict(X)
+    results = []
+    meta_rows = []
+    scaler_rows = []
+    healthy_vec = np.array(cfg.HEALTH_532, dtype=float)
 
+    for g, fit in zip(groups, fits):
+        mood, energy, labels = fit["mood"], fit["energy"], fit["labels"]
         g2 = g.copy()
         g2["cluster_id"] = labels
         results.append(g2)
 
-        centers = scaler.inverse_transform(km.cluster_centers_)
+        centers = fit["centers"]
         for cid in range(cfg.K):
             c = centers[cid]
             center_vec = np.array([c[0], c[1], c[2]], dtype=float)
@@ -93,16 +152,141 @@ def perform_phase2_clustering(ctx_food_all: pd.DataFrame, cfg: Phase2Config) ->
                 "n_rows": int((labels==cid).sum()),
             })
 
+        scaler_rows.append({
+            "Mood": mood, "Energy": energy,
+            **dict(zip(SCALER_MEAN_COLS, map(float, fit["mean"]))),
+            **dict(zip(SCALER_SCALE_COLS, map(float, fit["scale"]))),
+            "warm_start": (str(mood), str(energy)) in prev,
+            "n_iter": fit["n_iter"],
+        })
+
     clustered = pd.concat(results, ignore_index=True) if results else df.head(0).copy()
     meta = pd.DataFrame(meta_rows)
+    scaler = pd.DataFrame(scaler_rows)
+    return clustered, meta, scaler
+
+def perform_phase2_clustering(ctx_food_all: pd.DataFrame, cfg: Phase2Config) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    clustered, meta, _scaler = fit_phase2_clustering(ctx_food_all, cfg)
     return clustered, meta
 
-def attach_cluster_info(rec_df: pd.DataFrame, clustered: pd.DataFrame, cluster_meta: pd.DataFrame) -> pd.DataFrame:
+# ----------------------------
+# Online 할당 (nearest centroid) : clustered에 없는 신규 음식
+# ----------------------------
+def build_centroid_index(
+    cluster_meta: Optional[pd.DataFrame],
+    scaler: Optional[pd.DataFrame],
+) -> Dict[Tuple[str, str], Dict[str, np.ndarray]]:
+    """
+    (Mood, Energy) -> {mean, scale, centers(scaled, K x 5), cluster_ids}
+    artifacts 로드 시 1회. scaler가 없으면(이전 버전 artifacts) 빈 dict.
+    """
+    out: Dict[Tuple[str, str], Dict[str, np.ndarray]] = {}
+    if cluster_meta is None or cluster_meta.empty or scaler is None or scaler.empty:
+        return out
+    sc = {(str(r["Mood"]), str(r["Energy"])): r for _, r in scaler.iterrows()}
+    for (m, e), g in cluster_meta.groupby(["Mood","Energy"], sort=False):
+        r = sc.get((str(m), str(e)))
+        if r is None:
+            continue
+        mean = r[SCALER_MEAN_COLS].to_numpy(dtype=float)
+        scale = r[SCALER_SCALE_COLS].to_numpy(dtype=float)
+        g = g.sort_values("cluster_id")
+        out[(str(m), str(e))] = {
+            "mean": mean,
+            "scale": scale,
+            "centers": (g[CENTER_COLS].to_numpy(dtype=float) - mean) / scale,
+            "cluster_ids": g["cluster_id"].to_numpy(),
+        }
+    return out
+
+def assign_nearest_centroid(
+    foods: pd.DataFrame,
+    mood: str,
+    energy: str,
+    centroid_index: Dict[Tuple[str, str], Dict[str, np.ndarray]],
+    cfg: Phase2Config,
+) -> np.ndarray:
+    """
+    foods(macro_ratio_c/p/f, Calories, emotion_score) -> 해당 context의 가장 가까운 cluster_id (KMeans.predict와 동일 기준)
+    centroid가 없는 context면 NaN
+    """
+    c = centroid_index.get((str(mood), str(energy)))
+    if c is None or foods.empty:
+        return np.full(len(foods), np.nan)
+    X = np.nan_to_num(_with_phase2_features(foods, cfg)[PHASE2_FEATURES].to_numpy(dtype=float))
+    Xs = (X - c["mean"]) / c["scale"]
+    d2 = ((Xs[:, None, :] - c["centers"][None, :, :]) ** 2).sum(axis=2)
+    return c["cluster_ids"][np.argmin(d2, axis=1)].astype(float)
+
+def _fill_missing_clusters(
+    out: pd.DataFrame,
+    centroid_index: Dict[Tuple[str, str], Dict[str, np.ndarray]],
+    cfg: Phase2Config,
+) -> None:
+    """cluster_id가 비어 있고 macro 값이 있는 행만 nearest centroid로 채움(in-place)"""
+    macro_cols = ["macro_ratio_c","macro_ratio_p","macro_ratio_f"]
+    if not set(macro_cols) <= set(out.columns):
+        return
+    missing = out["cluster_id"].isna() & out[macro_cols].notna().all(axis=1)
+    if not missing.any():
+        return
+    sub = out[missing]
+    for (m, e), g in sub.groupby(["Mood_used","Energy_used"], sort=False):
+        out.loc[g.index, "cluster_id"] = assign_nearest_centroid(g, m, e, centroid_index, cfg)
+
+# ----------------------------
+# 요청 경로용 hash index (artifacts 로드 시 1회)
+# ----------------------------
+META_COLS = ["cluster_label","message_key","dist_to_healthy"]
+
+def _unique_lookup(df: pd.DataFrame, key_cols: list, val_cols: list) -> Optional[Dict[tuple, Any]]:
+    """
+    key_cols -> val_cols(1개면 스칼라, 여러 개면 tuple) dict.
+    key가 유일하지 않으면(merge라면 행이 늘어나는 경우) None -> 호출 측은 merge 경로 유지
+    """
+    rows = df[key_cols + val_cols].drop_duplicates()
+    if rows.duplicated(subset=key_cols).any():
+        return None
+    keys = zip(*(rows[c].tolist() for c in key_cols))
+    if len(val_cols) == 1:
+        return dict(zip(keys, rows[val_cols[0]].tolist()))
+    return dict(zip(keys, zip(*(rows[c].tolist() for c in val_cols))))
+
+def build_cluster_lookup(
+    clustered: Optional[pd.DataFrame],
+    cluster_meta: Optional[pd.DataFrame],
+) -> Dict[str, Optional[Dict[tuple, Any]]]:
+    """
+    attach_cluster_info용 index
+    - food: (Mood, Energy, Food) -> cluster_id
+    - meta: (Mood, Energy, cluster_id) -> (cluster_label, message_key, dist_to_healthy)
+    해당 artifact가 없거나 key가 유일하지 않으면 None(그 단계는 merge로 처리)
+    """
+    out: Dict[str, Optional[Dict[tuple, Any]]] = {"food": None, "meta": None}
+    if clustered is not None and not clustered.empty:
+        out["food"] = _unique_lookup(clustered, ["Mood","Energy","Food"], ["cluster_id"])
+    if cluster_meta is not None and not cluster_meta.empty:
+        out["meta"] = _unique_lookup(cluster_meta, ["Mood","Energy","cluster_id"], META_COLS)
+    return out
+
+def attach_cluster_info(
+    rec_df: pd.DataFrame,
+    clustered: pd.DataFrame,
+    cluster_meta: pd.DataFrame,
+    centroid_index: Optional[Dict[Tuple[str, str], Dict[str, np.ndarray]]] = None,
+    cfg: Optional[Phase2Config] = None,
+    lookup: Optional[Dict[str, Optional[Dict[tuple, Any]]]] = None,
+) -> pd.DataFrame:
+    """
+    lookup(build_cluster_lookup)이 있으면 merge 대신 행마다 dict 조회 (결과는 merge와 동일)
+    """
     out = rec_df.copy()
+    lookup = lookup or {}
 
     # Food 기준으로 cluster_id 붙이기(동일 Food라도 context별 cluster 달라질 수 있어 Mood/Energy로 join)
     # Phase1 output에는 Mood_req/Energy_req가 있으므로 그것을 사용
-    if clustered is None or clustered.empty:
+    # clustered에 없는 음식(신규 FOOD_TB 등)은 centroid_index가 있으면 nearest centroid로 할당
+    if (clustered is None or clustered.empty) and not centroid_index:
         out["cluster_id"] = np.nan
         out["cluster_label"] = "N/A"
         out["message_key"] = "N/A"
@@ -116,10 +300,20 @@ def attach_cluster_info(rec_df: pd.DataFrame, clustered: pd.DataFrame, cluster_m
     key_cols_left = ["Mood_used","Energy_used","Food"]
     key_cols_right = ["Mood","Energy","Food"]
 
-    tmp = clustered[key_cols_right + ["cluster_id"]].drop_duplicates()
-    tmp = tmp.rename(columns={"Mood":"Mood_used","Energy":"Energy_used"})
+    if clustered is None or clustered.empty:
+        out["cluster_id"] = np.nan
+    elif lookup.get("food") is not None:
+        food_idx = lookup["food"]
+        keys = zip(out["Mood_used"].tolist(), out["Energy_used"].tolist(), out["Food"].tolist())
+        out = out.reset_index(drop=True)
+        out["cluster_id"] = pd.Series([food_idx.get(k, np.nan) for k in keys])
+    else:
+        tmp = clustered[key_cols_right + ["cluster_id"]].drop_duplicates()
+        tmp = tmp.rename(columns={"Mood":"Mood_used","Energy":"Energy_used"})
+        out = out.merge(tmp, on=key_cols_left, how="left")
 
-    out = out.merge(tmp, on=key_cols_left, how="left")
+    if centroid_index:
+        _fill_missing_clusters(out, centroid_index, cfg or Phase2Config())
 
     # label 붙이기
     if cluster_meta is None or cluster_meta.empty:
@@ -127,10 +321,19 @@ def attach_cluster_info(rec_df: pd.DataFrame, clustered: pd.DataFrame, cluster_m
         out["message_key"] = "N/A"
         return out
 
+    if lookup.get("meta") is not None:
+        meta_idx = lookup["meta"]
+        keys = zip(out["Mood_used"].tolist(), out["Energy_used"].tolist(), out["cluster_id"].tolist())
+        vals = [meta_idx.get(k) for k in keys]
+        out = out.reset_index(drop=True)
+        for i, c in enumerate(META_COLS):
+            out[c] = pd.Series([np.nan if v is None else v[i] for v in vals])
+        return out
+
     meta = cluster_meta.rename(columns={"Mood":"Mood_used","Energy":"Energy_used"})
     out = out.merge(
-        meta[["Mood_used","Energy_used","cluster_id","cluster_label","message_key","dist_to_healthy"]],
+        meta[["Mood_used","Energy_used","cluster_id"] + META_COLS],
         on=["Mood_used","Energy_used","cluster_id"],
         how="left"
     )
-    return out
\ No newline at end of file
+    return out
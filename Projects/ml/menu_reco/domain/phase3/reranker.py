@@ -51,12 +51,55 @@ def compute_p_stable_cluster(
     g["p_stable_cluster"] = (g["n_stable"] + float(alpha)) / (g["n_rows"] + 2.0*float(alpha))
     return g
 
-def attach_p_stable_cluster(rec_df: pd.DataFrame, p_stable_df: pd.DataFrame, default_p: float = 0.5) -> pd.DataFrame:
+def build_p_stable_table(
+    logs: pd.DataFrame,
+    clustered: Optional[pd.DataFrame],
+    alpha: float = 1.0,
+) -> pd.DataFrame:
+    """
+    (Mood, Energy, cluster_id) -> p_stable_cluster 테이블.
+    logs/clustered(artifacts)가 바뀔 때만 값이 달라지므로, 요청마다 만들지 말고
+    artifacts 로드 시점에 한 번 계산해서 재사용한다.
+    """
+    if clustered is None or clustered.empty or logs is None or logs.empty:
+        return pd.DataFrame(columns=["Mood","Energy","cluster_id","n_rows","n_stable","p_stable_cluster"])
+
+    stable_food_ctx = build_stable_food_ctx_from_logs(logs)
+    clustered_rows = clustered[["Mood","Energy","Food","cluster_id"]].drop_duplicates()
+    return compute_p_stable_cluster(stable_food_ctx, clustered_rows, alpha=alpha)
+
+def build_p_stable_lookup(p_stable_df: Optional[pd.DataFrame]) -> Optional[Dict[tuple, float]]:
+    """
+    (Mood, Energy, cluster_id) -> p_stable_cluster dict (artifacts 로드 시 1회)
+    테이블이 없거나 key가 유일하지 않으면 None -> attach_p_stable_cluster는 merge 경로
+    """
+    if p_stable_df is None or p_stable_df.empty:
+        return None
+    key_cols = ["Mood","Energy","cluster_id"]
+    rows = p_stable_df[key_cols + ["p_stable_cluster"]].drop_duplicates()
+    if rows.duplicated(subset=key_cols).any():
+        return None
+    keys = zip(*(rows[c].tolist() for c in key_cols))
+    return dict(zip(keys, rows["p_stable_cluster"].tolist()))
+
+def attach_p_stable_cluster(
+    rec_df: pd.DataFrame,
+    p_stable_df: pd.DataFrame,
+    default_p: float = 0.5,
+    lookup: Optional[Dict[tuple, float]] = None,
+) -> pd.DataFrame:
     out = rec_df.copy()
     if p_stable_df is None or p_stable_df.empty:
         out["p_stable_cluster"] = default_p
         return out
 
+    if lookup is not None:
+        keys = zip(out["Mood_used"].tolist(), out["Energy_used"].tolist(), out["cluster_id"].tolist())
+        out = out.reset_index(drop=True)
+        out["p_stable_cluster"] = pd.Series([lookup.get(k, np.nan) for k in keys], dtype="float64")
+        out["p_stable_cluster"] = out["p_stable_cluster"].fillna(default_p)
+        return out
+
     tmp = p_stable_df.rename(columns={"Mood":"Mood_used","Energy":"Energy_used"})
     out = out.merge(
         tmp[["Mood_used","Energy_used","cluster_id","p_stable_cluster"]],
@@ -100,6 +143,9 @@ def recommend_phase3_v1(
     recent_foods: Optional[List[str]] = None,
     return_debug: bool = False,
 
+    # ✅ artifacts 로드 시 미리 계산한 p_stable 테이블(build_p_stable_table)이 있으면 재사용
+    p_stable_df: Optional[pd.DataFrame] = None,
+
     # ✅ (Option A) Django/DB 운영용 override 추가
     user_vec_override: Optional[np.ndarray] = None,
     per_meal_target_override: Optional[float] = None,
@@ -134,9 +180,8 @@ def recommend_phase3_v1(
     cluster_meta = phase2_artifacts["cluster_meta"]
     rec_df = attach_cluster_info(rec_df, clustered=clustered, cluster_meta=cluster_meta)
 
-    stable_food_ctx = build_stable_food_ctx_from_logs(logs)
-    clustered_rows = clustered[["Mood","Energy","Food","cluster_id"]].drop_duplicates()
-    p_stable_df = compute_p_stable_cluster(stable_food_ctx, clustered_rows, alpha=phase3_cfg.alpha)
+    if p_stable_df is None:
+        p_stable_df = build_p_stable_table(logs, clustered, alpha=phase3_cfg.alpha)
 
     rec_df = attach_p_stable_cluster(rec_df, p_stable_df, default_p=0.5)
 
@@ -0,0 +1,196 @@
+# ml/menu_reco/food_dict.py
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+
+FoodRows = List[Tuple[int, str]]
+
+
+def _fetch_food_rows_after(food_id: int) -> FoodRows:
+    sql = """
+    SELECT food_id, name
+    FROM FOOD_TB
+    WHERE food_id > %s
+    ORDER BY food_id
+    """
+    with connection.cursor() as cur:
+        cur.execute(sql, [int(food_id)])
+        return [(int(r[0]), str(r[1])) for r in cur.fetchall()]
+
+
+def _fetch_food_rows_by_names(names: List[str]) -> FoodRows:
+    in_ph = ",".join(["%s"] * len(names))
+    sql = f"""
+    SELECT food_id, name
+    FROM FOOD_TB
+    WHERE name IN ({in_ph})
+    ORDER BY food_id
+    """
+    with connection.cursor() as cur:
+        cur.execute(sql, names)
+        return [(int(r[0]), str(r[1])) for r in cur.fetchall()]
+
+
+class FoodNameDict:
+    """
+    프로세스 로컬 FOOD_TB name <-> food_id 사전.
+
+    - 최초 조회 시 전체 로드(lazy), 이후엔 food_id > 마지막 max 만 증분 로드
+      (FOOD_TB는 거의 추가만 되므로 증분으로 충분, full_reload_sec마다 전체 재로드로 수정/삭제 반영)
+    - 같은 이름이 여러 개면 가장 작은 food_id (_get_or_create_food_id_by_name과 같은 규칙)
+    - 사전에 없는 이름: 증분 로드(min_refresh_sec로 throttle) -> 그래도 없으면 DB IN 조회(collation 기준 매칭 유지)
+      결과가 없으면 negative_ttl_sec 동안 negative cache (증분 로드는 negative여도 먼저 하므로
+      다른 worker가 만든 음식은 다음 throttle 주기에 보임)
+    - 쓰기 경로(_get_or_create_food_id_by_name)는 peek()으로만 보고 없으면 바로 ORM, insert 후 remember()
+    """
+
+    def __init__(
+        self,
+        *,
+        fetch_after: Callable[[int], FoodRows] = _fetch_food_rows_after,
+        fetch_by_names: Callable[[List[str]], FoodRows] = _fetch_food_rows_by_names,
+        min_refresh_sec: float = 1.0,
+        full_reload_sec: float = 3600.0,
+        negative_ttl_sec: float = 60.0,
+    ):
+        self._fetch_after = fetch_after
+        self._fetch_by_names = fetch_by_names
+        self._min_refresh_sec = float(min_refresh_sec)
+        self._full_reload_sec = float(full_reload_sec)
+        self._negative_ttl_sec = float(negative_ttl_sec)
+
+        self._lock = threading.RLock()
+        self._id_by_name: Dict[str, int] = {}
+        self._name_by_id: Dict[int, str] = {}
+        # 이름 -> negative cache 만료 시각
+        self._missing: Dict[str, float] = {}
+        self._max_id = 0
+        self._loaded_at = 0.0
+        self._refreshed_at = 0.0
+        self.db_lookups = 0
+
+    # -----------------------------
+    # load / refresh
+    # -----------------------------
+    def _add_rows(self, rows: FoodRows, advance: bool = True) -> None:
+        for fid, name in rows:
+            self._name_by_id[fid] = name
+            cur = self._id_by_name.get(name)
+            if cur is None or fid < cur:
+                self._id_by_name[name] = fid
+            if advance and fid > self._max_id:
+                self._max_id = fid
+
+    def _ensure_loaded(self) -> None:
+        now = time.time()
+        if self._loaded_at and (self._full_reload_sec <= 0 or now - self._loaded_at < self._full_reload_sec):
+            return
+        with self._lock:
+            if self._loaded_at and (self._full_reload_sec <= 0 or now - self._loaded_at < self._full_reload_sec):
+                return
+            rows = self._fetch_after(0)
+            self._id_by_name, self._name_by_id, self._missing, self._max_id = {}, {}, {}, 0
+            self._add_rows(rows)
+            self._loaded_at = self._refreshed_at = time.time()
+            print(f"[FOOD_DICT][LOAD] n={len(self._name_by_id)} max_id={self._max_id}", flush=True)
+
+    def refresh(self, force: bool = False) -> int:
+        """food_id > max 증분 로드. 반환: 새로 들어온 행 수"""
+        self._ensure_loaded()
+        with self._lock:
+            if not force and time.time() - self._refreshed_at < self._min_refresh_sec:
+                return 0
+            rows = self._fetch_after(self._max_id)
+            self._refreshed_at = time.time()
+            if rows:
+                self._add_rows(rows)
+                self._missing.clear()
+            return len(rows)
+
+    # -----------------------------
+    # read
+    # -----------------------------
+    def ids_for_names(self, names: Iterable[str]) -> Dict[str, int]:
+        """map_food_names_to_ids와 같은 반환 형태(없는 이름은 빠짐)"""
+        self._ensure_loaded()
+        wanted = [str(x).strip() for x in (names or []) if str(x).strip()]
+        out = {n: self._id_by_name[n] for n in wanted if n in self._id_by_name}
+        misses = [n for n in dict.fromkeys(wanted) if n not in out]
+        if not misses:
+            return out
+
+        # negative여도 증분 로드는 먼저(throttle) -> 다른 worker가 만든 음식이 TTL 동안 묻히지 않게
+        self.refresh()
+        now = time.time()
+        still = []
+        for n in misses:
+            fid = self._id_by_name.get(n)
+            if fid is not None:
+                out[n] = fid
+            elif self._missing.get(n, 0.0) <= now:
+                still.append(n)
+        if still:
+            self.db_lookups += 1
+            found: Dict[str, int] = {}
+            for fid, name in self._fetch_by_names(still):
+                found.setdefault(name, fid)
+            with self._lock:
+                for n in still:
+                    # 대소문자/공백 차이로 collation 매칭된 경우도 요청 이름으로 기억
+                    fid = found.get(n)
+                    if fid is None:
+                        fid = next((v for k, v in found.items() if k.strip().lower() == n.lower()), None)
+                    if fid is None:
+                        self._missing[n] = now + self._negative_ttl_sec
+                        continue
+                    out[n] = fid
+                    self._id_by_name.setdefault(n, fid)
+        return out
+
+    def peek(self, name: str) -> Optional[int]:
+        """이미 로드된 사전에서만 찾기 (로드/증분/DB 조회 없음)"""
+        return self._id_by_name.get(str(name).strip())
+
+    def id_of(self, name: str) -> Optional[int]:
+        return self.ids_for_names([name]).get(str(name).strip())
+
+    def names_for_ids(self, food_ids: Iterable[int]) -> Dict[int, str]:
+        self._ensure_loaded()
+        ids = []
+        for x in food_ids:
+            try:
+                ids.append(int(x))
+            except (TypeError, ValueError):
+                continue
+        if any(i not in self._name_by_id for i in ids):
+            self.refresh()
+        return {i: self._name_by_id[i] for i in ids if i in self._name_by_id}
+
+    # -----------------------------
+    # write-through
+    # -----------------------------
+    def remember(self, name: str, food_id: int) -> None:
+        """FOOD_TB insert 직후 호출 (다음 조회부터 DB 안 감)"""
+        if not self._loaded_at:
+            return  # 아직 로드 전이면 최초 로드 때 같이 들어옴
+        with self._lock:
+            # watermark는 안 올림: 다른 worker가 그 사이 insert한 id를 증분 로드에서 놓치지 않게
+            self._add_rows([(int(food_id), str(name))], advance=False)
+            self._missing.pop(str(name), None)
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "n_foods": len(self._name_by_id),
+            "n_names": len(self._id_by_name),
+            "max_id": self._max_id,
+            "negative": len(self._missing),
+            "db_lookups": self.db_lookups,
+        }
+
+
+# 프로세스당 1개
+FOOD_NAMES = FoodNameDict()
@@ -0,0 +1,92 @@
+# ml/menu_reco/pregen.py
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List
+
+from ml.menu_reco import db_repo
+
+
+def _group_by_reco_dt(targets: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    out: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for t in targets:
+        out[t["reco_rgs_dt"]].append(t)
+    return out
+
+
+def run_pregen(
+    rgs_dt: str,
+    *,
+    chunk_size: int = 500,
+    after: str = "",
+    limit: int = 0,
+    force: bool = False,
+    dry_run: bool = False,
+    log: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    """
+    rgs_dt에 기록이 있는 사용자 전체의 다음 끼니 추천(P/H/E)을 미리 계산해 MENU_RECOM_TH에 저장.
+    - 사용자 chunk_size명씩 (cust_id keyset): 대상/스냅샷/최근 음식 조회 -> recommend_batch -> bulk upsert
+    - 이미 저장된 (cust_id, 추천일, 끼니)는 건너뜀(force면 다시 계산) -> 중간에 끊겨도 다시 돌리면 이어서
+    - after: 이 cust_id 다음부터 (로그의 last= 값), limit: 최대 사용자 수(0=전체)
+    반환: 처리 요약 {users, skipped, computed, empty, failed, rows, last, sec}
+    """
+    from ml.menu_reco.service import recommend_batch
+
+    t0 = time.perf_counter()
+    stats: Dict[str, Any] = {
+        "users": 0, "skipped": 0, "computed": 0, "empty": 0, "failed": 0, "rows": 0, "last": after or "",
+    }
+
+    while True:
+        n = int(chunk_size)
+        if limit:
+            n = min(n, int(limit) - stats["users"])
+            if n <= 0:
+                break
+        targets, chunk_last = db_repo.fetch_pregen_targets(rgs_dt, after_cust_id=stats["last"], limit=n)
+        if not chunk_last:
+            break
+        stats["users"] += len(targets)
+
+        if not force:
+            done = db_repo.existing_menu_recom_keys(
+                [(t["cust_id"], t["reco_rgs_dt"], t["reco_time_slot"]) for t in targets]
+            )
+            todo = [t for t in targets if (t["cust_id"], t["reco_rgs_dt"], t["reco_time_slot"]) not in done]
+            stats["skipped"] += len(targets) - len(todo)
+            targets = todo
+
+        recent = db_repo.fetch_recent_food_names_bulk([t["cust_id"] for t in targets], limit=10)
+        items = []
+        for reco_dt, group in _group_by_reco_dt(targets).items():
+            snaps = db_repo.get_users_reco_snapshots([t["cust_id"] for t in group], reco_dt, days=7)
+            for t in group:
+                items.append({
+                    "cust_id": t["cust_id"],
+                    "mood": t["mood"],
+                    "energy": t["energy"],
+                    "rgs_dt": reco_dt,
+                    "rec_time_slot": t["reco_time_slot"],
+                    "recent_foods": (recent.get(t["cust_id"]) or [])[:10] or None,
+                    "snapshot": snaps.get(t["cust_id"]),
+                })
+
+        rows = []
+        for r in recommend_batch(items) if items else []:
+            stats[r["status"]] = stats.get(r["status"], 0) + 1
+            rows += [(r["cust_id"], r["rgs_dt"], r["rec_time_slot"], rt, fid) for rt, fid in r["rows"]]
+        if not dry_run:
+            db_repo.upsert_menu_recom_rows_bulk(rows)
+        stats["rows"] += len(rows)
+        stats["last"] = chunk_last
+
+        log(
+            f"[PREGEN][CHUNK] users={stats['users']} computed={stats['computed']} skipped={stats['skipped']} "
+            f"empty={stats['empty']} failed={stats['failed']} rows={stats['rows']} last={chunk_last} "
+            f"sec={time.perf_counter() - t0:.1f}"
+        )
+
+    stats["sec"] = round(time.perf_counter() - t0, 3)
+    return stats
@@ -0,0 +1,162 @@
+# ml/menu_reco/registry.py
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def version_of(fingerprint: str) -> str:
+    """fingerprint 문자열 -> 짧은 버전 id (로그/엔드포인트/캐시 key용)"""
+    return hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class ArtifactBundle:
+    """
+    한 번 로드된 artifacts 묶음(불변).
+    요청은 bundle 참조 하나만 잡고 쓰므로, 중간에 swap 되어도 같은 버전으로 끝까지 처리된다.
+    """
+    version: str
+    fingerprint: str
+    loaded_at: str
+    load_sec: float
+    payload: Tuple[Any, ...] = field(repr=False)
+
+
+class ArtifactRegistry:
+    """
+    버전 단위 artifacts 레지스트리.
+
+    - 요청 경로에서는 active bundle 참조만 읽는다(파일 stat/로드 없음).
+    - check_ttl_sec가 지나면 백그라운드 스레드 하나가 fingerprint를 확인하고,
+      바뀌었으면 새 bundle을 로드 + 검증한 뒤 참조를 한 번에 교체한다.
+    - 로드/검증 실패 시 기존 bundle을 그대로 유지한다.
+    """
+
+    def __init__(
+        self,
+        *,
+        load_fn: Callable[[], Tuple[Any, ...]],
+        fingerprint_fn: Callable[[], str],
+        validate_fn: Optional[Callable[[Tuple[Any, ...]], None]] = None,
+        check_ttl_sec: float = 60.0,
+        name: str = "artifacts",
+    ):
+        self._load_fn = load_fn
+        self._fingerprint_fn = fingerprint_fn
+        self._validate_fn = validate_fn
+        self._check_ttl_sec = float(check_ttl_sec)
+        self._name = name
+
+        self._active: Optional[ArtifactBundle] = None
+        self._load_lock = threading.Lock()
+        self._checking = threading.Event()
+        self._watch_lock = threading.Lock()  # is_set -> set 사이에 watcher가 두 개 뜨지 않게
+        self._last_check = 0.0
+        self._last_error: Optional[str] = None
+
+    # -----------------------------
+    # read path
+    # -----------------------------
+    def get(self) -> ArtifactBundle:
+        bundle = self._active
+        if bundle is None:
+            # 최초 1회만 요청 경로에서 동기 로드
+            return self.reload(force=False)
+        self._maybe_check_async()
+        return bundle
+
+    @property
+    def active_version(self) -> Optional[str]:
+        bundle = self._active
+        return bundle.version if bundle is not None else None
+
+    def status(self) -> Dict[str, Any]:
+        bundle = self._active
+        return {
+            "name": self._name,
+            "version": bundle.version if bundle else None,
+            "fingerprint": bundle.fingerprint if bundle else None,
+            "loaded_at": bundle.loaded_at if bundle else None,
+            "load_sec": round(bundle.load_sec, 3) if bundle else None,
+            "last_check_at": (
+                datetime.fromtimestamp(self._last_check).isoformat(timespec="seconds")
+                if self._last_check else None
+            ),
+            "check_ttl_sec": self._check_ttl_sec,
+            "last_error": self._last_error,
+        }
+
+    # -----------------------------
+    # reload
+    # -----------------------------
+    def reload(self, force: bool = False) -> ArtifactBundle:
+        """
+        fingerprint가 바뀌었거나 force면 새로 로드해서 swap.
+        동시에 여러 스레드가 호출해도 실제 로드는 한 번만 일어난다.
+        """
+        with self._load_lock:
+            self._last_check = time.time()
+            fp = self._fingerprint_fn()
+            current = self._active
+            if current is not None and not force and current.fingerprint == fp:
+                return current
+
+            t0 = time.perf_counter()
+            try:
+                payload = self._load_fn()
+                if self._validate_fn is not None:
+                    self._validate_fn(payload)
+            except Exception as e:
+                self._last_error = f"{type(e).__name__}: {e}"
+                if current is None:
+                    raise
+                print(
+                    f"[RECO][ARTIFACTS_RELOAD_FAIL] keep version={current.version} err={self._last_error}",
+                    flush=True,
+                )
+                traceback.print_exc()
+                return current
+
+            bundle = ArtifactBundle(
+                version=version_of(fp),
+                fingerprint=fp,
+                loaded_at=datetime.now().isoformat(timespec="seconds"),
+                load_sec=time.perf_counter() - t0,
+                payload=payload,
+            )
+            # ✅ 참조 1개 교체(원자적) -> 진행 중인 요청은 이전 bundle로 끝난다
+            self._active = bundle
+            self._last_error = None
+            print(
+                f"[RECO][ARTIFACTS_ACTIVE] version={bundle.version} "
+                f"prev={current.version if current else None} load_sec={bundle.load_sec:.2f}",
+                flush=True,
+            )
+            return bundle
+
+    def _maybe_check_async(self) -> None:
+        if self._check_ttl_sec <= 0:
+            return
+        if time.time() - self._last_check < self._check_ttl_sec:
+            return
+        with self._watch_lock:
+            if self._checking.is_set():
+                return
+            self._checking.set()
+            self._last_check = time.time()
+        t = threading.Thread(target=self._check_worker, name=f"{self._name}-watcher", daemon=True)
+        t.start()
+
+    def _check_worker(self) -> None:
+        try:
+            self.reload(force=False)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self._checking.clear()
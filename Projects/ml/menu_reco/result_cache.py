@@ -0,0 +1,131 @@
+# ml/menu_reco/result_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+
+def profile_version(profile: Dict[str, Any]) -> str:
+    """CUS_PROFILE_TS 행 -> 짧은 버전 id (updated_time/목표 칼로리/비율 중 하나라도 바뀌면 달라짐)"""
+    raw = json.dumps({str(k): str(v) for k, v in (profile or {}).items()}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def kcal_bucket(kcal: float, bucket: float) -> float:
+    """섭취 kcal -> bucket 하한값 (bucket<=0 이면 그대로)"""
+    kcal = float(kcal or 0.0)
+    if bucket <= 0:
+        return round(kcal, 3)
+    return float(int(kcal // bucket) * bucket)
+
+
+def reco_state_key(
+    *,
+    cust_id: str,
+    rgs_dt: str,
+    rec_time_slot: str,
+    mood: str,
+    energy: str,
+    eaten_kcal_bucket: float,
+    recent_foods: Optional[Iterable[str]],
+    current_food: Optional[str],
+    recent_macro: Optional[Dict[str, Any]],
+    profile_ver: str,
+    artifact_version: str,
+) -> str:
+    """
+    추천 입력 상태 전체 -> hash key.
+    recent_foods는 순서 무관(set), recent_macro(7일 합)는 user_vec 입력이라 같이 넣는다.
+    """
+    macro = {k: round(float(v or 0.0), 1) for k, v in sorted((recent_macro or {}).items())}
+    state = [
+        str(cust_id), str(rgs_dt), str(rec_time_slot).upper(), str(mood), str(energy),
+        eaten_kcal_bucket,
+        sorted({str(f) for f in (recent_foods or [])}),
+        str(current_food) if current_food else None,
+        macro,
+        profile_ver,
+        artifact_version,
+    ]
+    raw = json.dumps(state, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class CachedReco:
+    rec_df: pd.DataFrame = field(repr=False)
+    final_rows: Tuple[Tuple[str, str], ...]
+    run_id: str
+    created_at: float
+
+
+class RecoResultCache:
+    """
+    추천 결과 in-process LRU(+TTL) 캐시.
+
+    - key: reco_state_key (입력 상태 전체 hash) -> 같은 상태면 Phase1~3 생략
+    - hit여도 MENU_RECOM_TH upsert는 항상 다시 한다(다른 워커가 같은 slot에 다른 결과를 썼을 수 있음).
+    - 워커(프로세스)마다 독립. 다른 워커가 쓴 결과는 모르므로 miss 시 그냥 재계산.
+    """
+
+    def __init__(self, max_size: int = 4096, ttl_sec: float = 1800.0):
+        self._max_size = int(max_size)
+        self._ttl_sec = float(ttl_sec)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedReco]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_size > 0
+
+    def get(self, key: str) -> Optional[CachedReco]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._ttl_sec > 0 and time.time() - entry.created_at > self._ttl_sec:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, rec_df: pd.DataFrame, final_rows: List[Tuple[str, str]], run_id: str) -> None:
+        if not self.enabled:
+            return
+        entry = CachedReco(
+            rec_df=rec_df.copy(), final_rows=tuple(final_rows), run_id=run_id, created_at=time.time(),
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "ttl_sec": self._ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
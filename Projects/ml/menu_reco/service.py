@@ -1,10 +1,10 @@
 # ml/menu_reco/service.py
 from __future__ import annotations
 
-from functools import lru_cache
 from typing import Dict, Any, Optional, List, Tuple
 
 import json
+import time
 import uuid
 import traceback
 from pathlib import Path
@@ -16,18 +16,45 @@ from django.conf import settings
 from django.db import connection
 
 from ml.menu_reco.common.config import AppConfig, Phase1Config, Phase3Config
-from ml.menu_reco.common.ssot import macro_ratio_from_grams_to_kcal, normalize_macro
-from ml.menu_reco.domain.phase1.rule_based import recommend_phase1_2plus1
+from ml.menu_reco.common.food_vocab import FOOD_VOCAB_FILE, FoodVocab
+from ml.menu_reco.common.io import (
+    arrow_path_for,
+    load_arrow_mmap,
+    active_phase1_dir,
+    active_phase_dir,
+    phase1_pointer_path,
+    version_pointer_path,
+)
+from ml.menu_reco.common.ssot import (
+    macro_ratio_from_grams_to_kcal,
+    normalize_macro,
+    normalize_mood_label,
+    normalize_energy_label,
+)
+from ml.menu_reco.domain.phase1.rule_based import (
+    recommend_phase1_2plus1,
+    recommend_phase1_batch,
+    build_candidate_index,
+    precompute_guardrails,
+    build_food_catalogs,
+    ensure_food_vocab,
+)
+from ml.menu_reco.domain.phase1.spatial import build_catalog_grids
 
-from ml.menu_reco.domain.phase2.clustering import attach_cluster_info
+from ml.menu_reco.domain.phase2.clustering import attach_cluster_info, build_centroid_index, build_cluster_lookup
 from ml.menu_reco.domain.phase3.reranker import (
-    build_stable_food_ctx_from_logs,
-    compute_p_stable_cluster,
+    build_p_stable_table,
+    build_p_stable_lookup,
     attach_p_stable_cluster,
     combine_score_phase3,
 )
 
 from ml.menu_reco import db_repo
+from ml.menu_reco.registry import ArtifactRegistry
+from ml.menu_reco.result_cache import RecoResultCache, kcal_bucket, profile_version, reco_state_key
+from ml.menu_reco.single_flight import KeyedLocks, SingleFlight
+from ml.menu_reco import trace as reco_trace
+from ml.menu_reco.trace import RECO_TRACES, Trace
 
 
 # -----------------------------
@@ -73,24 +100,92 @@ def _read_parquet_robust(path: Path) -> pd.DataFrame:
                 )
 
 
+def _arrow_if_fresh(path: Path) -> Optional[Path]:
+    """
+    compile_menu_reco_artifacts로 만든 .arrow가 있고 원본보다 최신이면 그 경로를 반환.
+    """
+    if not AppConfig().USE_ARROW_MMAP:
+        return None
+    arrow = arrow_path_for(path)
+    try:
+        if arrow.exists() and (not path.exists() or arrow.stat().st_mtime >= path.stat().st_mtime):
+            return arrow
+    except OSError:
+        pass
+    return None
+
+
+def _read_frame_artifact(path: Path) -> pd.DataFrame:
+    """
+    .arrow(memory-map, worker 간 공유) 우선, 실패/없음이면 _read_parquet_robust fallback.
+    """
+    arrow = _arrow_if_fresh(path)
+    if arrow is not None:
+        try:
+            return load_arrow_mmap(arrow)
+        except Exception as e:
+            print("[RECO][ARROW_MMAP_FAIL]", "path=", arrow, "err=", repr(e), flush=True)
+    return _read_parquet_robust(path)
+
+
+def _load_bad_foods(path: Path) -> Any:
+    """
+    .arrow가 있으면 mmap된 Arrow string Index(프로세스 간 공유), 없으면 json -> set.
+    (rule_based에서는 isin/len만 사용하므로 둘 다 동작)
+    """
+    arrow = _arrow_if_fresh(path)
+    if arrow is not None:
+        try:
+            return pd.Index(load_arrow_mmap(arrow)["Food"])
+        except Exception as e:
+            print("[RECO][ARROW_MMAP_FAIL]", "path=", arrow, "err=", repr(e), flush=True)
+    return set(_load_json(path))
+
+
+def _load_food_vocab(path: Path) -> Optional[FoodVocab]:
+    if not AppConfig().USE_ARROW_MMAP or not path.exists():
+        return None
+    try:
+        return FoodVocab(load_arrow_mmap(path)["Food"].astype(str))
+    except Exception as e:
+        print("[RECO][FOOD_VOCAB_FAIL]", "path=", path, "err=", repr(e), flush=True)
+        return None
+
+
 def _load_phase1_artifacts_robust(artifacts_dir: Path) -> Dict[str, Any]:
-    base = artifacts_dir / "phase1"
+    # incremental builder가 publish한 버전(phase1_versions/CURRENT)이 있으면 그 디렉토리
+    base = active_phase1_dir(artifacts_dir)
     return {
-        "food_stats": _read_parquet_robust(base / "food_stats.parquet"),
-        "user_pref": _read_parquet_robust(base / "user_pref.parquet"),
-        "ctx_food_all": _read_parquet_robust(base / "ctx_food_all.parquet"),
-        "unobserved_pool": _read_parquet_robust(base / "unobserved_pool.parquet"),
+        "food_stats": _read_frame_artifact(base / "food_stats.parquet"),
+        "user_pref": _read_frame_artifact(base / "user_pref.parquet"),
+        "ctx_food_all": _read_frame_artifact(base / "ctx_food_all.parquet"),
+        "unobserved_pool": _read_frame_artifact(base / "unobserved_pool.parquet"),
         # NOTE: rule_based.py에서는 artifacts["bad_foods_set"] 키를 기대하므로 이름 고정
-        "bad_foods_set": set(_load_json(base / "bad_foods.json")),
+        "bad_foods_set": _load_bad_foods(base / "bad_foods.json"),
         "config": _load_json(base / "config.json"),
+        # compile_menu_reco_artifacts가 만든 공용 Food 사전(없으면 로드 시 frame에서 생성)
+        "food_vocab": _load_food_vocab(base / FOOD_VOCAB_FILE),
     }
 
 
+def _read_parquet_optional(path: Path) -> Optional[pd.DataFrame]:
+    """
+    없어도 서비스가 동작해야 하는 artifact용(없으면 None).
+    """
+    if path.exists() or _arrow_if_fresh(path) is not None:
+        return _read_frame_artifact(path)
+    return None
+
+
 def _load_phase2_artifacts_robust(artifacts_dir: Path) -> Dict[str, Any]:
-    base = artifacts_dir / "phase2"
+    # cluster_menu_reco_phase2가 publish한 버전(phase2_versions/CURRENT)이 있으면 그 디렉토리
+    base = active_phase_dir(artifacts_dir, "phase2")
     return {
-        "clustered": _read_parquet_robust(base / "clustered.parquet"),
-        "cluster_meta": _read_parquet_robust(base / "cluster_meta.parquet"),
+        # clustered가 없으면 cluster_id/p_stable은 default로 처리됨(attach_cluster_info 참고)
+        "clustered": _read_parquet_optional(base / "clustered.parquet"),
+        "cluster_meta": _read_frame_artifact(base / "cluster_meta.parquet"),
+        # cluster_menu_reco_phase2가 저장한 scaler(없으면 신규 음식 nearest-centroid 할당 생략)
+        "scaler": _read_parquet_optional(base / "scaler.parquet"),
     }
 
 
@@ -100,70 +195,183 @@ def _try_load_phase3_logs(artifacts_dir: Path) -> Optional[pd.DataFrame]:
     있으면 artifacts/phase3/logs.parquet에서 읽고,
     없으면 None 반환.
     """
-    p = artifacts_dir / "phase3" / "logs.parquet"
-    if p.exists():
-        return _read_parquet_robust(p)
-    return None
+    return _read_parquet_optional(artifacts_dir / "phase3" / "logs.parquet")
+
+
+def _build_phase3_artifacts(
+    artifacts_dir: Path,
+    phase1: Dict[str, Any],
+    phase2: Dict[str, Any],
+    logs: Optional[pd.DataFrame],
+) -> Dict[str, Any]:
+    """
+    (Mood, Energy, cluster_id) -> p_stable_cluster 테이블을 artifacts 로드 시 1회만 만든다.
+    - clustered가 있으면: logs(없으면 ctx_food_all fallback)로 계산 (기존 요청별 계산과 동일 결과)
+    - clustered가 없고 centroid_index가 있으면: 오프라인에서 저장된 phase3/p_stable_cluster.parquet 사용
+    - 둘 다 없으면: 요청 DF의 cluster_id가 전부 NaN -> 기존과 같이 p_stable 0.5 (테이블 로드 안 함)
+    default_p_source: p_stable을 못 쓸 때의 phase3_logs_source 라벨 (기존 요청별 계산과 같은 logs 출처)
+    """
+    phase3_cfg = Phase3Config()
+    clustered = phase2.get("clustered")
+    has_logs = logs is not None and not logs.empty
+    default_p_source = "ARTIFACT_LOGS" if has_logs else "FALLBACK_FROM_CTX"
+
+    p_stable_df: Optional[pd.DataFrame] = None
+    source = default_p_source
+    if isinstance(clustered, pd.DataFrame) and not clustered.empty:
+        if not has_logs:
+            logs = _fallback_logs_from_ctx(phase1["ctx_food_all"])
+        p_stable_df = build_p_stable_table(logs, clustered, alpha=phase3_cfg.alpha)
+    elif phase2.get("centroid_index"):
+        p_stable_df = _read_parquet_optional(artifacts_dir / "phase3" / "p_stable_cluster.parquet")
+        if p_stable_df is not None:
+            source = "PERSISTED_P_STABLE"
+
+    return {
+        "p_stable_cluster": p_stable_df if p_stable_df is not None else pd.DataFrame(),
+        "logs_source": source,
+        "default_p_source": default_p_source,
+    }
 
 
 # -----------------------------
-# Artifacts cache (fingerprint 기반)
+# Artifacts registry (fingerprint 기반 버전 + hot-swap)
 # -----------------------------
+# reload_menu_reco_artifacts 커맨드가 touch -> 모든 worker가 다음 확인 때 새 버전으로 교체
+RELOAD_MARKER = "RELOAD"
+
+
+def _artifacts_dir() -> Path:
+    return AppConfig().resolve_artifacts_dir(Path(settings.BASE_DIR))
+
+
 def _artifacts_fingerprint(artifacts_dir: Path) -> str:
     """
     artifacts 폴더 내 주요 파일들의 최신 수정시각을 fingerprint로 만든다.
-    - 파일이 바뀌면 fingerprint가 바뀌고, 캐시가 자동 무효화됨.
+    - 파일이 바뀌면 fingerprint가 바뀌고, registry가 새 버전으로 교체함.
     """
+    phase1_dir = active_phase1_dir(artifacts_dir)
+    phase2_dir = active_phase_dir(artifacts_dir, "phase2")
     targets = [
-        artifacts_dir / "phase1" / "food_stats.parquet",
-        artifacts_dir / "phase1" / "user_pref.parquet",
-        artifacts_dir / "phase1" / "ctx_food_all.parquet",
-        artifacts_dir / "phase1" / "unobserved_pool.parquet",
-        artifacts_dir / "phase1" / "bad_foods.json",
-        artifacts_dir / "phase1" / "config.json",
-        artifacts_dir / "phase2" / "clustered.parquet",
-        artifacts_dir / "phase2" / "cluster_meta.parquet",
+        phase1_dir / "food_stats.parquet",
+        phase1_dir / "user_pref.parquet",
+        phase1_dir / "ctx_food_all.parquet",
+        phase1_dir / "unobserved_pool.parquet",
+        phase1_dir / "bad_foods.json",
+        phase1_dir / "config.json",
+        phase1_dir / FOOD_VOCAB_FILE,
+        phase2_dir / "clustered.parquet",
+        phase2_dir / "cluster_meta.parquet",
+        phase2_dir / "scaler.parquet",
         artifacts_dir / "phase3" / "logs.parquet",
+        artifacts_dir / "phase3" / "p_stable_cluster.parquet",
     ]
+    # compile된 .arrow도 바뀌면 reload
+    targets += [arrow_path_for(p) for p in targets if p.suffix != ".json" or p.name == "bad_foods.json"]
+    targets.append(artifacts_dir / RELOAD_MARKER)
+    targets.append(phase1_pointer_path(artifacts_dir))
+    targets.append(version_pointer_path(artifacts_dir, "phase2"))
+
     mtimes: List[str] = []
     for p in targets:
         try:
-            mtimes.append(str(int(p.stat().st_mtime)) if p.exists() else "0")
+            mtimes.append(str(p.stat().st_mtime_ns) if p.exists() else "0")
         except Exception:
             mtimes.append("0")
-    return "|".join(mtimes)
+    # 버전 디렉토리가 바뀌면 mtime이 같아도 다른 fingerprint
+    return f"{phase1_dir.name}|{phase2_dir.name}|" + "|".join(mtimes)
 
 
-@lru_cache(maxsize=4)
-def _load_artifacts_cached_by_fp(
-    fp: str,
-) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[pd.DataFrame]]:
+def _load_artifacts_bundle() -> Tuple[Dict[str, Any], Dict[str, Any], Optional[pd.DataFrame], Dict[str, Any]]:
     """
-    fp(=fingerprint)가 바뀌면 자동으로 artifacts를 다시 로드한다.
+    artifacts 전체 로드(요청 경로 밖, registry가 호출).
+    Phase1 후보 index, Phase3 p_stable 테이블도 여기서 같이 만들어 둔다(요청마다 scan/groupby 하지 않음).
     """
-    cfg = AppConfig()
-    base_dir = Path(settings.BASE_DIR)
-    artifacts_dir = cfg.resolve_artifacts_dir(base_dir)
+    artifacts_dir = _artifacts_dir()
 
     phase1 = _load_phase1_artifacts_robust(artifacts_dir)
     phase2 = _load_phase2_artifacts_robust(artifacts_dir)
     logs = _try_load_phase3_logs(artifacts_dir)
+    return _prepare_artifacts_bundle(artifacts_dir, phase1, phase2, logs)
 
+
+def _prepare_artifacts_bundle(
+    artifacts_dir: Path,
+    phase1: Dict[str, Any],
+    phase2: Dict[str, Any],
+    logs: Optional[pd.DataFrame],
+) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[pd.DataFrame], Dict[str, Any]]:
+    """
+    로드된 raw artifacts -> 요청 경로용 bundle payload (라벨 정규화 + index/catalog + p_stable)
+    파일 없이 만든 artifacts(bench 등)도 같은 경로로 준비한다.
+    여기서 만드는 index/catalog/grid/lookup은 mmap 컬럼의 복사본이라 worker마다 private 메모리
+    (현재 artifacts 기준 합계 수 MB). worker 간 공유되는 건 .arrow에서 읽은 원본 컬럼뿐.
+    """
     phase1, phase2, logs = _normalize_artifacts_labels_inplace(phase1, phase2, logs)
-    return phase1, phase2, logs
+    # Phase1 guardrail mask(config 기준) -> 후보 풀 partition + recovery 풀 (bad_foods 제외)
+    precompute_guardrails(phase1, _map_phase1_cfg(phase1))
+    # Food 이름 -> int32 id 공용 사전 (bad_foods/exclude/history 필터는 id bitmap/isin)
+    vocab = ensure_food_vocab(phase1)
+    phase1["candidate_index"] = build_candidate_index(phase1["ctx_food_all"], phase1["bad_foods_set"], vocab=vocab)
+    build_food_catalogs(phase1)
+    if AppConfig().USE_SPATIAL_INDEX:
+        build_catalog_grids(phase1)
+    phase2["centroid_index"] = build_centroid_index(phase2.get("cluster_meta"), phase2.get("scaler"))
+    # Phase2/3 enrichment용 hash index -> 요청마다 clustered drop_duplicates + merge 하지 않음
+    phase2["cluster_lookup"] = build_cluster_lookup(phase2.get("clustered"), phase2.get("cluster_meta"))
+    phase3 = _build_phase3_artifacts(artifacts_dir, phase1, phase2, logs)
+    _normalize_frame_labels_inplace(phase3["p_stable_cluster"])
+    phase3["p_stable_lookup"] = build_p_stable_lookup(phase3["p_stable_cluster"])
+    return phase1, phase2, logs, phase3
+
+
+def _validate_artifacts_bundle(payload: Tuple[Any, ...]) -> None:
+    """swap 전에 최소 검증: 실패하면 registry가 기존 버전을 유지"""
+    phase1, phase2, _logs, _phase3 = payload
+    ctx = phase1.get("ctx_food_all")
+    if ctx is None or len(ctx) == 0:
+        raise ValueError("phase1 ctx_food_all is empty")
+    missing = {"Mood", "Energy", "Food"} - set(ctx.columns)
+    if missing:
+        raise ValueError(f"phase1 ctx_food_all missing columns: {sorted(missing)}")
+    if not phase1.get("candidate_index"):
+        raise ValueError("phase1 candidate_index is empty")
+    if phase2.get("cluster_meta") is None:
+        raise ValueError("phase2 cluster_meta missing")
+
+
+ARTIFACTS = ArtifactRegistry(
+    load_fn=_load_artifacts_bundle,
+    fingerprint_fn=lambda: _artifacts_fingerprint(_artifacts_dir()),
+    validate_fn=_validate_artifacts_bundle,
+    check_ttl_sec=AppConfig().ARTIFACT_CHECK_TTL_SEC,
+    name="menu_reco_artifacts",
+)
+
+# 같은 입력 상태(식사 재저장 등)면 Phase1~3 + upsert 생략
+RESULT_CACHE = RecoResultCache(
+    max_size=AppConfig().RESULT_CACHE_SIZE,
+    ttl_sec=AppConfig().RESULT_CACHE_TTL_SEC,
+)
+
+# 동시 요청 coalescing(같은 입력) + slot별 직렬화(입력이 다를 때)
+RECO_FLIGHTS = SingleFlight()
+SLOT_LOCKS = KeyedLocks()
 
 
-def _load_artifacts_cached() -> Tuple[Dict[str, Any], Dict[str, Any], Optional[pd.DataFrame]]:
+def _load_artifacts_cached() -> Tuple[Dict[str, Any], Dict[str, Any], Optional[pd.DataFrame], Dict[str, Any]]:
     """
     ✅ 외부 호출부는 그대로(_load_artifacts_cached()) 유지
-    내부적으로 fingerprint 기반 캐시로 교체
+    내부적으로 registry의 active 버전을 반환(요청 경로에서 fingerprint 계산 안 함)
     """
-    cfg = AppConfig()
-    base_dir = Path(settings.BASE_DIR)
-    artifacts_dir = cfg.resolve_artifacts_dir(base_dir)
+    return ARTIFACTS.get().payload
+
 
-    fp = _artifacts_fingerprint(artifacts_dir)
-    return _load_artifacts_cached_by_fp(fp)
+def request_artifacts_reload() -> Path:
+    """RELOAD marker를 touch -> 각 worker registry가 다음 확인 때 새 버전으로 교체"""
+    marker = _artifacts_dir() / RELOAD_MARKER
+    marker.write_text(datetime.now().isoformat(timespec="seconds"), encoding="utf-8")
+    return marker
 
 
 # -----------------------------
@@ -223,26 +431,22 @@ def _normalize_ctx_labels(mood: str, energy: str) -> Tuple[str, str]:
     return mood_map.get(m, mood), energy_map.get(e, energy)
 
 
-def _norm_mood_val(x: Any) -> str:
-    s = str(x).strip().lower()
-    if s in ("pos", "positive"):
-        return "pos"
-    if s in ("neu", "neutral"):
-        return "neu"
-    if s in ("neg", "negative"):
-        return "neg"
-    return s
+# 라벨 정규화 규칙은 ssot 공용(incremental builder와 동일)
+_norm_mood_val = normalize_mood_label
+_norm_energy_val = normalize_energy_label
+
 
+def _map_labels(col: pd.Series, fn) -> pd.Series:
+    # 라벨 종류가 몇 개 안 되므로 unique 값만 변환해서 dict로 매핑(행마다 함수 호출 X)
+    return col.map({u: fn(u) for u in col.unique()})
 
-def _norm_energy_val(x: Any) -> str:
-    s = str(x).strip().lower()
-    if s in ("low",):
-        return "low"
-    if s in ("med", "mid"):
-        return "med"
-    if s in ("high", "hig"):
-        return "hig"
-    return s
+
+def _normalize_frame_labels_inplace(df: Optional[pd.DataFrame]) -> None:
+    if isinstance(df, pd.DataFrame) and not df.empty:
+        if "Mood" in df.columns:
+            df["Mood"] = _map_labels(df["Mood"], _norm_mood_val)
+        if "Energy" in df.columns:
+            df["Energy"] = _map_labels(df["Energy"], _norm_energy_val)
 
 
 def _normalize_artifacts_labels_inplace(
@@ -250,40 +454,12 @@ def _normalize_artifacts_labels_inplace(
     phase2: Dict[str, Any],
     logs: Optional[pd.DataFrame],
 ) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[pd.DataFrame]]:
-    # phase1 ctx_food_all
-    ctx = phase1.get("ctx_food_all")
-    if isinstance(ctx, pd.DataFrame) and not ctx.empty:
-        if "Mood" in ctx.columns:
-            ctx["Mood"] = ctx["Mood"].map(_norm_mood_val)
-        if "Energy" in ctx.columns:
-            ctx["Energy"] = ctx["Energy"].map(_norm_energy_val)
-        phase1["ctx_food_all"] = ctx
-
-    # phase2 clustered / cluster_meta
-    clustered = phase2.get("clustered")
-    if isinstance(clustered, pd.DataFrame) and not clustered.empty:
-        if "Mood" in clustered.columns:
-            clustered["Mood"] = clustered["Mood"].map(_norm_mood_val)
-        if "Energy" in clustered.columns:
-            clustered["Energy"] = clustered["Energy"].map(_norm_energy_val)
-        phase2["clustered"] = clustered
-
-    meta = phase2.get("cluster_meta")
-    if isinstance(meta, pd.DataFrame) and not meta.empty:
-        if "Mood" in meta.columns:
-            meta["Mood"] = meta["Mood"].map(_norm_mood_val)
-        if "Energy" in meta.columns:
-            meta["Energy"] = meta["Energy"].map(_norm_energy_val)
-        phase2["cluster_meta"] = meta
-
-    # phase3 logs
-    if isinstance(logs, pd.DataFrame) and not logs.empty:
-        if "Mood" in logs.columns:
-            logs["Mood"] = logs["Mood"].map(_norm_mood_val)
-        if "Energy" in logs.columns:
-            logs["Energy"] = logs["Energy"].map(_norm_energy_val)
-        return phase1, phase2, logs
-
+    # phase1 ctx_food_all / phase2 clustered, cluster_meta / phase3 logs
+    _normalize_frame_labels_inplace(phase1.get("ctx_food_all"))
+    _normalize_frame_labels_inplace(phase2.get("clustered"))
+    _normalize_frame_labels_inplace(phase2.get("cluster_meta"))
+    _normalize_frame_labels_inplace(phase2.get("scaler"))
+    _normalize_frame_labels_inplace(logs)
     return phase1, phase2, logs
 
 
@@ -326,6 +502,72 @@ def _to_rec_code(rt: str) -> str:
     return "P"
 
 
+def _reco_inputs(snapshot: Dict[str, Any], rec_time_slot: str, phase1_cfg: Phase1Config) -> Dict[str, Any]:
+    """
+    get_user_reco_snapshot 결과 -> Phase1 override 입력 (단건/배치 공통)
+    - remaining = 권장 kcal - 당일 섭취, per_meal_target = remaining / 남은 끼니 수
+    - purpose: DB 1/2/3 -> model 0/1/2
+    """
+    profile = snapshot["profile"]
+    recommended = float(profile.get("Recommended_calories") or 0)
+    eaten_kcal = float(snapshot["day"].get("sum_kcal") or 0)
+    remaining = max(0.0, recommended - eaten_kcal)
+
+    rm = _remaining_meals(rec_time_slot)
+    per_meal_target = remaining / float(rm) if rm > 0 else remaining
+
+    purpose_db = int(profile.get("purpose") or 2)  # default Main(2)
+    return {
+        "eaten_kcal": eaten_kcal,
+        "remaining": remaining,
+        "per_meal_target": per_meal_target,
+        "purpose_db": purpose_db,
+        "purpose_model": max(0, min(2, purpose_db - 1)),
+        "user_vec": _build_user_vec_from_db(
+            profile=profile, recent_macro=snapshot["recent"], phase1_cfg=phase1_cfg
+        ),
+    }
+
+
+def _final_rows(rec_df: pd.DataFrame, mapping: Dict[str, int]) -> List[Tuple[str, str]]:
+    """추천 DF(점수순) -> MENU_RECOM_TH 저장 행 [(P/H/E, food_id)] (rec_type별 첫 행, food_id 없는 음식 제외)"""
+    uniq: Dict[str, str] = {}
+    for rt, food in zip(rec_df["rec_type"].tolist(), rec_df["Food"].astype(str).tolist()):
+        food_id = mapping.get(food)
+        if not food_id:
+            continue
+        uniq.setdefault(_to_rec_code(rt), str(food_id))
+    return list(uniq.items())
+
+
+def _attach_request_cols(
+    rec_df: pd.DataFrame,
+    mapping: Dict[str, int],
+    rgs_dt: str,
+    slot: str,
+    inputs: Dict[str, Any],
+    run_id: str,
+) -> pd.DataFrame:
+    """응답 DF에 요청별 디버그 컬럼 부착 (계산 결과/캐시 hit 공통)"""
+    rec_df["food_id"] = rec_df["Food"].astype(str).map(mapping)
+    rec_df["rgs_dt"] = str(rgs_dt)
+    rec_df["rec_time_slot"] = str(slot).upper()
+    rec_df["per_meal_target"] = float(inputs["per_meal_target"])
+    rec_df["remaining_calories"] = float(inputs["remaining"])
+    rec_df["purpose_db"] = int(inputs["purpose_db"])
+    rec_df["purpose_model"] = int(inputs["purpose_model"])
+    rec_df["reco_run_id"] = run_id
+    return rec_df
+
+
+def _final_foods(rec_df: pd.DataFrame) -> List[Tuple[str, str]]:
+    """추천 DF(점수순) -> [(P/H/E, Food)] (rec_type별 첫 행, food_id 매핑 전)"""
+    uniq: Dict[str, str] = {}
+    for rt, food in zip(rec_df["rec_type"].tolist(), rec_df["Food"].astype(str).tolist()):
+        uniq.setdefault(_to_rec_code(rt), food)
+    return list(uniq.items())
+
+
 def _fallback_logs_from_ctx(ctx_food_all: pd.DataFrame) -> pd.DataFrame:
     """
     phase3 logs.parquet이 없을 때 임시 logs를 만들기 위한 fallback.
@@ -367,6 +609,90 @@ def _ensure_phase1_debug_cols(
 # -----------------------------
 # Main service
 # -----------------------------
+def _map_rec_type_phase3(rt: str) -> str:
+    s = str(rt)
+    if "선호형" in s or s.lower().startswith("pref"):
+        return "pref_cluster"
+    if "건강형" in s or "health" in s.lower():
+        return "healthy_532"
+    if "탐색형" in s or "explore" in s.lower():
+        return "explore_new"
+    return "pref_cluster"
+
+
+def _rerank_phase3(
+    rec_df: pd.DataFrame, phase3_artifacts: Dict[str, Any], phase3_cfg: Optional[Phase3Config] = None,
+) -> pd.DataFrame:
+    """
+    Phase3 rerank: p_stable_cluster attach -> rec_type별 weight로 score_phase3 -> 내림차순 정렬
+    (phase3_cfg: replay 등에서 weight 바꿔볼 때만, 기본은 Phase3Config())
+    """
+    p_stable_df = phase3_artifacts["p_stable_cluster"]
+
+    with reco_trace.span("p_stable"):
+        no_cluster = "cluster_id" not in rec_df.columns or bool(rec_df["cluster_id"].isna().all())
+        if p_stable_df is None or p_stable_df.empty or no_cluster:
+            # 매칭할 cluster가 없음 -> 기존 요청별 계산과 같이 0.5 (라벨도 p_stable 미사용 쪽으로)
+            rec_df["p_stable_cluster"] = 0.5
+            if "phase3_logs_source" in rec_df.columns and "default_p_source" in phase3_artifacts:
+                rec_df["phase3_logs_source"] = phase3_artifacts["default_p_source"]
+        else:
+            rec_df = attach_p_stable_cluster(
+                rec_df, p_stable_df, default_p=0.5, lookup=phase3_artifacts.get("p_stable_lookup"),
+            )
+
+    # score_phase1 컬럼 통일
+    if "score_phase1" in rec_df.columns:
+        s_phase1 = pd.to_numeric(rec_df["score_phase1"], errors="coerce")
+    else:
+        s_phase1 = pd.Series([np.nan] * len(rec_df), index=rec_df.index, dtype="float64")
+    rec_df["score_phase1"] = s_phase1.fillna(-9999.0)
+
+    # rec_type별 phase3 weight map 적용
+    phase3_cfg = phase3_cfg or Phase3Config()
+    with reco_trace.span("phase3_score"):
+        rec_df["rec_type_phase3"] = rec_df["rec_type"].apply(_map_rec_type_phase3)
+        rec_df["score_phase3"] = rec_df.apply(
+            lambda r: combine_score_phase3(
+                base_score=r["score_phase1"],
+                p_stable_cluster=r.get("p_stable_cluster", 0.5),
+                rec_type_phase3=r.get("rec_type_phase3", "pref_cluster"),
+                cfg=phase3_cfg,
+            ),
+            axis=1,
+        )
+        return rec_df.sort_values("score_phase3", ascending=False).reset_index(drop=True)
+
+
+def _with_status(df: Optional[pd.DataFrame], status: str, run_id: str) -> pd.DataFrame:
+    """결과 DF에 실행 상태를 붙인다(df.attrs: reco_status / reco_run_id)"""
+    out = df if df is not None else pd.DataFrame()
+    out.attrs["reco_status"] = status
+    out.attrs["reco_run_id"] = run_id
+    return out
+
+
+def reco_status(df: Optional[pd.DataFrame]) -> str:
+    """recommend_and_commit 결과의 실행 상태 (computed/cached/coalesced/skipped/empty/failed)"""
+    return str(df.attrs.get("reco_status", "")) if df is not None else ""
+
+
+def _finish_trace(tr: Optional[Trace], status: str) -> None:
+    """trace 1건 마감: histogram 누적 + 구조화 로그 1줄 + (주기적으로) worker별 파일 flush"""
+    if tr is None:
+        return
+    record = tr.record(status)
+    RECO_TRACES.observe(record)
+    cfg = AppConfig()
+    if cfg.RECO_TRACE_LOG:
+        print("[RECO][TRACE]", json.dumps(record, ensure_ascii=False), flush=True)
+    if cfg.RECO_TRACE_FLUSH_SEC > 0:
+        try:
+            RECO_TRACES.flush_to(cfg.trace_dir, min_interval_sec=cfg.RECO_TRACE_FLUSH_SEC)
+        except OSError as e:
+            print("[RECO][TRACE_FLUSH_FAIL]", repr(e), flush=True)
+
+
 def recommend_and_commit(
     *,
     cust_id: str,
@@ -383,6 +709,14 @@ def recommend_and_commit(
     (3) Phase2 cluster attach + Phase3 rerank까지 수행하고
     (4) 추천 결과(P/H/E)를 MENU_RECOM_TH에 upsert
     (5) DataFrame 반환
+
+    동시 호출 처리(프로세스 내):
+    - 같은 입력으로 동시에 들어오면 먼저 온 호출만 실행하고 나머지는 그 결과를 공유(coalesced)
+    - 같은 (cust_id, rgs_dt, slot)인데 입력이 다르면 순서대로 실행(버리지 않음)
+    동시 호출 처리(프로세스 간):
+    - slot lock을 잡은 호출만 MySQL GET_LOCK으로 worker 간 직렬화(MENU_RECO_MYSQL_LOCK, 기본 켬). timeout이면 skipped
+    실행 상태는 reco_status(df) / df.attrs["reco_status"]로 구분.
+    stage별 소요시간은 [RECO][TRACE] 로그 1줄 + RECO_TRACES(histogram)에 기록(MENU_RECO_TRACE).
     """
     run_id = uuid.uuid4().hex
     lock_name = f"reco:{cust_id}:{rgs_dt}:{str(rec_time_slot).upper()}"
@@ -398,67 +732,161 @@ def recommend_and_commit(
         flush=True,
     )
 
+    def _lead() -> pd.DataFrame:
+        t_wait = time.perf_counter()
+        with SLOT_LOCKS.hold(lock_name):
+            reco_trace.add_since("slot_lock_wait", t_wait)
+            return _recommend_and_commit_once(
+                run_id=run_id,
+                lock_name=lock_name,
+                cust_id=cust_id,
+                mood=mood,
+                energy=energy,
+                rgs_dt=rgs_dt,
+                rec_time_slot=rec_time_slot,
+                current_food=current_food,
+                recent_foods=recent_foods,
+            )
+
+    tr = Trace(run_id, cust_id=str(cust_id), rgs_dt=str(rgs_dt), slot=str(rec_time_slot).upper()) \
+        if AppConfig().RECO_TRACE else None
+    flight_key = (lock_name, str(mood), str(energy), current_food, tuple(recent_foods or ()))
+    status = "error"
+    try:
+        with reco_trace.activate(tr):
+            rec_df, shared = RECO_FLIGHTS.do(flight_key, _lead)
+        status = "coalesced" if shared else reco_status(rec_df)
+    finally:
+        _finish_trace(tr, status)
+    if not shared:
+        return rec_df
+
+    print(
+        "[RECO][COALESCED]",
+        "run_id=", run_id,
+        "leader_run_id=", rec_df.attrs.get("reco_run_id"),
+        "leader_status=", reco_status(rec_df),
+        flush=True,
+    )
+    out = rec_df.copy()
+    out.attrs["leader_status"] = reco_status(rec_df)
+    out.attrs["leader_run_id"] = rec_df.attrs.get("reco_run_id")
+    return _with_status(out, "coalesced", run_id)
+
+
+def _recommend_and_commit_once(
+    *,
+    run_id: str,
+    lock_name: str,
+    cust_id: str,
+    mood: str,
+    energy: str,
+    rgs_dt: str,
+    rec_time_slot: str,
+    current_food: Optional[str] = None,
+    recent_foods: Optional[List[str]] = None,
+) -> pd.DataFrame:
     got_lock = False
     try:
-        got_lock = _acquire_mysql_lock(lock_name, timeout_sec=2)
-        if not got_lock:
-            print(
-                "[RECO][SKIP_LOCK_TIMEOUT]",
-                "run_id=", run_id,
-                "lock=", lock_name,
-                flush=True,
-            )
-            return pd.DataFrame()
+        if AppConfig().RECO_MYSQL_LOCK:
+            with reco_trace.span("mysql_lock"):
+                got_lock = _acquire_mysql_lock(lock_name, timeout_sec=2)
+            if not got_lock:
+                print(
+                    "[RECO][SKIP_LOCK_TIMEOUT]",
+                    "run_id=", run_id,
+                    "lock=", lock_name,
+                    flush=True,
+                )
+                return _with_status(pd.DataFrame(), "skipped", run_id)
 
-        phase1_artifacts, phase2_artifacts, logs_df = _load_artifacts_cached()
+        # 요청 동안 같은 버전을 쓰도록 bundle 참조 1개만 잡는다
+        with reco_trace.span("artifacts"):
+            bundle = ARTIFACTS.get()
+        phase1_artifacts, phase2_artifacts, _logs_df, phase3_artifacts = bundle.payload
         phase1_cfg = _map_phase1_cfg(phase1_artifacts)
 
         mood_key = _norm_mood_val(mood)      # pos/neu/neg
         energy_key = _norm_energy_val(energy)  # low/med/hig
 
-        # 1) profile
-        profile = db_repo.get_profile(cust_id)
+        # 1) profile + 당일 섭취 + 최근 7일 macro (1 round-trip)
+        with reco_trace.span("db_snapshot"):
+            snapshot = db_repo.get_user_reco_snapshot(
+                cust_id, rgs_dt, days=7, use_rollup=AppConfig().USE_MACRO_ROLLUP,
+            )
+        profile = snapshot["profile"]
         if not profile:
             raise ValueError(f"CUS_PROFILE_TS not found for cust_id={cust_id}")
 
-        # 2) eaten today + remaining
-        eaten = db_repo.get_day_eaten_sum(cust_id, rgs_dt)
-        recommended = float(profile.get("Recommended_calories") or 0)
-        eaten_kcal = float(eaten.get("sum_kcal") or 0)
-        remaining = max(0.0, recommended - eaten_kcal)
-
-        # 3) per_meal_target
-        rm = _remaining_meals(rec_time_slot)
-        per_meal_target = remaining / float(rm) if rm > 0 else remaining
-
-        # 4) purpose mapping (DB 1/2/3 -> model 0/1/2)
-        purpose_db = int(profile.get("purpose") or 2)  # default Main(2)
-        purpose_model = max(0, min(2, purpose_db - 1))
-
-        # 5) user_vec
-        recent_macro = db_repo.get_recent_macro_sum(cust_id, days=7)
-        user_vec = _build_user_vec_from_db(
-            profile=profile, recent_macro=recent_macro, phase1_cfg=phase1_cfg
+        # 2)~5) remaining / per_meal_target / purpose / user_vec
+        inputs = _reco_inputs(snapshot, rec_time_slot, phase1_cfg)
+        eaten_kcal = inputs["eaten_kcal"]
+        per_meal_target = inputs["per_meal_target"]
+        purpose_model = inputs["purpose_model"]
+        recent_macro = snapshot["recent"]
+        user_vec = inputs["user_vec"]
+
+        # 5-1) 결과 캐시: 입력 상태가 같으면 Phase1~3 생략
+        slot = str(rec_time_slot).upper()
+        cache_key = reco_state_key(
+            cust_id=str(cust_id),
+            rgs_dt=str(rgs_dt),
+            rec_time_slot=slot,
+            mood=mood_key,
+            energy=energy_key,
+            eaten_kcal_bucket=kcal_bucket(eaten_kcal, AppConfig().RESULT_CACHE_KCAL_BUCKET),
+            recent_foods=recent_foods,
+            current_food=current_food,
+            recent_macro=recent_macro,
+            profile_ver=profile_version(profile),
+            artifact_version=bundle.version,
         )
+        with reco_trace.span("result_cache"):
+            cached = RESULT_CACHE.get(cache_key)
+        if cached is not None:
+            # 저장은 항상 다시: 다른 워커가 같은 slot에 다른 결과를 썼을 수 있음 (upsert라 멱등)
+            if cached.final_rows:
+                with reco_trace.span("upsert"):
+                    db_repo.upsert_menu_recom_rows(
+                        cust_id=str(cust_id),
+                        rgs_dt=str(rgs_dt),
+                        rec_time_slot=slot,
+                        rows=list(cached.final_rows),
+                    )
+                reco_trace.set_rows("upsert", len(cached.final_rows))
+            print(
+                "[RECO][CACHE_HIT]",
+                "run_id=", run_id,
+                "cached_run_id=", cached.run_id,
+                "saved=", bool(cached.final_rows),
+                flush=True,
+            )
+            # 캐시 키는 eaten kcal을 bucket으로 묶음 -> 요청별 값(remaining 등)은 이번 inputs로 다시 채움
+            rec_df = cached.rec_df.copy()
+            mapping = db_repo.map_food_names_to_ids(rec_df["Food"].astype(str).tolist())
+            rec_df = _attach_request_cols(rec_df, mapping, rgs_dt, slot, inputs, run_id)
+            return _with_status(rec_df, "cached", run_id)
 
         # 6) Phase1 추천 (override)
         exclude = [current_food] if current_food else None
-        rec_df = recommend_phase1_2plus1(
-            artifacts=phase1_artifacts,
-            product_name=str(cust_id),   # override 모드에서는 lookup 안 함
-            mood=mood_key,
-            energy=energy_key,
-            cfg=phase1_cfg,
-            exclude_foods=exclude,
-            history_foods=recent_foods,
-            user_vec_override=user_vec,
-            per_meal_target_override=per_meal_target,
-            purpose_override=purpose_model,
-        )
+        with reco_trace.span("phase1"):
+            rec_df = recommend_phase1_2plus1(
+                artifacts=phase1_artifacts,
+                product_name=str(cust_id),   # override 모드에서는 lookup 안 함
+                mood=mood_key,
+                energy=energy_key,
+                cfg=phase1_cfg,
+                exclude_foods=exclude,
+                history_foods=recent_foods,
+                user_vec_override=user_vec,
+                per_meal_target_override=per_meal_target,
+                purpose_override=purpose_model,
+            )
 
         if rec_df is None or rec_df.empty:
             print("[RECO][EMPTY_PHASE1]", "run_id=", run_id, flush=True)
-            return rec_df if rec_df is not None else pd.DataFrame()
+            return _with_status(rec_df, "empty", run_id)
+        reco_trace.set_rows("phase1", len(rec_df))
 
         # Phase1 결과 컬럼 보강
         rec_df = _ensure_phase1_debug_cols(rec_df, mood_req=mood_key, energy_req=energy_key)
@@ -466,77 +894,26 @@ def recommend_and_commit(
         # 7) Phase2 attach cluster info
         clustered = phase2_artifacts.get("clustered")
         cluster_meta = phase2_artifacts.get("cluster_meta")
-        rec_df = attach_cluster_info(rec_df, clustered=clustered, cluster_meta=cluster_meta)
-
-        # 8) Phase3 rerank
-        if logs_df is None or logs_df.empty:
-            logs_df = _fallback_logs_from_ctx(phase1_artifacts["ctx_food_all"])
-            rec_df["phase3_logs_source"] = "FALLBACK_FROM_CTX"
-        else:
-            rec_df["phase3_logs_source"] = "ARTIFACT_LOGS"
-
-        stable_food_ctx = build_stable_food_ctx_from_logs(logs_df)
-
-        if clustered is None or clustered.empty:
-            rec_df["p_stable_cluster"] = 0.5
-        else:
-            clustered_rows = clustered[["Mood", "Energy", "Food", "cluster_id"]].drop_duplicates()
-            phase3_cfg = Phase3Config()
-            p_stable_df = compute_p_stable_cluster(
-                stable_food_ctx, clustered_rows, alpha=phase3_cfg.alpha
+        with reco_trace.span("phase2_attach"):
+            rec_df = attach_cluster_info(
+                rec_df, clustered=clustered, cluster_meta=cluster_meta,
+                centroid_index=phase2_artifacts.get("centroid_index"),
+                lookup=phase2_artifacts.get("cluster_lookup"),
             )
-            rec_df = attach_p_stable_cluster(rec_df, p_stable_df, default_p=0.5)
 
-        # score_phase1 컬럼 통일
-        if "score_phase1" in rec_df.columns:
-            s_phase1 = pd.to_numeric(rec_df["score_phase1"], errors="coerce")
-        else:
-            s_phase1 = pd.Series([np.nan] * len(rec_df), index=rec_df.index, dtype="float64")
-        rec_df["score_phase1"] = s_phase1.fillna(-9999.0)
-
-        # rec_type별 phase3 weight map 적용
-        def _map_rt(rt: str) -> str:
-            s = str(rt)
-            if "선호형" in s or s.lower().startswith("pref"):
-                return "pref_cluster"
-            if "건강형" in s or "health" in s.lower():
-                return "healthy_532"
-            if "탐색형" in s or "explore" in s.lower():
-                return "explore_new"
-            return "pref_cluster"
-
-        phase3_cfg = Phase3Config()
-        rec_df["rec_type_phase3"] = rec_df["rec_type"].apply(_map_rt)
-        rec_df["score_phase3"] = rec_df.apply(
-            lambda r: combine_score_phase3(
-                base_score=r["score_phase1"],
-                p_stable_cluster=r.get("p_stable_cluster", 0.5),
-                rec_type_phase3=r.get("rec_type_phase3", "pref_cluster"),
-                cfg=phase3_cfg,
-            ),
-            axis=1,
-        )
-        rec_df = rec_df.sort_values("score_phase3", ascending=False).reset_index(drop=True)
+        # 8) Phase3 rerank (p_stable 테이블은 artifacts 로드 시 미리 계산됨)
+        rec_df["phase3_logs_source"] = phase3_artifacts["logs_source"]
+        rec_df["artifact_version"] = bundle.version
+        rec_df = _rerank_phase3(rec_df, phase3_artifacts)
 
         # 9) Food -> food_id 매핑
         foods = rec_df["Food"].astype(str).tolist() if "Food" in rec_df.columns else []
-        mapping = db_repo.map_food_names_to_ids(foods)
+        with reco_trace.span("map_food_ids"):
+            mapping = db_repo.map_food_names_to_ids(foods)
+        reco_trace.set_rows("map_food_ids", len(mapping))
 
         # 10) MENU_RECOM_TH upsert (P/H/E)
-        rows_to_save: List[Tuple[str, str]] = []
-        for _, r in rec_df.iterrows():
-            food_name = str(r.get("Food"))
-            food_id = mapping.get(food_name)
-            if not food_id:
-                continue
-            rows_to_save.append((_to_rec_code(r.get("rec_type")), str(food_id)))
-
-        uniq: Dict[str, str] = {}
-        for rt, fid in rows_to_save:
-            if rt not in uniq:
-                uniq[rt] = fid
-
-        final_rows = [(k, v) for k, v in uniq.items()]
+        final_rows = _final_rows(rec_df, mapping)
 
         # ✅ 저장 직전 로그(의미 있는 BEFORE_SAVE)
         print(
@@ -548,12 +925,14 @@ def recommend_and_commit(
         )
 
         if final_rows:
-            db_repo.upsert_menu_recom_rows(
-                cust_id=str(cust_id),
-                rgs_dt=str(rgs_dt),
-                rec_time_slot=str(rec_time_slot).upper(),
-                rows=final_rows,
-            )
+            with reco_trace.span("upsert"):
+                db_repo.upsert_menu_recom_rows(
+                    cust_id=str(cust_id),
+                    rgs_dt=str(rgs_dt),
+                    rec_time_slot=str(rec_time_slot).upper(),
+                    rows=final_rows,
+                )
+            reco_trace.set_rows("upsert", len(final_rows))
 
         print(
             "[RECO][SUCCESS]",
@@ -563,16 +942,11 @@ def recommend_and_commit(
         )
 
         # 11) 응답 DF 디버그 컬럼 부착
-        rec_df["food_id"] = rec_df["Food"].astype(str).map(mapping)
-        rec_df["rgs_dt"] = str(rgs_dt)
-        rec_df["rec_time_slot"] = str(rec_time_slot).upper()
-        rec_df["per_meal_target"] = float(per_meal_target)
-        rec_df["remaining_calories"] = float(remaining)
-        rec_df["purpose_db"] = int(purpose_db)
-        rec_df["purpose_model"] = int(purpose_model)
-        rec_df["reco_run_id"] = run_id
+        with reco_trace.span("finalize"):
+            rec_df = _attach_request_cols(rec_df, mapping, rgs_dt, slot, inputs, run_id)
 
-        return rec_df
+            RESULT_CACHE.put(cache_key, rec_df, final_rows, run_id)
+        return _with_status(rec_df, "computed", run_id)
 
     except Exception as e:
         print(
@@ -585,8 +959,106 @@ def recommend_and_commit(
             flush=True,
         )
         traceback.print_exc()
-        return pd.DataFrame()
+        return _with_status(pd.DataFrame(), "failed", run_id)
 
     finally:
         if got_lock:
-            _release_mysql_lock(lock_name)
\ No newline at end of file
+            with reco_trace.span("mysql_lock"):
+                _release_mysql_lock(lock_name)
+
+# -----------------------------
+# Batch (야간 사전 생성 등): 저장은 호출 측이 모아서 bulk upsert
+# -----------------------------
+def recommend_batch(
+    items: List[Dict[str, Any]],
+    chunk_size: int = 64,
+    *,
+    payload: Optional[Tuple[Any, ...]] = None,
+    phase1_cfg: Optional[Phase1Config] = None,
+    phase3_cfg: Optional[Phase3Config] = None,
+    map_ids: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    여러 사용자의 추천을 한 번에 계산 (DB 쓰기 없음).
+    items: [{cust_id, mood, energy, rgs_dt, rec_time_slot, recent_foods, snapshot}]
+      - snapshot: get_user_reco_snapshot 형태 {"profile","day","recent"}
+    - Phase1: recommend_phase1_batch (context별 users x foods 행렬, chunk_size명씩)
+    - Phase2/3: 전체 사용자 행을 합쳐 attach/rerank 1번, food_id 매핑도 1번
+    - payload / phase1_cfg / phase3_cfg: 오프라인 replay용 (기본은 서비스 artifacts와 그 config)
+    - map_ids=False: food_id 매핑(DB) 생략, foods만 채움
+    반환(items 순서): [{cust_id, rgs_dt, rec_time_slot, rows: [(P/H/E, food_id)], foods: [(P/H/E, Food)], status}]
+      status: computed / empty / failed(profile 없음 등)
+    """
+    if payload is None:
+        payload = ARTIFACTS.get().payload
+    phase1_artifacts, phase2_artifacts, _logs_df, phase3_artifacts = payload
+    phase1_cfg = phase1_cfg or _map_phase1_cfg(phase1_artifacts)
+
+    results: List[Dict[str, Any]] = [
+        {
+            "cust_id": str(it["cust_id"]),
+            "rgs_dt": str(it["rgs_dt"]),
+            "rec_time_slot": str(it["rec_time_slot"]).upper(),
+            "rows": [],
+            "foods": [],
+            "status": "failed",
+        }
+        for it in items
+    ]
+
+    ok_idx: List[int] = []
+    contexts: List[Tuple[str, str]] = []
+    vecs, targets, purposes, hist = [], [], [], []
+    for i, it in enumerate(items):
+        snapshot = it.get("snapshot") or {}
+        if not snapshot.get("profile"):
+            continue
+        inputs = _reco_inputs(snapshot, it["rec_time_slot"], phase1_cfg)
+        ok_idx.append(i)
+        contexts.append((_norm_mood_val(it["mood"]), _norm_energy_val(it["energy"])))
+        vecs.append(inputs["user_vec"])
+        targets.append(inputs["per_meal_target"])
+        purposes.append(inputs["purpose_model"])
+        hist.append(it.get("recent_foods") or None)
+    if not ok_idx:
+        return results
+
+    # 6) Phase1 (batch)
+    p1 = recommend_phase1_batch(
+        phase1_artifacts, contexts, phase1_cfg, vecs, targets, purposes,
+        history_foods=hist, chunk_size=chunk_size,
+    )
+    frames = []
+    for i, (m, e), df in zip(ok_idx, contexts, p1):
+        if df is None or df.empty:
+            results[i]["status"] = "empty"
+            continue
+        df = _ensure_phase1_debug_cols(df, mood_req=m, energy_req=e)
+        df["_item"] = i
+        frames.append(df)
+    if not frames:
+        return results
+
+    # 7) Phase2 + 8) Phase3 : 전체 행 한 번에 (행 단위 계산이라 사용자별 결과와 같음)
+    rec_all = pd.concat(frames, ignore_index=True)
+    rec_all = attach_cluster_info(
+        rec_all,
+        clustered=phase2_artifacts.get("clustered"),
+        cluster_meta=phase2_artifacts.get("cluster_meta"),
+        centroid_index=phase2_artifacts.get("centroid_index"),
+        lookup=phase2_artifacts.get("cluster_lookup"),
+    )
+    rec_all = _rerank_phase3(rec_all, phase3_artifacts, phase3_cfg)
+
+    # 9) Food -> food_id (전체 1번)
+    mapping = db_repo.map_food_names_to_ids(rec_all["Food"].astype(str).unique().tolist()) if map_ids else None
+
+    for i, g in rec_all.groupby("_item", sort=False):
+        res = results[int(i)]
+        res["foods"] = _final_foods(g)
+        if mapping is None:
+            res["status"] = "computed" if res["foods"] else "empty"
+            continue
+        res["rows"] = _final_rows(g, mapping)
+        res["status"] = "computed" if res["rows"] else "empty"
+    return results
@@ -0,0 +1,97 @@
+# ml/menu_reco/single_flight.py
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    같은 key로 동시에 들어온 호출을 1번만 실행하고 결과를 공유한다(프로세스 내).
+    - 처음 들어온 호출(leader)만 fn을 실행
+    - 실행 중에 들어온 같은 key 호출은 leader 결과를 기다렸다가 그대로 받음(shared=True)
+    - 끝난 뒤 들어온 호출은 새로 실행(결과 캐시가 아님)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        반환: (결과, shared)
+        leader가 예외로 끝나면 기다리던 호출도 같은 예외를 받는다.
+        timeout 안에 leader가 안 끝나면 TimeoutError.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"single-flight wait timed out: {key!r}")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class KeyedLocks:
+    """
+    key별 in-process lock (같은 key는 직렬화, 다른 key는 병렬).
+    사용 중인 key만 들고 있고, 마지막 사용자가 나가면 정리된다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks: Dict[Hashable, Tuple[threading.Lock, int]] = {}
+
+    @contextmanager
+    def hold(self, key: Hashable) -> Iterator[None]:
+        with self._lock:
+            lk, n = self._locks.get(key, (None, 0))
+            if lk is None:
+                lk = threading.Lock()
+            self._locks[key] = (lk, n + 1)
+        lk.acquire()
+        try:
+            yield
+        finally:
+            lk.release()
+            with self._lock:
+                lk2, n = self._locks[key]
+                if n <= 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lk2, n - 1)
@@ -0,0 +1,233 @@
+# ml/menu_reco/trace.py
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# 구간 상한(ms). 마지막 bucket은 그 이상 전부
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+TRACE_FILE_PREFIX = "reco_trace."
+
+
+class Trace:
+    """
+    recommend_and_commit 1회의 stage별 소요시간(ms)/행 수.
+    같은 stage가 여러 번 불리면 시간은 합산, 행 수는 마지막 값.
+    """
+
+    __slots__ = ("run_id", "attrs", "stages", "t0")
+
+    def __init__(self, run_id: str, **attrs: Any):
+        self.run_id = run_id
+        self.attrs = attrs
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.t0 = time.perf_counter()
+
+    def add(self, stage: str, ms: float, rows: Optional[int] = None) -> None:
+        st = self.stages.setdefault(stage, {"ms": 0.0})
+        st["ms"] += float(ms)
+        if rows is not None:
+            st["rows"] = int(rows)
+
+    def set_rows(self, stage: str, rows: int) -> None:
+        self.stages.setdefault(stage, {"ms": 0.0})["rows"] = int(rows)
+
+    def record(self, status: str) -> Dict[str, Any]:
+        return {
+            "event": "reco_trace",
+            "run_id": self.run_id,
+            **self.attrs,
+            "status": status,
+            "total_ms": round((time.perf_counter() - self.t0) * 1000.0, 3),
+            "stages": {k: {**v, "ms": round(v["ms"], 3)} for k, v in self.stages.items()},
+        }
+
+
+_CURRENT: ContextVar[Optional[Trace]] = ContextVar("menu_reco_trace", default=None)
+
+
+def current() -> Optional[Trace]:
+    return _CURRENT.get()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[Optional[Trace]]:
+    """현재 trace가 있으면 블록 소요시간을 stage에 더한다(없으면 no-op)"""
+    tr = _CURRENT.get()
+    if tr is None:
+        yield None
+        return
+    t0 = time.perf_counter()
+    try:
+        yield tr
+    finally:
+        tr.add(stage, (time.perf_counter() - t0) * 1000.0)
+
+
+def add_since(stage: str, t0: float, rows: Optional[int] = None) -> None:
+    """t0(perf_counter)부터 지금까지를 stage에 기록 (with 블록으로 감싸기 어려운 구간용)"""
+    tr = _CURRENT.get()
+    if tr is not None:
+        tr.add(stage, (time.perf_counter() - t0) * 1000.0, rows)
+
+
+def set_rows(stage: str, rows: int) -> None:
+    tr = _CURRENT.get()
+    if tr is not None:
+        tr.set_rows(stage, rows)
+
+
+@contextmanager
+def activate(tr: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    token = _CURRENT.set(tr)
+    try:
+        yield tr
+    finally:
+        _CURRENT.reset(token)
+
+
+def _bucket_index(ms: float) -> int:
+    for i, hi in enumerate(BUCKETS_MS):
+        if ms <= hi:
+            return i
+    return len(BUCKETS_MS)
+
+
+def _quantile(buckets: List[int], count: int, q: float, max_ms: float) -> float:
+    """bucket 상한 기준 근사 분위수 (마지막 bucket은 max)"""
+    if count <= 0:
+        return 0.0
+    need, acc = q * count, 0
+    for i, n in enumerate(buckets):
+        acc += n
+        if acc >= need:
+            return min(float(BUCKETS_MS[i]), max_ms) if i < len(BUCKETS_MS) else max_ms
+    return max_ms
+
+
+class StageHistogram:
+    """
+    trace 기록을 stage별 고정 bucket histogram으로 누적(프로세스 내, thread-safe).
+    snapshot()은 bucket 그대로 들고 있어서 worker별 파일을 merge()로 합칠 수 있다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._since = time.time()
+            self._calls = 0
+            self._status: Dict[str, int] = {}
+            self._stages: Dict[str, Dict[str, Any]] = {}
+            self._flushed_at = 0.0
+
+    def _observe(self, stage: str, ms: float, rows: Optional[int]) -> None:
+        st = self._stages.get(stage)
+        if st is None:
+            st = self._stages[stage] = {
+                "count": 0, "sum_ms": 0.0, "max_ms": 0.0, "rows_sum": 0, "buckets": [0] * (len(BUCKETS_MS) + 1),
+            }
+        st["count"] += 1
+        st["sum_ms"] += ms
+        st["max_ms"] = max(st["max_ms"], ms)
+        st["rows_sum"] += int(rows or 0)
+        st["buckets"][_bucket_index(ms)] += 1
+
+    def observe(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._calls += 1
+            status = str(record.get("status") or "")
+            self._status[status] = self._status.get(status, 0) + 1
+            for stage, v in (record.get("stages") or {}).items():
+                self._observe(stage, float(v.get("ms") or 0.0), v.get("rows"))
+            self._observe("total", float(record.get("total_ms") or 0.0), None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "since": self._since,
+                "updated_at": time.time(),
+                "calls": self._calls,
+                "status": dict(self._status),
+                "stages": {k: {**v, "buckets": list(v["buckets"])} for k, v in self._stages.items()},
+            }
+
+    def flush_to(self, trace_dir: Path, min_interval_sec: float = 0.0) -> Optional[Path]:
+        """snapshot을 trace_dir/reco_trace.<pid>.json으로 (min_interval_sec 이내 재호출이면 생략)"""
+        now = time.time()
+        if min_interval_sec and now - self._flushed_at < min_interval_sec:
+            return None
+        self._flushed_at = now
+        trace_dir = Path(trace_dir)
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        path = trace_dir / f"{TRACE_FILE_PREFIX}{os.getpid()}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+
+def merge(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """여러 worker snapshot 합치기 (bucket/count/sum 합, max는 최대)"""
+    out: Dict[str, Any] = {"workers": 0, "calls": 0, "status": {}, "stages": {}}
+    for snap in snapshots:
+        out["workers"] += 1
+        out["calls"] += int(snap.get("calls") or 0)
+        for k, n in (snap.get("status") or {}).items():
+            out["status"][k] = out["status"].get(k, 0) + int(n)
+        for stage, v in (snap.get("stages") or {}).items():
+            st = out["stages"].setdefault(
+                stage, {"count": 0, "sum_ms": 0.0, "max_ms": 0.0, "rows_sum": 0, "buckets": [0] * (len(BUCKETS_MS) + 1)}
+            )
+            st["count"] += int(v["count"])
+            st["sum_ms"] += float(v["sum_ms"])
+            st["max_ms"] = max(st["max_ms"], float(v["max_ms"]))
+            st["rows_sum"] += int(v.get("rows_sum") or 0)
+            st["buckets"] = [a + int(b) for a, b in zip(st["buckets"], v["buckets"])]
+    return out
+
+
+def summarize(snap: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """stage별 count/mean/p50/p95/p99/max (+ 호출당 평균 행 수), 평균 시간 큰 순"""
+    rows = []
+    for stage, v in (snap.get("stages") or {}).items():
+        n = int(v["count"])
+        rows.append({
+            "stage": stage,
+            "count": n,
+            "mean_ms": round(v["sum_ms"] / n, 3) if n else 0.0,
+            "p50_ms": _quantile(v["buckets"], n, 0.50, v["max_ms"]),
+            "p95_ms": _quantile(v["buckets"], n, 0.95, v["max_ms"]),
+            "p99_ms": _quantile(v["buckets"], n, 0.99, v["max_ms"]),
+            "max_ms": round(v["max_ms"], 3),
+            "rows_mean": round(v.get("rows_sum", 0) / n, 1) if n else 0.0,
+        })
+    return sorted(rows, key=lambda r: (r["stage"] != "total", -r["mean_ms"]))
+
+
+def load_trace_files(trace_dir: Path, max_age_sec: float = 0.0) -> List[Dict[str, Any]]:
+    """trace_dir의 worker별 snapshot 파일 (max_age_sec보다 오래 갱신 안 된 파일은 제외, 0이면 전부)"""
+    out = []
+    now = time.time()
+    for p in sorted(Path(trace_dir).glob(f"{TRACE_FILE_PREFIX}*.json")):
+        try:
+            snap = json.loads(p.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if max_age_sec and now - float(snap.get("updated_at") or 0) > max_age_sec:
+            continue
+        out.append(snap)
+    return out
+
+
+# 프로세스당 1개
+RECO_TRACES = StageHistogram()
@@ -1,3 +1,1107 @@
-from django.test import TestCase
+import contextlib
+import copy
+from datetime import date, timedelta
+import io
+import sqlite3
+import tempfile
+from pathlib import Path
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from conf.db_batch import bulk_insert
+from settings.services.badges import repo as badge_repo
+from ml.lstm import batch as lstm_batch
+from ml.lstm import predictor as lstm_predictor
+from ml.lstm.prediction_service import risk_scores_from_probs
+from ml.menu_reco.common.config import Phase1Config, Phase2Config, Phase3Config
+from ml.menu_reco.common.ssot import (
+    compute_calorie_penalty,
+    compute_purpose_delta_penalty,
+    calorie_penalty_batch,
+    purpose_delta_penalty_batch,
+    calorie_penalty_matrix,
+    purpose_delta_penalty_matrix,
+    l1_distance_batch,
+    l1_distance_matrix,
+    topk_unique_positions,
+    diversity_unique_food,
+)
+from ml.menu_reco.domain.phase1.rule_based import (
+    recommend_phase1_2plus1,
+    recommend_phase1_batch,
+    build_candidate_index,
+    precompute_guardrails,
+    build_food_catalogs,
+    ensure_food_vocab,
+    build_food_stats,
+    build_ctx_food_all,
+    split_bad_foods,
+    build_unobserved_food_pool,
+)
+from ml.menu_reco.bench.pipeline import (
+    bench_service,
+    build_bench_payload,
+    compare_to_baseline,
+    run_pipeline_benchmark,
+)
+from ml.menu_reco.bench.repo import InMemoryRepo
+from ml.menu_reco.bench.synthetic import make_synthetic_artifacts
+from ml.menu_reco.common.io import compile_artifacts_to_arrow, save_json, save_parquet
+from ml.menu_reco.bench import replay
+from ml.menu_reco import db_repo, pregen, service
+from ml.menu_reco import trace as reco_trace
+from ml.menu_reco.food_dict import FoodNameDict
+from ml.menu_reco import registry as reco_registry
+from ml.menu_reco.single_flight import KeyedLocks, SingleFlight
+from ml.menu_reco.result_cache import RecoResultCache, kcal_bucket, reco_state_key
+from ml.menu_reco.domain.phase2.clustering import (
+    fit_phase2_clustering,
+    build_centroid_index,
+    assign_nearest_centroid,
+    attach_cluster_info,
+    build_cluster_lookup,
+)
+from ml.menu_reco.domain.phase3.reranker import (
+    attach_p_stable_cluster,
+    build_p_stable_lookup,
+    build_stable_food_ctx_from_logs,
+    compute_p_stable_cluster,
+)
+from ml.menu_reco.domain.phase1.spatial import build_catalog_grids
+from ml.menu_reco.domain.phase1.incremental import (
+    seed_state_from_artifacts,
+    add_new_foods,
+    apply_log_delta,
+    assemble_phase1_frames,
+)
+
+
+def _synthetic_phase1_artifacts(n_foods: int = 200, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    rows = []
+    for m in ("pos", "neu", "neg"):
+        for e in ("low", "med", "hig"):
+            for i in rng.choice(n_foods, size=n_foods // 2, replace=False):
+                rows.append({"Mood": m, "Energy": e, "Food": f"food_{i}", "mean_y_ctx": rng.random()})
+    ctx = pd.DataFrame(rows)
+    macro = rng.dirichlet([1, 1, 1], size=n_foods)
+    stats = pd.DataFrame({
+        "Food": [f"food_{i}" for i in range(n_foods)],
+        "Calories": rng.uniform(50, 1200, size=n_foods).round(0),
+        "food_prot_g": rng.uniform(0, 60, size=n_foods),
+        "emotion_score": rng.random(n_foods),
+        "macro_ratio_c": macro[:, 0],
+        "macro_ratio_p": macro[:, 1],
+        "macro_ratio_f": macro[:, 2],
+    })
+    ctx = ctx.merge(stats, on="Food", how="left")
+    unobs = stats.assign(Food=[f"new_{i}" for i in range(n_foods)])[
+        ["Food", "Calories", "macro_ratio_c", "macro_ratio_p", "macro_ratio_f"]
+    ]
+    return {
+        "user_pref": pd.DataFrame(columns=["Product_Name"]),
+        "ctx_food_all": ctx,
+        "unobserved_pool": unobs,
+        "bad_foods_set": {f"food_{i}" for i in range(0, n_foods, 13)},
+    }
+
+
+class PenaltyBatchEquivalenceTest(SimpleTestCase):
+    """
+    ssot 배열 버전 penalty가 scalar 버전과 같은 값을 내는지 확인
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.cals = np.concatenate([
+            rng.uniform(0, 2000, size=500),
+            np.array([0.0, 480.0, 600.0, 720.0, 1080.0, np.nan]),
+        ])
+        self.targets = [600.0, 333.3, 0.0, -10.0, float("nan")]
+
+    def test_calorie_penalty_batch_matches_scalar(self):
+        for t in self.targets:
+            for clip in (0.8, 0.1, 5.0):
+                got = calorie_penalty_batch(self.cals, t, 0.6, clip)
+                want = np.array([compute_calorie_penalty(c, t, 0.6, clip) for c in self.cals])
+                np.testing.assert_array_equal(got, want)
+
+    def test_purpose_delta_penalty_batch_matches_scalar(self):
+        for t in self.targets:
+            for purpose in (0, 1, 2):
+                got = purpose_delta_penalty_batch(self.cals, t, purpose, 0.2, 0.5)
+                want = np.array([compute_purpose_delta_penalty(c, t, purpose, 0.2, 0.5) for c in self.cals])
+                np.testing.assert_array_equal(got, want)
+
+    def test_penalty_matrix_rows_match_batch(self):
+        targets = np.array(self.targets * 3)
+        purposes = np.repeat([0, 1, 2], len(self.targets))
+        cal_m = calorie_penalty_matrix(self.cals, targets, 0.6, 0.8)
+        pur_m = purpose_delta_penalty_matrix(self.cals, targets, purposes, 0.2, 0.5)
+        for i, (t, p) in enumerate(zip(targets, purposes)):
+            np.testing.assert_array_equal(cal_m[i], calorie_penalty_batch(self.cals, t, 0.6, 0.8))
+            np.testing.assert_array_equal(pur_m[i], purpose_delta_penalty_batch(self.cals, t, p, 0.2, 0.5))
+
+    def test_l1_distance_matrix_rows_match_batch(self):
+        rng = np.random.default_rng(7)
+        mat = rng.random((50, 3))
+        mat[3, 1] = np.nan
+        vecs = rng.random((6, 3))
+        vecs[2, 0] = np.nan
+        got = l1_distance_matrix(mat, vecs)
+        self.assertEqual(got.shape, (6, 50))
+        for i, v in enumerate(vecs):
+            np.testing.assert_array_equal(got[i], l1_distance_batch(mat, v))
+
+
+class TopkUniqueTest(SimpleTestCase):
+    """
+    argpartition top-k가 stable sort + diversity_unique_food와 같은 행을 고르는지 확인
+    """
+
+    def test_topk_matches_sort_and_diversity(self):
+        rng = np.random.default_rng(7)
+        for trial in range(60):
+            n = int(rng.integers(1, 400))
+            scores = rng.integers(0, 12, size=n).astype(float)  # 동점 많이
+            scores[rng.random(n) < 0.1] = np.nan
+            foods = rng.integers(0, max(1, n // 3), size=n)
+            allowed = rng.random(n) < 0.8 if trial % 2 else None
+            k = int(rng.integers(1, 6))
+
+            df = pd.DataFrame({"Food": foods.astype(str), "score": scores, "pos": np.arange(n)})
+            if allowed is not None:
+                df = df[allowed]
+            df_sorted = df.sort_values("score", ascending=False, kind="mergesort")
+            want, seen = [], set()
+            for f, pos in zip(df_sorted["Food"], df_sorted["pos"]):
+                if f not in seen and len(want) < k:
+                    seen.add(f)
+                    want.append(pos)
+
+            got = topk_unique_positions(scores, foods, k, allowed=allowed)
+            np.testing.assert_array_equal(got, want)
+            np.testing.assert_array_equal(diversity_unique_food(df_sorted, k=k)["pos"].to_numpy(), want)
+
+
+class Phase1BatchTest(SimpleTestCase):
+    """
+    recommend_phase1_batch 결과가 사용자별 recommend_phase1_2plus1(override)과 같은지 확인
+    """
+
+    def test_batch_matches_single(self):
+        artifacts = _synthetic_phase1_artifacts()
+        cfg = Phase1Config()
+        rng = np.random.default_rng(1)
+
+        contexts = [(m, e) for m in ("pos", "neu", "neg") for e in ("low", "med", "hig")] * 3
+        n = len(contexts)
+        vecs = rng.dirichlet([1, 1, 1], size=n)
+        targets = rng.uniform(100, 900, size=n)
+        targets[::5] = 0.0
+        purposes = rng.integers(0, 3, size=n)
+        excl = [["food_1", "food_2"] if i % 2 else None for i in range(n)]
+        hist = [["food_3", "new_4"] if i % 3 == 0 else None for i in range(n)]
+
+        batch = recommend_phase1_batch(
+            artifacts, contexts, cfg, vecs, targets, purposes,
+            exclude_foods=excl, history_foods=hist, chunk_size=4,
+        )
+        # 공용 Food 사전이 있으면 제외 필터는 int id 경로 -> 결과 동일
+        vocab_art = dict(artifacts)
+        ensure_food_vocab(vocab_art)
+        batch_ids = recommend_phase1_batch(
+            vocab_art, contexts, cfg, vecs, targets, purposes,
+            exclude_foods=excl, history_foods=hist, chunk_size=4,
+        )
+        for i, (m, e) in enumerate(contexts):
+            single = recommend_phase1_2plus1(
+                artifacts, "n/a", m, e, cfg,
+                exclude_foods=excl[i], history_foods=hist[i],
+                user_vec_override=vecs[i],
+                per_meal_target_override=targets[i],
+                purpose_override=int(purposes[i]),
+            )
+            pd.testing.assert_frame_equal(batch[i], single, check_dtype=False)
+            pd.testing.assert_frame_equal(batch_ids[i], single, check_dtype=False)
+
+
+class FoodCatalogPathTest(SimpleTestCase):
+    """
+    FoodCatalog(배열) 경로 결과가 DataFrame 경로와 같은지 확인
+    """
+
+    def test_catalog_matches_dataframe_path(self):
+        cfg = Phase1Config()
+        frame_art = _synthetic_phase1_artifacts(seed=2)
+        precompute_guardrails(frame_art, cfg)
+        frame_art["candidate_index"] = build_candidate_index(frame_art["ctx_food_all"], frame_art["bad_foods_set"])
+        cat_art = dict(frame_art)
+        build_food_catalogs(cat_art)
+        # 작은 풀에도 grid를 만들어 grid(best-first) 경로도 같은 결과인지 확인
+        grid_art = dict(cat_art)
+        build_catalog_grids(grid_art, min_rows=0)
+
+        rng = np.random.default_rng(5)
+        for i, m in enumerate(("pos", "neu", "neg") * 4):
+            e = ("low", "med", "hig")[i % 3]
+            kw = dict(
+                exclude_foods=["food_1", "food_5"] if i % 2 else None,
+                history_foods=["food_7", "new_3"] if i % 3 == 0 else None,
+                user_vec_override=rng.dirichlet([1, 1, 1]),
+                per_meal_target_override=float(rng.choice([0.0, 350.0, 800.0])),
+                purpose_override=i % 3,
+            )
+            want = recommend_phase1_2plus1(frame_art, "n/a", m, e, cfg, **kw)
+            got = recommend_phase1_2plus1(cat_art, "n/a", m, e, cfg, **kw)
+            pd.testing.assert_frame_equal(got, want, check_dtype=False)
+            got = recommend_phase1_2plus1(grid_art, "n/a", m, e, cfg, **kw)
+            pd.testing.assert_frame_equal(got, want, check_dtype=False)
+
+
+class IncrementalPhase1Test(SimpleTestCase):
+    """
+    (이전 로그로 만든 artifacts + 신규 로그 delta) == 전체 로그로 다시 만든 artifacts
+    """
+
+    def _raw(self, seed: int = 11):
+        rng = np.random.default_rng(seed)
+        foods = pd.DataFrame({
+            "Food": [f"food_{i}" for i in range(80)],
+            "Calories": rng.uniform(100, 900, 80).round(0),
+            "Carbohydrates": rng.uniform(0, 90, 80).round(1),
+            "Protein": rng.uniform(0, 50, 80).round(1),
+            "Fat": rng.uniform(0, 40, 80).round(1),
+        })
+
+        def logs(n, food_hi):
+            return pd.DataFrame({
+                "Mood": rng.choice(["pos", "neu", "neg"], n),
+                "Energy": rng.choice(["low", "med", "hig"], n),
+                "Food": [f"food_{i}" for i in rng.integers(0, food_hi, n)],
+                "y_final": rng.integers(0, 2, n),
+            })
+        return foods, logs(400, 50), logs(150, 70)
+
+    def _full(self, foods, logs):
+        fs = build_food_stats(foods, logs)
+        ctx = build_ctx_food_all(logs, fs)
+        return {
+            "food_stats": fs,
+            "ctx_food_all": ctx,
+            "bad_foods": sorted(split_bad_foods(ctx)),
+            "unobserved_pool": build_unobserved_food_pool(foods, logs),
+        }
+
+    def test_delta_matches_full_rebuild(self):
+        foods, old_logs, new_logs = self._raw()
+        # 카탈로그 일부(food_60~)는 신규 FOOD_TB 음식으로 나중에 들어옴
+        old = self._full(foods.iloc[:60], old_logs)
+        want = self._full(foods, pd.concat([old_logs, new_logs], ignore_index=True))
+
+        state = seed_state_from_artifacts(old)
+        new_foods = foods.iloc[60:].rename(columns={
+            "Carbohydrates": "food_carb_g", "Protein": "food_prot_g", "Fat": "food_fat_g",
+        })
+        self.assertEqual(add_new_foods(state, new_foods), 20)
+        self.assertEqual(apply_log_delta(state, new_logs), len(new_logs))
+        got = assemble_phase1_frames(state)
+
+        self.assertEqual(got["bad_foods"], want["bad_foods"])
+        self.assertEqual(sorted(got["unobserved_pool"]["Food"]), sorted(want["unobserved_pool"]["Food"]))
+
+        keys = ["Mood", "Energy", "Food"]
+        g = got["ctx_food_all"].sort_values(keys).reset_index(drop=True)
+        w = want["ctx_food_all"].sort_values(keys).reset_index(drop=True)
+        pd.testing.assert_frame_equal(g[w.columns], w, check_dtype=False)
+
+        g = got["food_stats"].sort_values("Food").reset_index(drop=True)
+        w = want["food_stats"].sort_values("Food").reset_index(drop=True)
+        pd.testing.assert_frame_equal(g[w.columns], w, check_dtype=False)
+
+
+class Phase2OnlineAssignTest(SimpleTestCase):
+    """
+    warm-start 재학습 / nearest-centroid 할당이 fit 결과와 일치하는지 확인
+    """
+
+    def test_warm_start_and_nearest_centroid(self):
+        cfg = Phase2Config()
+        ctx = _synthetic_phase1_artifacts(n_foods=120, seed=4)["ctx_food_all"]
+        clustered, meta, scaler = fit_phase2_clustering(ctx, cfg)
+
+        # 자기 center로 warm-start -> 같은 cluster
+        clustered2, _, scaler2 = fit_phase2_clustering(ctx, cfg, n_jobs=2, prev_cluster_meta=meta)
+        self.assertTrue(scaler2["warm_start"].all())
+        np.testing.assert_array_equal(clustered2["cluster_id"], clustered["cluster_id"])
+
+        index = build_centroid_index(meta, scaler)
+        for (m, e), g in clustered.groupby(["Mood", "Energy"]):
+            np.testing.assert_array_equal(assign_nearest_centroid(g, m, e, index, cfg), g["cluster_id"])
+
+        # clustered에 없는 음식도 cluster_id/label이 붙음
+        rec = pd.DataFrame([{
+            "Food": "new_food", "Mood_req": "pos", "Energy_req": "low", "Calories": 300.0,
+            "macro_ratio_c": 0.5, "macro_ratio_p": 0.3, "macro_ratio_f": 0.2,
+        }])
+        out = attach_cluster_info(rec, clustered, meta, centroid_index=index)
+        self.assertFalse(out["cluster_id"].isna().any())
+        self.assertFalse(out["cluster_label"].isna().any())
+
+        # hash index 조회 == merge 결과 (clustered에 있는 음식 + 신규 음식)
+        known = clustered.drop_duplicates(["Mood", "Energy"]).head(3)
+        rec2 = pd.concat([
+            known.rename(columns={"Mood": "Mood_req", "Energy": "Energy_req"}).drop(columns=["cluster_id"]),
+            rec,
+        ], ignore_index=True)
+        lookup = build_cluster_lookup(clustered, meta)
+        self.assertIsNotNone(lookup["food"])
+        merged = attach_cluster_info(rec2, clustered, meta, centroid_index=index)
+        pd.testing.assert_frame_equal(
+            attach_cluster_info(rec2, clustered, meta, centroid_index=index, lookup=lookup), merged,
+        )
+        p_stable = pd.DataFrame({
+            "Mood": meta["Mood"], "Energy": meta["Energy"], "cluster_id": meta["cluster_id"],
+            "p_stable_cluster": np.linspace(0.1, 0.9, len(meta)),
+        })
+        pd.testing.assert_frame_equal(
+            attach_p_stable_cluster(merged, p_stable, lookup=build_p_stable_lookup(p_stable)),
+            attach_p_stable_cluster(merged, p_stable),
+        )
+
+
+class Phase3PStableTableTest(SimpleTestCase):
+    """
+    로드 시 미리 만든 p_stable 테이블 == 기존 요청별 compute_p_stable_cluster, cluster 없으면 0.5
+    """
+
+    def _rec(self, clustered):
+        known = clustered.drop_duplicates(["Mood", "Energy", "cluster_id"]).head(20)
+        rec = known.rename(columns={"Mood": "Mood_used", "Energy": "Energy_used"})
+        rec = rec[["Mood_used", "Energy_used", "cluster_id"]]
+        extra = pd.DataFrame({
+            "Mood_used": [known["Mood"].iloc[0]] * 2, "Energy_used": [known["Energy"].iloc[0]] * 2,
+            "cluster_id": [999.0, np.nan],
+        })
+        return pd.concat([rec, extra], ignore_index=True)
+
+    def test_precomputed_table_matches_per_request(self):
+        phase1, phase2, _logs, phase3 = build_bench_payload(300, seed=2)
+        clustered = phase2["clustered"]
+        rng = np.random.default_rng(5)
+        logs = phase1["ctx_food_all"][["Mood", "Energy", "Food"]].assign(
+            y_final=rng.integers(0, 2, len(phase1["ctx_food_all"])),
+        )
+        rec = self._rec(clustered)
+        with_logs = service._build_phase3_artifacts(Path("/nonexistent"), phase1, phase2, logs)
+        for logs_df, built in ((None, phase3), (logs, with_logs)):
+            old_logs = logs_df if logs_df is not None else service._fallback_logs_from_ctx(phase1["ctx_food_all"])
+            old_table = compute_p_stable_cluster(
+                build_stable_food_ctx_from_logs(old_logs),
+                clustered[["Mood", "Energy", "Food", "cluster_id"]].drop_duplicates(),
+                alpha=Phase3Config().alpha,
+            )
+            want = attach_p_stable_cluster(rec, old_table, default_p=0.5)
+            got = attach_p_stable_cluster(
+                rec, built["p_stable_cluster"], default_p=0.5, lookup=build_p_stable_lookup(built["p_stable_cluster"]),
+            )
+            np.testing.assert_allclose(got["p_stable_cluster"].to_numpy(), want["p_stable_cluster"].to_numpy())
+            self.assertEqual(built["logs_source"], "ARTIFACT_LOGS" if logs_df is not None else "FALLBACK_FROM_CTX")
+        self.assertEqual(got["p_stable_cluster"].iloc[-2:].tolist(), [0.5, 0.5])
+
+    def test_without_clusters_falls_back_to_default_p(self):
+        phase1, phase2, _logs, phase3 = build_bench_payload(300, seed=2)
+        with tempfile.TemporaryDirectory() as d:
+            root = Path(d)
+            save_parquet(phase3["p_stable_cluster"], root / "phase3" / "p_stable_cluster.parquet")
+            no_scaler = dict(phase2, clustered=None, scaler=None, centroid_index={})
+            built = service._build_phase3_artifacts(root, phase1, no_scaler, None)
+            self.assertTrue(built["p_stable_cluster"].empty)
+            self.assertEqual(built["logs_source"], "FALLBACK_FROM_CTX")
+            persisted = service._build_phase3_artifacts(root, phase1, dict(phase2, clustered=None), None)
+            self.assertEqual(persisted["logs_source"], "PERSISTED_P_STABLE")
+
+        # 요청 DF의 cluster_id가 전부 NaN이면 테이블이 있어도 0.5 + p_stable 미사용 라벨
+        rec = self._rec(phase2["clustered"]).assign(
+            cluster_id=np.nan, rec_type="선호형 (Preference)", score_phase1=0.1,
+            phase3_logs_source=persisted["logs_source"],
+        )
+        persisted["p_stable_lookup"] = build_p_stable_lookup(persisted["p_stable_cluster"])
+        out = service._rerank_phase3(rec, persisted)
+        self.assertEqual(set(out["p_stable_cluster"]), {0.5})
+        self.assertEqual(set(out["phase3_logs_source"]), {"FALLBACK_FROM_CTX"})
+
+
+class ArrowArtifactRoundTripTest(SimpleTestCase):
+    """
+    요청 경로는 .arrow(mmap)를 우선 -> parquet 로드와 같은 frame/dtype/추천 결과인지 확인
+    """
+
+    def test_arrow_bundle_matches_parquet_bundle(self):
+        phase1, phase2 = make_synthetic_artifacts(300, seed=2)
+        ctx = phase1["ctx_food_all"]
+        ctx["Mood"] = ctx["Mood"].astype(str).str.upper()                    # 대문자 라벨 (로드 시 정규화)
+        ctx["src_id"] = np.arange(len(ctx), dtype=np.int32)                  # int32 id
+        ctx["note"] = np.array(["a", None, np.nan] * len(ctx), dtype=object)[: len(ctx)]  # NaN 문자열
+
+        with tempfile.TemporaryDirectory() as d:
+            root = Path(d)
+            for name in ("food_stats", "user_pref", "ctx_food_all", "unobserved_pool"):
+                save_parquet(phase1[name], root / "phase1" / f"{name}.parquet")
+            save_json(sorted(phase1["bad_foods_set"]), root / "phase1" / "bad_foods.json")
+            save_json(phase1["config"], root / "phase1" / "config.json")
+            for name in ("clustered", "cluster_meta", "scaler"):
+                save_parquet(phase2[name], root / "phase2" / f"{name}.parquet")
+
+            with mock.patch.object(service, "_artifacts_dir", return_value=root), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                from_parquet = service._load_artifacts_bundle()
+                self.assertTrue(compile_artifacts_to_arrow(root))
+                with mock.patch.object(service, "load_arrow_mmap", wraps=service.load_arrow_mmap) as mmap:
+                    from_arrow = service._load_artifacts_bundle()
+                self.assertGreaterEqual(mmap.call_count, 8)
+
+            frames = [(0, n) for n in ("food_stats", "user_pref", "ctx_food_all", "unobserved_pool")] \
+                + [(1, n) for n in ("clustered", "cluster_meta", "scaler")] + [(3, "p_stable_cluster")]
+            for i, name in frames:
+                pd.testing.assert_frame_equal(from_parquet[i][name], from_arrow[i][name], obj=name)
+            self.assertEqual(
+                sorted(map(str, from_parquet[0]["bad_foods_set"])), sorted(map(str, from_arrow[0]["bad_foods_set"])),
+            )
+            self.assertEqual(set(from_arrow[0]["ctx_food_all"]["Mood"]), set(from_parquet[0]["ctx_food_all"]["Mood"]))
+
+            repo = InMemoryRepo(seed=1)
+            items = [
+                {
+                    "cust_id": str(c), "mood": m, "energy": e, "rgs_dt": "20260105", "rec_time_slot": "L",
+                    "recent_foods": None, "snapshot": repo.get_user_reco_snapshot(str(c), "20260105"),
+                }
+                for c, (m, e) in enumerate([("pos", "hig"), ("neu", "med"), ("neg", "low")] * 2)
+            ]
+            with contextlib.redirect_stdout(io.StringIO()):
+                want = service.recommend_batch(items, payload=from_parquet, map_ids=False)
+                got = service.recommend_batch(items, payload=from_arrow, map_ids=False)
+            self.assertEqual([r["foods"] for r in got], [r["foods"] for r in want])
+
+
+class ArtifactRegistryTest(SimpleTestCase):
+    """
+    artifacts hot-swap: fingerprint 변경 시 교체 / 실패 시 기존 유지 / cold 동시 get은 1회 로드 / ttl=0이면 watcher 없음
+    """
+
+    def _registry(self, fp, loads, fail=None, **kw):
+        def load():
+            loads.append(fp[0])
+            if fail and fail[0] == "load":
+                raise RuntimeError("broken")
+            return (fp[0],)
+
+        def validate(payload):
+            if fail and fail[0] == "validate":
+                raise ValueError("bad payload")
+
+        kw.setdefault("check_ttl_sec", 0)
+        return reco_registry.ArtifactRegistry(load_fn=load, fingerprint_fn=lambda: fp[0], validate_fn=validate, **kw)
+
+    def test_fingerprint_change_swaps_bundle(self):
+        fp, loads = ["a"], []
+        reg = self._registry(fp, loads)
+        with contextlib.redirect_stdout(io.StringIO()):
+            first = reg.get()
+            self.assertIs(reg.reload(), first)  # 그대로면 재로드 없음
+            fp[0] = "b"
+            second = reg.reload()
+        self.assertEqual((first.payload, second.payload), (("a",), ("b",)))
+        self.assertIs(reg.get(), second)
+        self.assertEqual(reg.active_version, reco_registry.version_of("b"))
+        self.assertEqual(loads, ["a", "b"])
+
+    def test_failed_load_or_validate_keeps_previous(self):
+        fp, loads, fail = ["a"], [], [None]
+        reg = self._registry(fp, loads, fail=fail)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            first = reg.get()
+            for mode, err in (("load", "RuntimeError"), ("validate", "ValueError")):
+                fp[0], fail[0] = f"v-{mode}", mode
+                self.assertIs(reg.reload(), first)
+                self.assertIs(reg.get(), first)
+                self.assertTrue(reg.status()["last_error"].startswith(err))
+            fail[0] = None
+            self.assertEqual(reg.reload().payload, ("v-validate",))
+        self.assertIsNone(reg.status()["last_error"])
+
+    def test_concurrent_cold_get_loads_once(self):
+        fp, loads = ["a"], []
+        reg = self._registry(fp, loads)
+        slow_load = reg._load_fn
+        reg._load_fn = lambda: (time.sleep(0.05), slow_load())[1]
+        got = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            threads = [threading.Thread(target=lambda: got.append(reg.get())) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(loads, ["a"])
+        self.assertEqual(len({id(b) for b in got}), 1)
+
+    def test_watcher_only_with_positive_ttl(self):
+        fp, loads = ["a"], []
+        with contextlib.redirect_stdout(io.StringIO()), \
+                mock.patch.object(reco_registry.threading, "Thread") as thread_cls:
+            off = self._registry(fp, loads, check_ttl_sec=0)
+            off.get()
+            off._last_check = 0.0
+            for _ in range(3):
+                off.get()
+            thread_cls.assert_not_called()
+
+            on = self._registry(fp, loads, check_ttl_sec=0.001)
+            on.get()
+            on._last_check = 0.0
+            for _ in range(3):
+                on._last_check = 0.0
+                on.get()
+            self.assertEqual(thread_cls.call_count, 1)  # 첫 watcher가 끝나기 전에는 다시 띄우지 않음
+
+
+class RecoSnapshotSqlTest(SimpleTestCase):
+    """
+    get_user_reco_snapshot (원본 / rollup) == CUS_FOOD_TH brute-force 합 (SQLite, 과거/어제/오늘/내일 시점)
+    """
+
+    def test_snapshot_sums_match_brute_force(self):
+        today = date(2026, 1, 15)
+        con = sqlite3.connect(":memory:")
+        con.execute(
+            "CREATE TABLE CUS_PROFILE_TS (cust_id, purpose, Recommended_calories, Ratio_carb, Ratio_protein, "
+            "Ratio_fat, updated_time)"
+        )
+        con.execute("CREATE TABLE CUS_FOOD_TH (cust_id, rgs_dt, seq, kcal, carb_g, protein_g, fat_g)")
+        con.execute(f"CREATE TABLE {db_repo.MACRO_DAILY_TABLE} (cust_id, rgs_dt, kcal, carb_g, protein_g, fat_g, n_meals)")
+        con.execute(
+            "INSERT INTO CUS_PROFILE_TS VALUES ('1', 2, 2000, NULL, NULL, NULL, '20250101000000'), "
+            "('1', 3, 2100, NULL, NULL, NULL, '20260101000000')"
+        )
+        rng = np.random.default_rng(0)
+        rows = []
+        for d in range(-30, 2):
+            ymd = (today + timedelta(days=d)).strftime("%Y%m%d")
+            for seq in range(3):
+                rows.append(("1", ymd, seq, *(int(v) for v in rng.integers(1, 500, 4))))
+                rows.append(("2", ymd, seq, 1, 1, 1, 1))
+        con.executemany("INSERT INTO CUS_FOOD_TH VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        yday = (today - timedelta(days=1)).strftime("%Y%m%d")
+        con.execute(
+            f"INSERT INTO {db_repo.MACRO_DAILY_TABLE} SELECT cust_id, rgs_dt, SUM(kcal), SUM(carb_g), "
+            "SUM(protein_g), SUM(fat_g), COUNT(*) FROM CUS_FOOD_TH WHERE rgs_dt <= ? GROUP BY cust_id, rgs_dt",
+            [yday],
+        )
+
+        def fetchone(sql, params):
+            cur = con.execute(sql.replace("%s", "?"), params)
+            row = cur.fetchone()
+            return None if row is None else dict(zip([c[0] for c in cur.description], row))
+
+        def brute(ymd, days):
+            start = db_repo._ymd_shift(ymd, -days)
+            day = [r for r in rows if r[0] == "1" and r[1] == ymd]
+            recent = [r for r in rows if r[0] == "1" and start <= r[1] <= ymd]
+            return [float(sum(r[i] for r in day)) for i in range(3, 7)], [float(sum(r[i] for r in recent)) for i in range(3, 7)]
+
+        with mock.patch.object(db_repo, "_fetchone_dict", side_effect=fetchone), \
+                mock.patch.object(db_repo.timezone, "localdate", return_value=today):
+            for off in (-10, -1, 0, 1):
+                ymd = (today + timedelta(days=off)).strftime("%Y%m%d")
+                want_day, want_recent = brute(ymd, 7)
+                for use_rollup in (False, True):
+                    snap = db_repo.get_user_reco_snapshot("1", ymd, 7, use_rollup=use_rollup)
+                    self.assertEqual([snap["day"][k] for k in db_repo.MACRO_KEYS], want_day, (off, use_rollup))
+                    self.assertEqual([snap["recent"][k] for k in db_repo.MACRO_KEYS], want_recent, (off, use_rollup))
+                    self.assertEqual(snap["profile"]["purpose"], 3)
+            self.assertIsNone(db_repo.get_user_reco_snapshot("9", ymd)["profile"])
+
+
+class RecoResultCacheTest(SimpleTestCase):
+    """
+    입력 상태 key / slot별 마지막 저장 key 확인
+    """
+
+    def _key(self, **kw):
+        base = dict(
+            cust_id="1", rgs_dt="20260101", rec_time_slot="l", mood="pos", energy="low",
+            eaten_kcal_bucket=kcal_bucket(320, 50), recent_foods=["a", "b"], current_food=None,
+            recent_macro={"sum_carb_g": 100}, profile_ver="p1", artifact_version="v1",
+        )
+        base.update(kw)
+        return reco_state_key(**base)
+
+    def test_key_and_lru(self):
+        k = self._key()
+        self.assertEqual(k, self._key(recent_foods=["b", "a", "a"], rec_time_slot="L"))
+        self.assertEqual(k, self._key(eaten_kcal_bucket=kcal_bucket(349, 50)))
+        self.assertNotEqual(k, self._key(eaten_kcal_bucket=kcal_bucket(351, 50)))
+        self.assertNotEqual(k, self._key(artifact_version="v2"))
+
+        cache = RecoResultCache(max_size=2)
+        cache.put(k, pd.DataFrame({"Food": ["x"]}), [("P", "1")], "run")
+        self.assertEqual(cache.get(k).final_rows, (("P", "1"),))
+        for m in ("neg", "neu"):
+            cache.put(self._key(mood=m), pd.DataFrame(), [], "run")
+        self.assertIsNone(cache.get(k))
+
+        off = RecoResultCache(max_size=0)
+        off.put(k, pd.DataFrame(), [], "run")
+        self.assertIsNone(off.get(k))
+
+    def test_hit_refreshes_request_columns(self):
+        payload = build_bench_payload(300, seed=2)
+        repo = InMemoryRepo(seed=1)
+        eaten = iter([1010.0, 1040.0])  # 같은 50kcal bucket
+        day = lambda *_a, **_k: {"sum_kcal": next(eaten), "sum_carb_g": 0.0, "sum_protein_g": 0.0, "sum_fat_g": 0.0}
+        with bench_service(payload, repo), mock.patch.object(service, "RESULT_CACHE", RecoResultCache(max_size=8)), \
+                mock.patch.object(repo, "get_day_eaten_sum", side_effect=day), \
+                contextlib.redirect_stdout(io.StringIO()):
+            first = service.recommend_and_commit(cust_id="1", mood="pos", energy="med", rgs_dt="20260105", rec_time_slot="L")
+            second = service.recommend_and_commit(cust_id="1", mood="pos", energy="med", rgs_dt="20260105", rec_time_slot="L")
+        self.assertEqual((first.attrs["reco_status"], second.attrs["reco_status"]), ("computed", "cached"))
+        self.assertEqual(first["Food"].tolist(), second["Food"].tolist())
+        self.assertAlmostEqual(first["remaining_calories"].iloc[0] - second["remaining_calories"].iloc[0], 30.0)
+        self.assertNotEqual(first["reco_run_id"].iloc[0], second["reco_run_id"].iloc[0])
+
+
+class PipelineBenchSmokeTest(SimpleTestCase):
+    """
+    synthetic artifacts + InMemoryRepo로 end-to-end가 돌고, baseline 비교가 regression을 잡는지
+    """
+
+    def test_small_size_and_baseline_compare(self):
+        res = run_pipeline_benchmark(sizes=[300], n_requests=6, alloc_sample=2)
+        stages = res["sizes"]["300"]["stages"]
+        self.assertEqual(set(stages), {"phase1", "phase2_attach", "phase3_rerank", "end_to_end"})
+        self.assertEqual(stages["end_to_end"]["empty_results"], 0)
+
+        slower = copy.deepcopy(res)
+        slower["sizes"]["300"]["stages"]["phase1"]["p50_ms"] += 100.0
+        self.assertEqual(compare_to_baseline(res, res), [])
+        regs = compare_to_baseline(slower, res)
+        self.assertEqual([(r["stage"], r["metric"]) for r in regs], [("phase1", "p50_ms")])
+
+        # 부하 보정: 지금이 calib 기준 3배 느리면 시간도 3배까지는 regression 아님
+        loaded = copy.deepcopy(slower)
+        loaded["sizes"]["300"]["calib_ms"] = res["sizes"]["300"]["calib_ms"] * 3
+        loaded["sizes"]["300"]["stages"]["phase1"]["p50_ms"] = res["sizes"]["300"]["stages"]["phase1"]["p50_ms"] * 3
+        self.assertEqual(compare_to_baseline(loaded, res), [])
+
+        # 다른 host에서 잰 baseline: 시간은 비교하지 않고 할당량만
+        other = copy.deepcopy(res)
+        other["meta"]["host"]["cpu_count"] = -1
+        self.assertEqual(compare_to_baseline(slower, other), [])
+        slower["sizes"]["300"]["stages"]["phase1"]["peak_alloc_kb_mean"] += 1000.0
+        regs = compare_to_baseline(slower, other)
+        self.assertEqual([(r["stage"], r["metric"]) for r in regs], [("phase1", "peak_alloc_kb_mean")])
+
+
+class FoodNameDictTest(SimpleTestCase):
+    """
+    name<->food_id 사전: lazy 로드 / 증분 로드 / negative cache / write-through
+    """
+
+    def setUp(self):
+        self.rows = [(1, "김밥"), (2, "라면"), (3, "김밥")]
+        self.calls = {"after": [], "names": []}
+
+        def fetch_after(fid):
+            self.calls["after"].append(fid)
+            return [r for r in self.rows if r[0] > fid]
+
+        def fetch_by_names(names):
+            self.calls["names"].append(list(names))
+            return [r for r in self.rows if r[1] in names]
+
+        self.d = FoodNameDict(fetch_after=fetch_after, fetch_by_names=fetch_by_names, min_refresh_sec=0)
+
+    def test_lookup_refresh_and_write_through(self):
+        self.assertEqual(self.calls["after"], [])  # lazy
+        self.assertEqual(self.d.ids_for_names(["김밥", " 라면 "]), {"김밥": 1, "라면": 2})
+        self.assertEqual(self.calls["after"], [0])
+
+        # 다른 worker가 추가한 음식 -> 증분 로드로 찾음
+        self.rows.append((4, "떡볶이"))
+        self.assertEqual(self.d.id_of("떡볶이"), 4)
+        self.assertEqual(self.calls["after"][-1], 3)
+
+        # 없는 이름은 DB 1회 후 negative cache
+        self.assertIsNone(self.d.id_of("없는음식"))
+        self.assertIsNone(self.d.id_of("없는음식"))
+        self.assertEqual(self.calls["names"], [["없는음식"]])
+
+        # write-through는 watermark를 올리지 않음 -> 그 사이 id 5도 증분 로드에서 들어옴
+        self.rows.append((5, "순대"))
+        self.d.remember("쫄면", 6)
+        self.rows.append((6, "쫄면"))
+        self.assertEqual(self.d.id_of("쫄면"), 6)
+        self.assertEqual(self.d.names_for_ids([5, "6", None]), {5: "순대", 6: "쫄면"})
+
+        # negative여도 증분 로드는 함 -> 다른 worker가 만들면 TTL 전에 보임
+        self.rows.append((7, "없는음식"))
+        self.assertEqual(self.d.id_of("없는음식"), 7)
+        self.assertEqual(self.d.peek("없는음식"), 7)
+        self.assertIsNone(self.d.peek("미등록"))
+        self.assertEqual(self.calls["names"], [["없는음식"]])
+
+    def test_negative_cache_expires(self):
+        d = FoodNameDict(
+            fetch_after=lambda fid: [], fetch_by_names=lambda names: self.calls["names"].append(names) or [],
+            min_refresh_sec=0, negative_ttl_sec=0.05,
+        )
+        self.assertIsNone(d.id_of("x"))
+        self.assertIsNone(d.id_of("x"))
+        self.assertEqual(len(self.calls["names"]), 1)
+        time.sleep(0.06)
+        self.assertIsNone(d.id_of("x"))
+        self.assertEqual(len(self.calls["names"]), 2)
+
+
+class SingleFlightTest(SimpleTestCase):
+    """
+    같은 key 동시 호출은 1번만 실행 + 결과 공유, 예외도 공유
+    """
+
+    def test_coalesce_and_error(self):
+        sf = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "value"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(sf.do("k", slow)))
+        leader.start()
+        started.wait(5)
+        waiters = [threading.Thread(target=lambda: results.append(sf.do("k", slow))) for _ in range(3)]
+        for t in waiters:
+            t.start()
+        while sf._calls["k"].waiters < 3:
+            time.sleep(0.001)
+        release.set()
+        for t in [leader] + waiters:
+            t.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [("value", False)] + [("value", True)] * 3)
+        self.assertEqual(sf.in_flight(), 0)
+
+        def boom():
+            raise ValueError("x")
+
+        with self.assertRaises(ValueError):
+            sf.do("k", boom)
+        self.assertEqual(sf.do("k", lambda: 1), (1, False))
+
+    def test_keyed_locks_cleanup(self):
+        locks = KeyedLocks()
+        with locks.hold("a"):
+            with locks.hold("b"):
+                self.assertEqual(set(locks._locks), {"a", "b"})
+        self.assertEqual(locks._locks, {})
+
+
+class PregenBatchTest(SimpleTestCase):
+    """
+    야간 사전 생성(recommend_batch + bulk upsert) 결과 == 요청 경로(recommend_and_commit) 결과, 재실행은 skip
+    """
+
+    def test_pregen_matches_single_path(self):
+        payload = build_bench_payload(300, seed=2)
+        ctx = [("pos", "hig"), ("neu", "med"), ("neg", "low"), ("pos", "low")]
+        targets = [
+            {
+                "cust_id": f"{i:04d}", "mood": ctx[i % 4][0], "energy": ctx[i % 4][1],
+                "done_slot": "MLD"[i % 3], "reco_rgs_dt": "20260105", "reco_time_slot": "LDM"[i % 3],
+            }
+            for i in range(12)
+        ]
+
+        single = InMemoryRepo(seed=3)
+        with bench_service(payload, single), contextlib.redirect_stdout(io.StringIO()):
+            for t in targets:
+                service.recommend_and_commit(
+                    cust_id=t["cust_id"], mood=t["mood"], energy=t["energy"],
+                    rgs_dt=t["reco_rgs_dt"], rec_time_slot=t["reco_time_slot"],
+                )
+
+        batch = InMemoryRepo(seed=3)
+        batch.pregen_targets = targets
+        with bench_service(payload, batch), mock.patch.object(pregen, "db_repo", batch):
+            stats = pregen.run_pregen("20260104", chunk_size=5, log=lambda _m: None)
+            again = pregen.run_pregen("20260104", chunk_size=5, log=lambda _m: None)
+
+        def _by_name(repo):
+            names = {str(v): k for k, v in repo.food_ids.items()}
+            return {k: names[v] for k, v in repo.menu_recom.items()}
+
+        self.assertEqual(_by_name(batch), _by_name(single))
+        self.assertEqual((stats["users"], stats["computed"], stats["last"]), (12, 12, "0011"))
+        self.assertEqual((again["skipped"], again["computed"], again["rows"]), (12, 0, 0))
+
+    def test_page_without_targets_does_not_end_run(self):
+        payload = build_bench_payload(300, seed=2)
+        repo = InMemoryRepo(seed=3)
+        repo.pregen_scan_ids = [f"{i:04d}" for i in range(10)]  # 대상이 안 되는 사용자만 있는 페이지 2개
+        repo.pregen_targets = [
+            {"cust_id": c, "mood": "pos", "energy": "low", "done_slot": "M",
+             "reco_rgs_dt": "20260104", "reco_time_slot": "L"}
+            for c in ("0100", "0101")
+        ]
+        with bench_service(payload, repo), mock.patch.object(pregen, "db_repo", repo):
+            stats = pregen.run_pregen("20260104", chunk_size=5, log=lambda _m: None)
+        self.assertEqual((stats["users"], stats["computed"], stats["last"]), (2, 2, "0101"))
+
+
+class ReplayHarnessTest(SimpleTestCase):
+    """
+    replay: 스냅샷 -> 추천 시점(다음 끼니 정답, 시점 이후 기록 미사용) -> config별 hit-rate
+    """
+
+    def test_decision_points_and_replay(self):
+        meals = pd.DataFrame([
+            ("u1", "20260103", 1, "M", 400), ("u1", "20260103", 2, "L", 700), ("u1", "20260103", 3, "D", 600),
+            ("u1", "20260104", 1, "M", 300),
+        ], columns=["cust_id", "rgs_dt", "seq", "time_slot", "kcal"]).assign(carb_g=50, protein_g=20, fat_g=10)
+        meal_foods = pd.DataFrame([
+            ("u1", "20260103", 1, 1, "food_1"), ("u1", "20260103", 2, 1, "food_2"), ("u1", "20260103", 2, 2, "food_3"),
+            ("u1", "20260103", 3, 1, "food_4"), ("u1", "20260104", 1, 1, "food_5"),
+        ], columns=["cust_id", "rgs_dt", "seq", "food_seq", "name"])
+        feels = meals[["cust_id", "rgs_dt", "seq", "time_slot"]].assign(mood="POS", energy="med")
+        profiles = pd.DataFrame([{
+            "cust_id": "u1", "purpose": 2, "Recommended_calories": 2000,
+            "Ratio_carb": None, "Ratio_protein": None, "Ratio_fat": None, "updated_time": "20260101000000",
+        }])
+        with tempfile.TemporaryDirectory() as d:
+            path = Path(d) / "snap.sqlite"
+            replay.save_replay_snapshot(
+                {"meals": meals, "meal_foods": meal_foods, "feels": feels, "profiles": profiles}, path,
+            )
+            snap = replay.load_replay_snapshot(path)
+
+        points = replay.build_decision_points(snap, since="20260103", until="20260103")
+        got = {(p["done_slot"], p["rgs_dt"], p["rec_time_slot"]): p for p in points}
+        self.assertEqual(set(got), {("M", "20260103", "L"), ("L", "20260103", "D"), ("D", "20260104", "M")})
+
+        lunch = got[("M", "20260103", "L")]
+        self.assertEqual(lunch["actual"], ["food_2", "food_3"])
+        self.assertEqual(lunch["recent_foods"], ["food_1"])
+        self.assertEqual(lunch["snapshot"]["day"]["sum_kcal"], 400.0)
+        self.assertEqual(lunch["mood"], "pos")
+        breakfast = got[("D", "20260104", "M")]
+        self.assertEqual(breakfast["recent_foods"], ["food_4", "food_2", "food_3", "food_1"])
+        self.assertEqual(breakfast["snapshot"]["day"]["sum_kcal"], 0.0)
+        self.assertEqual(breakfast["snapshot"]["recent"]["sum_kcal"], 1700.0)
+        self.assertEqual(lunch["snapshot"]["profile"]["Recommended_calories"], 2000)
+        later = profiles.assign(updated_time="20260105000000")
+        self.assertIsNone(replay._profile_at(later, "20260103"))
+
+        payload = build_bench_payload(300, seed=2)
+        configs = replay.resolve_configs(payload[0], {"wg": {"phase1": {"W_GLOBAL": 0.3}}})
+        base = service.recommend_batch(points, payload=payload, map_ids=False)
+        for p, r in zip(points, base):
+            p["actual"] = [r["foods"][0][1]]
+        rep = replay.replay_configs(points, payload, configs, chunk_points=2)
+        self.assertEqual(set(rep["configs"]), {"baseline", "wg"})
+        self.assertEqual(rep["configs"]["baseline"]["hit_rate"], 1.0)
+        self.assertEqual(rep["configs"]["baseline"]["n"], 3)
+        self.assertIn("p95_chunk_ms_per_point", rep["configs"]["baseline"])
+
+
+class RecoTraceTest(SimpleTestCase):
+    """
+    stage span 기록 -> histogram 누적/merge/요약, recommend_and_commit 1회 = trace 1건
+    """
+
+    def test_spans_histogram_and_service(self):
+        tr = reco_trace.Trace("r1", slot="M")
+        with reco_trace.activate(tr):
+            with reco_trace.span("phase1"):
+                pass
+            with reco_trace.span("phase1"):
+                reco_trace.set_rows("phase1", 7)
+        with reco_trace.span("outside"):
+            pass
+        rec = tr.record("computed")
+        self.assertEqual(set(rec["stages"]), {"phase1"})
+        self.assertEqual(rec["stages"]["phase1"]["rows"], 7)
+
+        h1, h2 = reco_trace.StageHistogram(), reco_trace.StageHistogram()
+        for ms in (0.3, 0.3, 4.0, 40.0):
+            h1.observe({"status": "computed", "total_ms": ms, "stages": {"phase1": {"ms": ms, "rows": 3}}})
+        h2.observe({"status": "failed", "total_ms": 900.0, "stages": {}})
+        merged = reco_trace.merge([h1.snapshot(), h2.snapshot()])
+        self.assertEqual((merged["workers"], merged["calls"]), (2, 5))
+        self.assertEqual(merged["status"], {"computed": 4, "failed": 1})
+        rows = {r["stage"]: r for r in reco_trace.summarize(merged)}
+        self.assertEqual(rows["phase1"]["p50_ms"], 0.5)
+        self.assertEqual(rows["phase1"]["p99_ms"], 40.0)
+        self.assertEqual(rows["total"]["count"], 5)
+
+        payload = build_bench_payload(300, seed=2)
+        repo = InMemoryRepo(seed=1)
+        with mock.patch.object(service, "RECO_TRACES", reco_trace.StageHistogram()) as hist, \
+                bench_service(payload, repo), contextlib.redirect_stdout(io.StringIO()) as out:
+            service.recommend_and_commit(cust_id="1", mood="pos", energy="med", rgs_dt="20260105", rec_time_slot="L")
+        snap = hist.snapshot()
+        self.assertEqual((snap["calls"], snap["status"]), (1, {"computed": 1}))
+        self.assertTrue({"db_snapshot", "phase1", "phase2_attach", "p_stable", "phase3_score", "upsert"} <= set(snap["stages"]))
+        self.assertEqual(out.getvalue().count("[RECO][TRACE]"), 1)
+
+
+class BulkInsertTest(SimpleTestCase):
+    class _Cursor:
+        def __init__(self):
+            self.calls = []
+            self.rowcount = 0
+
+        def execute(self, sql, params):
+            self.calls.append((sql, list(params)))
+            self.rowcount = len(params) // 3
+
+    def test_chunked_multi_row_statement(self):
+        cur = self._Cursor()
+        rows = [(f"u{i}", f"{i}", "w") for i in range(5)]
+        n = bulk_insert(
+            cur, "T", ("cust_id", "seq", "feel_id"), rows,
+            const_exprs={"created_time": "NOW()"},
+            placeholders={"feel_id": "(SELECT id FROM W WHERE word = %s)"},
+            update_columns=("seq",), chunk_rows=2,
+        )
+        self.assertEqual(len(cur.calls), 3)  # 2 + 2 + 1
+        sql, params = cur.calls[0]
+        self.assertTrue(sql.startswith("INSERT INTO T (created_time, cust_id, seq, feel_id) VALUES "))
+        self.assertEqual(sql.count("(NOW(), %s, %s, (SELECT id FROM W WHERE word = %s))"), 2)
+        self.assertTrue(sql.endswith("ON DUPLICATE KEY UPDATE seq = VALUES(seq)"))
+        self.assertEqual(params, ["u0", "0", "w", "u1", "1", "w"])
+        self.assertEqual(n, 5)
+        self.assertEqual(bulk_insert(cur, "T", ("a",), []), 0)
+        with self.assertRaises(ValueError):
+            bulk_insert(cur, "T", ("a", "b"), [(1,)])
+
+    def test_badges_partial_existing_reports_only_new(self):
+        owned = {("u1", "B2")}
+
+        class _BadgeCursor:
+            rowcount = 0
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params):
+                key = (params[0], params[1])
+                self.rowcount = 0 if key in owned else 1
+                owned.add(key)
+
+        insert = badge_repo.insert_badges_if_not_exist.__wrapped__  # transaction.atomic 없이
+        with mock.patch.object(badge_repo, "connection", mock.Mock(cursor=_BadgeCursor)):
+            self.assertEqual(insert("u1", ["B1", "B2", "B3", "B1"], acquired_time="20260101000000"), ["B1", "B3"])
+            # 같은 초에 다시 호출(동시 지급) -> 이미 들어간 것은 새 지급으로 보지 않음
+            self.assertEqual(insert("u1", ["B1", "B3"], acquired_time="20260101000000"), [])
+        self.assertEqual(owned, {("u1", "B1"), ("u1", "B2"), ("u1", "B3")})
+
+
+class LstmBatchWindowTest(SimpleTestCase):
+    def test_batch_tensor_and_scores_match_single_path(self):
+        rng = np.random.default_rng(3)
+        asof = "20260110"
+        days = [f"202601{d:02d}" for d in range(3, 11)]  # 20260103은 window 밖
+        cust_ids = [str(i) for i in range(40)]
+        feels = {c: [] for c in cust_ids}
+        for c in cust_ids:
+            for d in days:
+                if rng.random() < 0.7:
+                    feels[c].append({
+                        "rgs_dt": d,
+                        "time_slot": rng.choice(["M", "L", "D", "X", None]),
+                        "mood": rng.choice(["pos", "neu", "neg", "NEG", None]),
+                        "energy": rng.choice(["hig", "med", "low", None]),
+                        "cluster_val": None,
+                    })
+        day_rows = [(c, r["rgs_dt"], r["time_slot"], r["mood"], r["energy"]) for c in cust_ids for r in feels[c]]
+        x = lstm_predictor.build_window_tensor(cust_ids, day_rows, asof, window=7)
+        self.assertEqual(x.shape, (40, 7, 7))
+
+        with mock.patch.object(lstm_predictor, "torch", None), \
+                mock.patch.object(lstm_predictor, "gate_has_keywords_3days", return_value=(True, {})), \
+                mock.patch.object(lstm_predictor, "_fetch_last_n_feels", side_effect=lambda c, *a, **k: feels[c]):
+            out = lstm_predictor.predict_negative_risk_batch(x, infer_batch=7)
+            scores = risk_scores_from_probs(out["p0"], out["p2"])
+            for i, c in enumerate(cust_ids):
+                seq, _ = lstm_predictor.build_window_features(c, asof, window=7)
+                np.testing.assert_array_equal(x[i], np.array(seq, dtype=float))
+                single = lstm_predictor.predict_negative_risk(c, asof, "D", 1)
+                self.assertEqual(scores[i], int(round(min(1.0, single.p0 + single.p2) * 100)))
+
+
+class LstmBatchResumeTest(SimpleTestCase):
+    def test_failed_chunk_is_retried_and_done_users_skipped(self):
+        users = [f"{i:03d}" for i in range(23)]
+        store = {}  # (batch_dt, chunk_no) -> (status, cust_ids)
+        calls = []
+        broken = {"007"}
+
+        def fake_predict(cust_ids, batch_dt, skip_if_exists=True, infer_batch=4096):
+            calls.append(list(cust_ids))
+            if broken & set(cust_ids):
+                raise RuntimeError("boom")
+            return [{"cust_id": c, "ok": True, "risk_score": 1} for c in cust_ids]
+
+        def fake_load(batch_dt):
+            done = {c for (d, _), (st, ids) in store.items() if d == batch_dt and st == "done" for c in ids}
+            return done, max((n for d, n in store if d == batch_dt), default=-1)
+
+        def fake_save(batch_dt, chunk_no, cust_ids, status, stats):
+            store[(batch_dt, chunk_no)] = (status, list(cust_ids))
+
+        with mock.patch.object(lstm_batch, "_get_cust_ids_with_any_ts_on_date", return_value=users[::-1]), \
+                mock.patch.object(lstm_batch, "predict_chunk", side_effect=fake_predict), \
+                mock.patch.object(lstm_batch, "load_checkpoints", side_effect=fake_load), \
+                mock.patch.object(lstm_batch, "save_checkpoint", side_effect=fake_save), \
+                mock.patch.object(lstm_batch, "ensure_checkpoint_table", return_value=True), \
+                mock.patch.object(lstm_batch._BUNDLE, "load"), \
+                contextlib.redirect_stdout(io.StringIO()):
+            r1 = lstm_batch.run_8pm_batch_prediction(
+                chunk_size=5, workers=3, checkpoint=True, batch_dt="20260110",
+            )
+            self.assertEqual((r1["total"], r1["ok_cnt"], r1["fail_cnt"], r1["chunks"]), (23, 18, 5, 5))
+            self.assertEqual(r1["failed_chunks"], [1])
+
+            broken.clear()
+            calls.clear()
+            r2 = lstm_batch.run_8pm_batch_prediction(
+                chunk_size=5, workers=3, checkpoint=True, batch_dt="20260110",
+            )
+        self.assertEqual(calls, [users[5:10]])
+        self.assertEqual((r2["total"], r2["resumed_skip"], r2["ok_cnt"], r2["fail_cnt"]), (23, 18, 5, 0))
+        self.assertEqual(store[("20260110", 5)], ("done", users[5:10]))
+
+    def test_runs_without_checkpoints_when_table_unavailable(self):
+        with mock.patch.object(lstm_batch, "_get_cust_ids_with_any_ts_on_date", return_value=["1", "2"]), \
+                mock.patch.object(lstm_batch, "predict_chunk",
+                                  side_effect=lambda ids, *a, **k: [{"cust_id": c, "ok": True} for c in ids]), \
+                mock.patch.object(lstm_batch, "ensure_checkpoint_table", return_value=False), \
+                mock.patch.object(lstm_batch, "load_checkpoints", side_effect=AssertionError("no table")), \
+                mock.patch.object(lstm_batch, "save_checkpoint", side_effect=AssertionError("no table")), \
+                mock.patch.object(lstm_batch._BUNDLE, "load"), \
+                contextlib.redirect_stdout(io.StringIO()):
+            r = lstm_batch.run_8pm_batch_prediction(checkpoint=True, batch_dt="20260110")
+        self.assertEqual((r["ok_cnt"], r["fail_cnt"], r["failed_chunks"]), (2, 0, []))
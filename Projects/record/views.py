@@ -8,6 +8,7 @@ import traceback
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from conf.views import _safe_get_cust_id
+from conf.db_batch import bulk_insert
 from django.views.decorators.csrf import ensure_csrf_cookie
 
 
@@ -183,7 +184,8 @@ def record_mood(request):
                         [cust_id, rgs_dt, seq],
                     )
 
-                # (4) 키워드 재삽입
+                # (4) 키워드 재삽입 (키워드 수와 무관하게 INSERT 1문장)
+                # executemany는 VALUES에 subquery가 있으면 행마다 execute로 풀리므로 multi-row VALUES로 직접
                 if keywords:
                     ts_rows = []
                     for i, k in enumerate(keywords, start=1):
@@ -191,21 +193,12 @@ def record_mood(request):
                             (date_time, date_time, cust_id, rgs_dt, seq, i, k)
                         )
 
-                    cursor.executemany(
-                        """
-                        INSERT INTO CUS_FEEL_TS (
-                            created_time, updated_time, cust_id,
-                            rgs_dt, seq, keyword_seq, feel_id
-                        )
-                        VALUES (
-                            %s, %s, %s,
-                            %s, %s, %s,
-                            (SELECT feel_id
-                               FROM COM_FEEL_TM
-                              WHERE word = %s)
-                        )
-                        """,
+                    bulk_insert(
+                        cursor,
+                        "CUS_FEEL_TS",
+                        ("created_time", "updated_time", "cust_id", "rgs_dt", "seq", "keyword_seq", "feel_id"),
                         ts_rows,
+                        placeholders={"feel_id": "(SELECT feel_id FROM COM_FEEL_TM WHERE word = %s)"},
                     )
 
             # ✅ (중요) atomic "안"에서 on_commit 등록
@@ -27,6 +27,7 @@ from .services.barcode.mapping_code import (
 )
 
 from .models import FoodTb, CusFoodTh, CusFoodTs
+from ml.menu_reco.food_dict import FOOD_NAMES
 from .utils_time import now14
 import hashlib
 import numpy as np
@@ -119,6 +120,11 @@ def _get_or_create_food_id_by_name(
     t_create = created_time or now14()
     t_update = updated_time or t_create
 
+    # ✅ 같은 이름은 프로세스 로컬 사전에서 먼저(대부분 DB 안 감). 없으면 사전 refresh 없이 바로 ORM
+    cached_id = FOOD_NAMES.peek(name_n)
+    if cached_id is not None:
+        return cached_id, False
+
     with transaction.atomic():
         existing = FoodTb.objects.filter(name=name_n).order_by("food_id").first()
         if existing:
@@ -149,6 +155,8 @@ def _get_or_create_food_id_by_name(
             Macro_ratio_p=mr_p,
             Macro_ratio_f=mr_f,
         )
+        # commit 된 뒤에만 사전에 반영(rollback 시 유령 id 방지)
+        transaction.on_commit(lambda: FOOD_NAMES.remember(name_n, new_id))
         return new_id, True
 
 
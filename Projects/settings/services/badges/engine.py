@@ -4,7 +4,7 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 
 from .loader import load_badge_meta, iter_items
-from .repo import get_owned_badge_ids, insert_badge_if_not_exists, fetch_event_count
+from .repo import get_owned_badge_ids, insert_badges_if_not_exist, fetch_event_count
 from .evaluators import (
     count_rows,
     distinct_days,
@@ -31,7 +31,7 @@ def award_badges(
     items = iter_items(meta)
 
     owned = get_owned_badge_ids(cust_id)
-    granted: List[str] = []
+    earned: List[str] = []
 
     for it in items:
         badge_id = str(it.get("badge_id", "")).strip()
@@ -128,9 +128,10 @@ def award_badges(
             ok = False
 
         if ok:
-            ts = now_yyyymmddhhmmss()
-            if insert_badge_if_not_exists(cust_id, badge_id, acquired_time=ts):
-                granted.append(badge_id)
-                owned.add(badge_id)
+            earned.append(badge_id)
+            owned.add(badge_id)
 
-    return granted
\ No newline at end of file
+    # 조건 만족한 뱃지는 마지막에 한 트랜잭션으로 insert (이미 있으면 건너뜀)
+    if not earned:
+        return []
+    return insert_badges_if_not_exist(cust_id, earned, acquired_time=now_yyyymmddhhmmss())
\ No newline at end of file
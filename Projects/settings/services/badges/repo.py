@@ -17,25 +17,31 @@ def get_owned_badge_ids(cust_id: str) -> Set[str]:
         return {str(r[0]) for r in cur.fetchall()}
 
 @transaction.atomic
-def insert_badge_if_not_exists(cust_id: str, badge_id: str, acquired_time: Optional[str] = None) -> bool:
+def insert_badges_if_not_exist(cust_id: str, badge_ids: List[str], acquired_time: Optional[str] = None) -> List[str]:
     """
-    idempotent insert
-    return True if inserted, False if already exists
+    idempotent insert (다건): badge별 INSERT ... FROM DUAL WHERE NOT EXISTS를 한 트랜잭션에서
+    - "새로 지급"은 각 문장의 rowcount로 판단 -> 같은 초에 동시 지급돼도 한쪽만 True
+    return: 이번에 새로 들어간 badge_id (입력 순서)
     """
+    ids = list(dict.fromkeys(str(b) for b in badge_ids if str(b)))
     acquired_time = acquired_time or now_yyyymmddhhmmss()
+    inserted: List[str] = []
     with connection.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO CUS_BADGE_TM (cust_id, badge_id, acquired_time, created_time, updated_time)
-            SELECT %s, %s, %s, %s, %s
-            FROM DUAL
-            WHERE NOT EXISTS (
-              SELECT 1 FROM CUS_BADGE_TM WHERE cust_id=%s AND badge_id=%s
+        for badge_id in ids:
+            cur.execute(
+                """
+                INSERT INTO CUS_BADGE_TM (cust_id, badge_id, acquired_time, created_time, updated_time)
+                SELECT %s, %s, %s, %s, %s
+                FROM DUAL
+                WHERE NOT EXISTS (
+                  SELECT 1 FROM CUS_BADGE_TM WHERE cust_id=%s AND badge_id=%s
+                )
+                """,
+                [cust_id, badge_id, acquired_time, acquired_time, acquired_time, cust_id, badge_id],
             )
-            """,
-            [cust_id, badge_id, acquired_time, acquired_time, acquired_time, cust_id, badge_id],
-        )
-        return cur.rowcount == 1
+            if cur.rowcount == 1:
+                inserted.append(badge_id)
+    return inserted
 
 def list_table_columns(table_name: str, schema_name: Optional[str] = None) -> List[str]:
     """